@@ -0,0 +1,182 @@
+"""
+Per-run artifact directories for SOAP workflow runs.
+
+Each run writes its transcript, structured JSON and SOAP note files into its
+own directory under a configurable root, so concurrent runs never overwrite
+each other's intermediates. Old runs are removed by age and/or count.
+
+A run in progress holds an ``.in_progress`` marker file in its directory
+until it finishes; pruning skips marked runs, so it is safe to prune from
+any workflow instance, worker or process sharing the root. Markers left by
+a process that died on this host are ignored.
+"""
+
+import json
+import logging
+import os
+import socket
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_ROOT = "runs"
+ARTIFACT_ROOT_ENV_VAR = "SOAP_ARTIFACT_ROOT"
+MAX_AGE_DAYS_ENV_VAR = "SOAP_ARTIFACT_MAX_AGE_DAYS"
+MAX_RUNS_ENV_VAR = "SOAP_ARTIFACT_MAX_RUNS"
+
+IN_PROGRESS_MARKER = ".in_progress"
+
+_UNSAFE_RUN_ID_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class RunArtifacts:
+    """The artifact directory of a single run."""
+
+    def __init__(self, run_id: str, path: Path):
+        self.run_id = run_id
+        self.path = path
+
+    def file(self, name: str) -> str:
+        """Path of an artifact file inside this run's directory."""
+        return str(self.path / name)
+
+    @property
+    def marker(self) -> Path:
+        return self.path / IN_PROGRESS_MARKER
+
+    def in_progress(self) -> bool:
+        """Whether a live run still holds this directory's in-progress marker."""
+        try:
+            owner = json.loads(self.marker.read_text())
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            return True  # 标记正在写入或无法解析：保守地视为进行中
+        if owner.get("host") == socket.gethostname() and isinstance(owner.get("pid"), int):
+            return _pid_alive(owner["pid"])
+        return True
+
+    def finish(self):
+        """Drop the in-progress marker; the run becomes eligible for pruning."""
+        try:
+            self.marker.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __repr__(self):
+        return f"RunArtifacts(run_id={self.run_id!r}, path={str(self.path)!r})"
+
+
+class ArtifactStore:
+    """Creates, looks up and prunes per-run artifact directories."""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_age_seconds: Optional[float] = None,
+        max_runs: Optional[int] = None,
+    ):
+        self.root = Path(root or os.getenv(ARTIFACT_ROOT_ENV_VAR) or DEFAULT_ARTIFACT_ROOT)
+        if max_age_seconds is None and os.getenv(MAX_AGE_DAYS_ENV_VAR):
+            max_age_seconds = float(os.getenv(MAX_AGE_DAYS_ENV_VAR)) * 86400
+        if max_runs is None and os.getenv(MAX_RUNS_ENV_VAR):
+            max_runs = int(os.getenv(MAX_RUNS_ENV_VAR))
+        self.max_age_seconds = max_age_seconds
+        self.max_runs = max_runs
+
+    @staticmethod
+    def new_run_id() -> str:
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    def _run_path(self, run_id: str) -> Path:
+        safe_id = _UNSAFE_RUN_ID_CHARS.sub("_", run_id)
+        if safe_id in ("", ".", ".."):
+            raise ValueError(f"Invalid run id: {run_id!r}")
+        return self.root / safe_id
+
+    def create_run(self, run_id: Optional[str] = None) -> RunArtifacts:
+        """Create a new, marked-in-progress directory for ``run_id``, generating an id if needed.
+
+        The directory is created exclusively: if it already exists (a repeated
+        id, a retry, or another id that sanitizes to the same name), a numeric
+        suffix is added and the returned run's ``run_id`` carries it.
+        """
+        base_id = run_id or self.new_run_id()
+        self.root.mkdir(parents=True, exist_ok=True)
+        run_id, attempt = base_id, 1
+        while True:
+            path = self._run_path(run_id)
+            try:
+                path.mkdir()
+                break
+            except FileExistsError:
+                attempt += 1
+                run_id = f"{base_id}-{attempt}"
+        run = RunArtifacts(run_id, path)
+        owner = {"pid": os.getpid(), "host": socket.gethostname(), "started_at": time.time()}
+        run.marker.write_text(json.dumps(owner))
+        return run
+
+    def finish_run(self, run: RunArtifacts):
+        run.finish()
+
+    def get_run(self, run_id: str) -> Optional[RunArtifacts]:
+        path = self._run_path(run_id)
+        return RunArtifacts(run_id, path) if path.is_dir() else None
+
+    def list_runs(self) -> List[RunArtifacts]:
+        """Existing runs, oldest first."""
+        if not self.root.is_dir():
+            return []
+        paths = sorted((p for p in self.root.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime)
+        return [RunArtifacts(p.name, p) for p in paths]
+
+    def remove_run(self, run_id: str):
+        shutil.rmtree(self._run_path(run_id), ignore_errors=True)
+
+    def prune(self, keep: Optional[List[str]] = None) -> List[str]:
+        """Apply the retention policy; returns the ids of removed runs.
+
+        Runs still in progress (see ``RunArtifacts.in_progress``) and runs
+        listed in ``keep`` are never removed.
+        """
+        if self.max_age_seconds is None and self.max_runs is None:
+            return []
+        keep = {self._run_path(run_id).name for run_id in keep or []}
+        runs = [run for run in self.list_runs() if run.run_id not in keep and not run.in_progress()]
+        removed = []
+
+        if self.max_age_seconds is not None:
+            cutoff = time.time() - self.max_age_seconds
+            for run in list(runs):
+                if run.path.stat().st_mtime < cutoff:
+                    runs.remove(run)
+                    removed.append(run)
+
+        if self.max_runs is not None:
+            excess = len(runs) - self.max_runs
+            if excess > 0:
+                removed.extend(runs[:excess])
+
+        for run in removed:
+            shutil.rmtree(run.path, ignore_errors=True)
+        if removed:
+            logger.info(f"Pruned {len(removed)} old run directories from {self.root}")
+        return [run.run_id for run in removed]
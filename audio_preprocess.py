@@ -0,0 +1,188 @@
+"""
+Process-pool audio preprocessing for batch runs.
+
+Decoding/resampling (ffmpeg), loudness normalization and the VAD pre-pass are
+CPU-bound, so AudioPreprocessor fans them out over a pool of worker
+processes, one recording per task. Workers write the resulting int16 speech
+samples to a ``.npy`` file and return only small metadata; the caller opens
+the samples as a read-only memory map instead of receiving a pickled blob.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from audio_profile import get_audio_profile
+from vad import TimestampMap, VoiceActivityDetector, frame_features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_DBFS = -20.0
+# 增益上下限，避免把底噪放大成“语音”或把过载音频压得过低
+MAX_GAIN_DB = 20.0
+MIN_GAIN_DB = -10.0
+# 峰值不超过满幅的 0.99
+PEAK_LIMIT = 0.99
+# 低于该能量的帧不参与响度测量（静音段）
+LOUDNESS_GATE_DBFS = -50.0
+CHUNK_SAMPLES = 8192
+
+
+@dataclass
+class PreprocessedAudio:
+    """Metadata of one preprocessed recording; samples live in ``path``."""
+
+    source: str
+    path: str
+    sample_rate: int
+    total_samples: int
+    kept_samples: int
+    gain_db: float
+    spans: Optional[List[tuple]] = None  # VAD 保留段 (original_start_sample, length)
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    @property
+    def kept_seconds(self) -> float:
+        return self.kept_samples / self.sample_rate
+
+    def load(self, mmap: bool = True) -> np.ndarray:
+        """The int16 samples, memory-mapped read-only by default."""
+        return np.load(self.path, mmap_mode="r" if mmap else None)
+
+    def iter_pcm(self, chunk_samples: int = CHUNK_SAMPLES) -> Iterator[bytes]:
+        """Yield the samples as PCM byte chunks, copying one chunk at a time."""
+        samples = self.load()
+        for start in range(0, len(samples), chunk_samples):
+            yield samples[start:start + chunk_samples].tobytes()
+
+    def timestamp_map(self) -> Optional[TimestampMap]:
+        if self.spans is None:
+            return None
+        return TimestampMap.from_sample_spans(self.sample_rate, self.spans)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def normalize_loudness(samples: np.ndarray, sample_rate: int, target_dbfs: float = DEFAULT_TARGET_DBFS):
+    """Scale int16 ``samples`` so active frames average ``target_dbfs``; returns (samples, gain_db)."""
+    frame = max(1, sample_rate * 30 // 1000)
+    if len(samples) < frame:
+        return samples, 0.0
+    energy_db, _ = frame_features(samples, frame)
+    active = energy_db[energy_db > LOUDNESS_GATE_DBFS]
+    if active.size == 0:
+        return samples, 0.0
+    # 在功率域平均，再换算回 dBFS
+    loudness = 10 * np.log10(np.mean(10 ** (active / 10)))
+    gain_db = float(np.clip(target_dbfs - loudness, MIN_GAIN_DB, MAX_GAIN_DB))
+    peak = float(np.max(np.abs(samples.astype(np.int32)))) / 32768.0
+    if peak > 0:
+        gain_db = min(gain_db, 20 * np.log10(PEAK_LIMIT / peak))
+    gain = 10 ** (gain_db / 20)
+    scaled = np.clip(np.rint(samples.astype(np.float32) * gain), -32768, 32767).astype(np.int16)
+    return scaled, gain_db
+
+
+def preprocess_file(audio_path: str, out_dir: str, sample_rate: int = 16000, normalize: bool = True,
+                    target_dbfs: float = DEFAULT_TARGET_DBFS, vad: bool = True) -> PreprocessedAudio:
+    """Decode, resample, normalize and VAD-filter one file; runs inside a worker process."""
+    from speech_to_text import stream_pcm
+
+    pcm = bytearray()
+    for chunk in stream_pcm(audio_path, sample_rate):
+        pcm += chunk
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    total_samples = len(samples)
+
+    gain_db = 0.0
+    if normalize:
+        samples, gain_db = normalize_loudness(samples, sample_rate, target_dbfs)
+
+    spans = None
+    if vad:
+        detector = VoiceActivityDetector(sample_rate)
+        chunks = (samples[i:i + CHUNK_SAMPLES].tobytes() for i in range(0, len(samples), CHUNK_SAMPLES))
+        kept = b"".join(detector.filter(chunks))
+        samples = np.frombuffer(kept, dtype=np.int16)
+        spans = detector.timestamp_map.sample_spans
+
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    path = os.path.join(out_dir, f"{stem}-{uuid.uuid4().hex[:8]}.npy")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, samples)
+    os.replace(tmp_path, path)
+    return PreprocessedAudio(
+        source=audio_path,
+        path=path,
+        sample_rate=sample_rate,
+        total_samples=total_samples,
+        kept_samples=len(samples),
+        gain_db=gain_db,
+        spans=spans,
+    )
+
+
+class AudioPreprocessor:
+    """Process pool that preprocesses recordings into memory-mappable .npy files.
+
+    max_workers defaults to the number of CPU cores. When ``out_dir`` is not
+    given a temporary directory is created and removed on shutdown().
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, out_dir: Optional[str] = None, profile=None,
+                 normalize: bool = True, target_dbfs: float = DEFAULT_TARGET_DBFS, vad: bool = True):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._owns_out_dir = out_dir is None
+        self.out_dir = out_dir or tempfile.mkdtemp(prefix="soap-preprocess-")
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.sample_rate = get_audio_profile(profile).sample_rate
+        self.normalize = normalize
+        self.target_dbfs = target_dbfs
+        self.vad = vad
+        # spawn：避免在已有线程（asyncio.to_thread）的进程中 fork
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(self, audio_path: str) -> "Future[PreprocessedAudio]":
+        return self._pool.submit(
+            preprocess_file, os.path.abspath(audio_path), self.out_dir,
+            self.sample_rate, self.normalize, self.target_dbfs, self.vad,
+        )
+
+    def map(self, audio_paths: Iterable[str]) -> Iterator[PreprocessedAudio]:
+        """Preprocess ``audio_paths`` in parallel, yielding results in input order."""
+        futures = [self.submit(path) for path in audio_paths]
+        for future in futures:
+            yield future.result()
+
+    async def apreprocess(self, audio_path: str) -> PreprocessedAudio:
+        return await asyncio.wrap_future(self.submit(audio_path))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._owns_out_dir:
+            shutil.rmtree(self.out_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
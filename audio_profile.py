@@ -0,0 +1,115 @@
+"""
+Audio profiles for the conversion step and header probing for recognition.
+
+A profile picks the target sample rate, codec and channel layout used when
+decoding recordings with ffmpeg. Recognition settings are read back from the
+converted file's header instead of being hard-coded.
+"""
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import Dict, List
+
+# 语音识别不需要高于 16 kHz 的采样率
+DEFAULT_AUDIO_PROFILE = "speech_16k"
+AUDIO_PROFILE_ENV_VAR = "SOAP_AUDIO_PROFILE"
+
+
+@dataclass(frozen=True)
+class AudioProfile:
+    """Target format for decoded audio."""
+
+    name: str
+    sample_rate: int
+    codec: str
+    channels: int = 1
+
+    @property
+    def extension(self) -> str:
+        return "flac" if self.codec == "flac" else "wav"
+
+    def ffmpeg_args(self) -> List[str]:
+        """ffmpeg output options producing this profile."""
+        return ["-acodec", self.codec, "-ar", str(self.sample_rate), "-ac", str(self.channels)]
+
+
+AUDIO_PROFILES: Dict[str, AudioProfile] = {
+    profile.name: profile
+    for profile in [
+        AudioProfile("speech_16k", 16000, "pcm_s16le"),
+        AudioProfile("telephony_8k", 8000, "pcm_s16le"),
+        AudioProfile("flac_16k", 16000, "flac"),
+        AudioProfile("legacy_44k", 44100, "pcm_s16le"),
+    ]
+}
+
+
+def get_audio_profile(name=None) -> AudioProfile:
+    """Look up a profile by name, falling back to $SOAP_AUDIO_PROFILE and the default.
+
+    An AudioProfile instance is returned unchanged.
+    """
+    if isinstance(name, AudioProfile):
+        return name
+    name = name or os.getenv(AUDIO_PROFILE_ENV_VAR) or DEFAULT_AUDIO_PROFILE
+    try:
+        return AUDIO_PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown audio profile '{name}'. Available profiles: {', '.join(AUDIO_PROFILES)}"
+        )
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """Format information read from an audio file header."""
+
+    encoding: str  # Google RecognitionConfig.AudioEncoding name
+    sample_rate: int
+    channels: int
+    sample_width: int  # bytes per sample, 0 when not applicable
+
+    @property
+    def is_linear_pcm(self) -> bool:
+        return self.encoding == "LINEAR16"
+
+
+def _probe_wav(f) -> AudioFormat:
+    f.seek(12)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV file has no 'fmt ' chunk")
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            fmt = f.read(16)
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt)
+            # 1 = PCM, 0xFFFE = WAVE_FORMAT_EXTENSIBLE
+            encoding = "LINEAR16" if audio_format in (1, 0xFFFE) and bits == 16 else "ENCODING_UNSPECIFIED"
+            return AudioFormat(encoding, sample_rate, channels, bits // 8)
+        f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def _probe_flac(f) -> AudioFormat:
+    # "fLaC" + 4 字节元数据块头，随后是 STREAMINFO
+    f.seek(8)
+    streaminfo = f.read(18)
+    if len(streaminfo) < 18:
+        raise ValueError("FLAC file has a truncated STREAMINFO block")
+    packed = int.from_bytes(streaminfo[10:13], "big")
+    sample_rate = packed >> 4
+    channels = ((packed >> 1) & 0x7) + 1
+    bits = (((packed & 0x1) << 4) | (streaminfo[13] >> 4)) + 1
+    return AudioFormat("FLAC", sample_rate, channels, bits // 8)
+
+
+def probe_audio_header(path: str) -> AudioFormat:
+    """Read encoding, sample rate and channel count from a WAV or FLAC header."""
+    with open(path, "rb") as f:
+        magic = f.read(12)
+        if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+            return _probe_wav(f)
+        if magic[:4] == b"fLaC":
+            return _probe_flac(f)
+    raise ValueError(f"Unsupported audio container for '{path}' (expected WAV or FLAC)")
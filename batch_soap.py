@@ -0,0 +1,248 @@
+"""
+Batch SOAP note generation for a directory or manifest of recordings.
+
+Aurite is initialized once and SoapNoteWorkflow runs across all inputs
+through a bounded async job queue. Per-stage limits (decode, STT, LLM) cap
+how many jobs hit each backend at once. Every finished job is appended to a
+JSONL ledger, so restarting the same batch skips recordings that already
+completed.
+
+Usage:
+    python batch_soap.py recordings/ --concurrency 8 --llm-limit 4
+    python batch_soap.py manifest.txt --ledger runs/batch_ledger.jsonl
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from termcolor import colored
+
+from model_router import get_model_router
+from stage_limits import STAGES, get_stage_limiter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".m4a", ".ogg")
+DEFAULT_LEDGER = os.path.join("runs", "batch_ledger.jsonl")
+WORKFLOW_NAME = "soap-note-workflow"
+
+
+def collect_audio_files(source):
+    """Audio files from a directory, a .json list manifest or a one-path-per-line manifest."""
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.lower().endswith(AUDIO_EXTENSIONS)
+        )
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        if source.lower().endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    # 清单中的相对路径相对于清单文件所在目录
+    return [entry if os.path.isabs(entry) else os.path.join(base, entry) for entry in entries]
+
+
+def job_id_for(audio_file):
+    """Stable id of a recording: path, size and mtime, so edited files are reprocessed."""
+    stat = os.stat(audio_file)
+    key = f"{os.path.abspath(audio_file)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class JobLedger:
+    """Append-only JSONL record of finished jobs."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def completed_jobs(self):
+        completed = set()
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下半行记录，忽略即可
+                    continue
+                if entry.get("status") == "completed":
+                    completed.add(entry["job_id"])
+        return completed
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def record(self, entry):
+        async with self._lock:
+            await asyncio.to_thread(self._append, entry)
+
+
+async def register_workflow(aurite):
+    """Register SoapNoteWorkflow dynamically when Aurite supports it (same as run_soap_workflow.py)."""
+    try:
+        from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow
+
+        if hasattr(aurite, "register_custom_workflow"):
+            await aurite.register_custom_workflow(
+                name=WORKFLOW_NAME,
+                workflow_class=SoapNoteWorkflow,
+                description="A workflow for generating SOAP notes from audio recordings.",
+            )
+    except Exception as reg_error:
+        logger.warning(f"Dynamic registration failed, using config file registration: {reg_error}")
+
+
+async def run_workflow(aurite, initial_input):
+    if hasattr(aurite, "run_custom_workflow"):
+        try:
+            return await aurite.run_custom_workflow(workflow_name=WORKFLOW_NAME, initial_input=initial_input)
+        except Exception as e:
+            logger.warning(f"run_custom_workflow failed: {e}")
+    return await aurite.run_workflow(workflow_name=WORKFLOW_NAME, initial_input=initial_input)
+
+
+async def process_job(aurite, ledger, audio_file, job_id, options):
+    run_id = f"batch-{job_id[:12]}"
+    start = time.perf_counter()
+    entry = {"job_id": job_id, "audio_file": os.path.abspath(audio_file), "run_id": run_id}
+    try:
+        result = await run_workflow(aurite, {"mp3_file": audio_file, "run_id": run_id, **options})
+        result = vars(result) if not isinstance(result, dict) else result
+        entry["status"] = result.get("status", "failed")
+        entry["error"] = result.get("error")
+        entry["run_dir"] = result.get("run_dir")
+        entry["stage_timings"] = result.get("stage_timings", {})
+    except Exception as e:
+        logger.error(f"Job for {audio_file} failed: {e}")
+        entry["status"] = "failed"
+        entry["error"] = str(e)
+    entry["elapsed"] = time.perf_counter() - start
+    entry["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    await ledger.record(entry)
+    return entry
+
+
+async def run_batch(aurite, jobs, ledger, concurrency, options):
+    """Run ``jobs`` ((audio_file, job_id) pairs) with at most ``concurrency`` in flight."""
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    results = []
+
+    async def worker():
+        while True:
+            job = await queue.get()
+            try:
+                if job is None:
+                    return
+                entry = await process_job(aurite, ledger, *job, options)
+                results.append(entry)
+                color = "green" if entry["status"] == "completed" else "red"
+                print(colored(f"[{len(results)}/{len(jobs)}] {entry['status']}: {job[0]} "
+                              f"({entry['elapsed']:.1f} s)", color))
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for job in jobs:
+        await queue.put(job)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return results
+
+
+def print_summary(results, skipped, wall_time):
+    completed = [r for r in results if r["status"] == "completed"]
+    failed = [r for r in results if r["status"] != "completed"]
+    print(colored("\n--- Batch Summary ---", "yellow", attrs=["bold"]))
+    print(f"Completed: {len(completed)}  Failed: {len(failed)}  Skipped (already done): {skipped}")
+    print(f"Wall time: {wall_time:.1f} s")
+    if results and wall_time > 0:
+        print(f"Throughput: {len(completed) / wall_time * 60:.1f} recordings/min")
+    if completed:
+        mean_elapsed = sum(r["elapsed"] for r in completed) / len(completed)
+        print(f"Mean job latency: {mean_elapsed:.1f} s")
+
+    stats = get_stage_limiter().stats()
+    for stage in STAGES:
+        if stage in stats:
+            s = stats[stage]
+            limit = s["limit"] or "unlimited"
+            print(f"  {stage:<7} limit={limit!s:<9} calls={s['count']:<5} mean={s['mean']:.2f} s "
+                  f"p95={s['p95']:.2f} s  mean wait={s['mean_wait']:.2f} s")
+    for llm_id, t in get_model_router().report().items():
+        print(f"  {llm_id:<22} {t['model']:<12} calls={t['calls']:<5} cache hits={t['cache_hits']:<4} escalated={t['escalations']:<4} "
+              f"mean={t['mean_latency']:.2f} s  total={t['total_latency']:.1f} s  cost=${t['cost_usd']:.4f}")
+    for r in failed:
+        print(colored(f"  failed: {r['audio_file']}: {r.get('error')}", "red"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Generate SOAP notes for a batch of recordings.")
+    parser.add_argument("source", help="directory of recordings or manifest file (.txt / .json)")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs in flight at once")
+    parser.add_argument("--decode-limit", type=int, default=None, help="max concurrent audio decode/transcription stages")
+    parser.add_argument("--stt-limit", type=int, default=None, help="max concurrent speech recognition requests")
+    parser.add_argument("--llm-limit", type=int, default=None, help="max concurrent LLM requests")
+    parser.add_argument("--ledger", default=DEFAULT_LEDGER, help="JSONL job ledger used to resume")
+    parser.add_argument("--fused", action="store_true", help="use the single-call extraction+SOAP mode")
+    parser.add_argument("--audio-profile", default=None)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    # 工作流运行在同一进程中，共享进程级 StageLimiter
+    get_stage_limiter().configure(decode=args.decode_limit, stt=args.stt_limit, llm=args.llm_limit)
+
+    ledger = JobLedger(args.ledger)
+    done = ledger.completed_jobs()
+    jobs, skipped = [], 0
+    for audio_file in collect_audio_files(args.source):
+        if not os.path.exists(audio_file):
+            logger.warning(f"Skipping missing file: {audio_file}")
+            continue
+        job_id = job_id_for(audio_file)
+        if job_id in done:
+            skipped += 1
+        else:
+            jobs.append((audio_file, job_id))
+
+    print(colored(f"{len(jobs)} recordings to process, {skipped} already completed", "blue"))
+    if not jobs:
+        return
+
+    options = {"fused": args.fused}
+    if args.audio_profile:
+        options["audio_profile"] = args.audio_profile
+
+    from aurite import Aurite
+
+    aurite = Aurite()
+    try:
+        await aurite.initialize()
+        await register_workflow(aurite)
+        start = time.perf_counter()
+        results = await run_batch(aurite, jobs, ledger, max(1, args.concurrency), options)
+        print_summary(results, skipped, time.perf_counter() - start)
+    finally:
+        await aurite.shutdown()
+        logger.info("Aurite shutdown complete.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
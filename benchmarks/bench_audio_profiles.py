@@ -0,0 +1,71 @@
+"""
+Benchmark: bytes and decode latency per audio profile.
+
+Converts a recording with each profile in audio_profile.AUDIO_PROFILES and
+reports the converted file size (what is uploaded for recognition), the
+streamed PCM size (what flows through VAD and the chunked engine) and the
+wall-clock time of each step.
+
+Usage:
+    python benchmarks/bench_audio_profiles.py [audio_file] [--repeat N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_profile import AUDIO_PROFILES, probe_audio_header  # noqa: E402
+from speech_to_text import check_ffmpeg_installed, stream_pcm  # noqa: E402
+
+
+def convert(audio_path, profile, out_path):
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", audio_path, *profile.ffmpeg_args(), out_path],
+        check=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("audio_file", nargs="?", default="Record_test.mp3")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not check_ffmpeg_installed():
+        print("FFmpeg is not installed; cannot run the benchmark.")
+        sys.exit(1)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in AUDIO_PROFILES.values():
+            out_path = os.path.join(tmp, f"{profile.name}.{profile.extension}")
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                convert(args.audio_file, profile, out_path)
+            convert_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                pcm_bytes = sum(len(chunk) for chunk in stream_pcm(args.audio_file, profile.sample_rate))
+            stream_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+            header = probe_audio_header(out_path)
+            rows.append((profile, os.path.getsize(out_path), convert_ms, pcm_bytes, stream_ms, header))
+
+    baseline = next((row for row in rows if row[0].name == "legacy_44k"), rows[0])
+    print(f"{'profile':<14} {'header':<22} {'file bytes':>12} {'vs 44k':>7} "
+          f"{'convert ms':>11} {'pcm bytes':>12} {'stream ms':>10}")
+    for profile, file_bytes, convert_ms, pcm_bytes, stream_ms, header in rows:
+        header_text = f"{header.encoding} {header.sample_rate}Hz x{header.channels}"
+        print(f"{profile.name:<14} {header_text:<22} {file_bytes:>12,} "
+              f"{file_bytes / baseline[1]:>6.2f}x {convert_ms:>11.1f} {pcm_bytes:>12,} {stream_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: N concurrent SoapNoteWorkflow runs vs one run and N sequential runs.
+
+Uses a fake recognizer (blocking sleep per segment, like a network call made
+from a worker thread) and the fake async chat client from fake_backends,
+so the run is offline; ffmpeg is still used to decode the input recording.
+If the workflow keeps the event loop free, N concurrent runs finish in about
+the time of one. Every run must leave its own intact artifacts in its run
+directory, which checks that parallel runs do not clobber each other.
+
+Usage:
+    python benchmarks/bench_concurrent_workflows.py [audio_file] [-n N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from artifact_store import ArtifactStore  # noqa: E402
+from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow  # noqa: E402
+from fake_backends import FakeChatClient, FakeRecognizer  # noqa: E402
+from speech_to_text import check_ffmpeg_installed  # noqa: E402
+
+
+def check_artifacts(results):
+    failed = [r for r in results if r.get("status") != "completed"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} workflow runs failed: {failed[0].get('error')}")
+    run_dirs = {r["run_dir"] for r in results}
+    if len(run_dirs) != len(results):
+        raise RuntimeError("workflow runs shared an artifact directory")
+    for r in results:
+        with open(r["soap_note_file"], "r", encoding="utf-8") as f:
+            if f.read() != r["soap_note"]:
+                raise RuntimeError(f"artifacts of run {r['run_id']} were overwritten")
+
+
+async def run_batch(workflow, audio_file, n, concurrent=True):
+    initial_input = {"mp3_file": audio_file, "use_transcript_cache": False}
+    start = time.perf_counter()
+    if concurrent:
+        results = await asyncio.gather(*(
+            workflow.execute_workflow(dict(initial_input), executor=None) for _ in range(n)
+        ))
+    else:
+        results = [await workflow.execute_workflow(dict(initial_input), executor=None) for _ in range(n)]
+    elapsed = time.perf_counter() - start
+    check_artifacts(results)
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("audio_file", nargs="?", default=os.path.join(ROOT, "Record_test.mp3"))
+    parser.add_argument("-n", type=int, default=8, help="number of concurrent runs")
+    args = parser.parse_args()
+
+    if not check_ffmpeg_installed():
+        print("FFmpeg is not installed; cannot run the benchmark.")
+        sys.exit(1)
+
+    audio_file = os.path.abspath(args.audio_file)
+    with tempfile.TemporaryDirectory() as tmp:
+        workflow = SoapNoteWorkflow(
+            recognizer=FakeRecognizer(), llm_client=FakeChatClient(), artifact_store=ArtifactStore(tmp)
+        )
+        single = await run_batch(workflow, audio_file, 1)
+        sequential = await run_batch(workflow, audio_file, args.n, concurrent=False)
+        concurrent = await run_batch(workflow, audio_file, args.n)
+
+    print(f"1 run:                {single:6.2f} s")
+    print(f"{args.n} sequential runs:    {sequential:6.2f} s  ({args.n / sequential:.2f} runs/s)")
+    print(f"{args.n} concurrent runs:    {concurrent:6.2f} s  ({args.n / concurrent:.2f} runs/s, "
+          f"{concurrent / single:.2f}x the single-run time)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark: two-call extraction + SOAP generation vs the fused single call.
+
+By default a local fake chat client is used whose latency grows with prompt
+and completion size, so the comparison runs offline. With --live the real
+OpenAI client is used (needs OPENAI_API_KEY) on transcribed_text.txt.
+The LLM response cache is disabled for the run.
+
+Usage:
+    python benchmarks/bench_fused_mode.py [--live] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow  # noqa: E402
+from fake_backends import SAMPLE_TRANSCRIPT, FakeChatClient  # noqa: E402
+
+
+class RecordingClient:
+    """Wraps a chat client and records call count and token usage."""
+
+    def __init__(self, client):
+        self._client = client
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        response = await self._client.chat.completions.create(**kwargs)
+        self.calls += 1
+        if getattr(response, "usage", None) is not None:
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+        return response
+
+
+async def run_mode(workflow, client, transcript, fused):
+    start = time.perf_counter()
+    if fused:
+        await workflow._extract_and_generate(client, transcript)
+    else:
+        result_json = await workflow._extract_symptoms(client, transcript)
+        await workflow._generate_soap_note(client, result_json)
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="use the real OpenAI client")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.live:
+        from openai import AsyncOpenAI
+
+        base_client = AsyncOpenAI()
+        with open("transcribed_text.txt", "r", encoding="utf-8") as f:
+            transcript = f.read().strip()
+    else:
+        base_client = FakeChatClient()
+        transcript = SAMPLE_TRANSCRIPT
+
+    workflow = SoapNoteWorkflow()
+    print(f"{'mode':<10} {'calls':>6} {'prompt tok':>11} {'completion tok':>15} {'mean s':>8}")
+    for label, fused in [("two-call", False), ("fused", True)]:
+        client = RecordingClient(base_client)
+        elapsed = [await run_mode(workflow, client, transcript, fused) for _ in range(args.repeat)]
+        print(f"{label:<10} {client.calls / args.repeat:>6.1f} {client.prompt_tokens / args.repeat:>11.0f} "
+              f"{client.completion_tokens / args.repeat:>15.0f} {sum(elapsed) / len(elapsed):>8.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
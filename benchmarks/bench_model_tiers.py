@@ -0,0 +1,115 @@
+"""
+Benchmark: extraction + SOAP generation with every stage on the strong model
+vs model tiering (fast extraction model, escalation to the strong one).
+
+A fake chat client gives each model its own latency, and the fast model
+returns a broken or ungrounded extraction for a share of requests
+(--fast-failure-rate), which the router must catch and escalate. Costs use
+the prices in model_router.MODEL_PRICES. The LLM response cache is disabled.
+
+Usage:
+    python benchmarks/bench_model_tiers.py [-n N] [--fast-failure-rate R]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow  # noqa: E402
+from fake_backends import FAKE_EXTRACTION, SAMPLE_TRANSCRIPT, FakeChatClient  # noqa: E402
+from model_router import ModelRouter, load_tiers  # noqa: E402
+
+# (固定开销秒数, 每个输出 token 的秒数)
+MODEL_LATENCY = {"gpt-4o-mini": (0.25, 0.004), "gpt-4": (0.8, 0.02)}
+
+BROKEN_RESPONSES = [
+    # 非 JSON：说明文字包裹
+    "Here are the extracted symptoms:\n" + json.dumps(FAKE_EXTRACTION),
+    # 字段缺失
+    json.dumps({"symptoms": FAKE_EXTRACTION["symptom_raw"]}),
+    # 与转录无关的症状（低置信度）
+    json.dumps({"symptom_raw": ["chest pain radiating to the left arm"],
+                "symptom_standardized": ["Angina pectoris"], "possible_conditions": ["Myocardial infarction"]}),
+]
+
+
+class TieredFakeChatClient:
+    """FakeChatClient per model name; the fast model sometimes returns a bad extraction."""
+
+    def __init__(self, fast_model, failure_rate, seed=0):
+        self.fast_model = fast_model
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.clients = {
+            model: FakeChatClient(overhead=overhead, per_completion_token=per_token)
+            for model, (overhead, per_token) in MODEL_LATENCY.items()
+        }
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, **params):
+        response = await self.clients[model].chat.completions.create(model=model, messages=messages, **params)
+        is_extraction = "Extract the following" in messages[-1]["content"]
+        if model == self.fast_model and is_extraction and self.random.random() < self.failure_rate:
+            response.choices[0].message.content = self.random.choice(BROKEN_RESPONSES)
+        return response
+
+
+async def run(router, client, n, concurrency=8):
+    workflow = SoapNoteWorkflow(llm_client=client, model_router=router)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        transcript = f"{SAMPLE_TRANSCRIPT} Visit {i}."
+        async with semaphore:
+            start = time.perf_counter()
+            extraction = await workflow._extract_symptoms(client, transcript)
+            await workflow._generate_soap_note(client, extraction)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, time.perf_counter() - start
+
+
+def print_report(label, router, latencies, wall, n):
+    report = router.report()
+    cost = sum(t["cost_usd"] for t in report.values())
+    ordered = sorted(latencies)
+    print(f"\n{label}: mean {sum(ordered) / n:.2f} s/recording, p95 {ordered[int(0.95 * (n - 1))]:.2f} s, "
+          f"wall {wall:.1f} s, cost ${cost:.4f} (${cost / n * 1000:.2f} per 1000 recordings)")
+    print(f"  {'llm_id':<22} {'model':<12} {'calls':>6} {'escalated':>10} {'mean s':>7} {'total s':>8} {'cost $':>8}")
+    for llm_id, t in report.items():
+        print(f"  {llm_id:<22} {t['model']:<12} {t['calls']:>6} {t['escalations']:>10} "
+              f"{t['mean_latency']:>7.2f} {t['total_latency']:>8.1f} {t['cost_usd']:>8.4f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=40, help="number of transcripts")
+    parser.add_argument("--fast-failure-rate", type=float, default=0.15)
+    args = parser.parse_args()
+
+    tiers = load_tiers()
+    fast_model = tiers["soap_extraction_fast"].model_name
+    configs = [
+        ("strong only", {"extraction": ["soap_note_strong"]}),
+        ("tiered", {"extraction": ["soap_extraction_fast", "soap_note_strong"]}),
+    ]
+    for label, routes in configs:
+        router = ModelRouter(tiers, routes=routes)
+        client = TieredFakeChatClient(fast_model, args.fast_failure_rate)
+        latencies, wall = await run(router, client, args.n)
+        print_report(label, router, latencies, wall, args.n)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Benchmark: SoapPipeline vs a sequential SoapNoteWorkflow loop over N recordings.
+
+Synthetic recordings (tone bursts separated by silence, written as WAV) are
+processed with the fake recognizer and fake chat client from fake_backends,
+so the run is offline; ffmpeg is still used to decode. The pipeline overlaps
+decoding, STT and the two LLM stages of different recordings, so its wall
+time should approach that of the slowest stage times N rather than the sum
+of all stages times N. Peak RSS is printed to show the bounded queues keep
+decoded PCM from piling up.
+
+Usage:
+    python benchmarks/bench_pipeline.py [-n N] [--seconds S] [--queue-size Q]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from artifact_store import ArtifactStore  # noqa: E402
+from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow  # noqa: E402
+from fake_backends import FakeChatClient, FakeRecognizer  # noqa: E402
+from soap_pipeline import SoapPipeline  # noqa: E402
+from speech_to_text import check_ffmpeg_installed  # noqa: E402
+
+
+def write_synthetic_recording(path, seconds, sample_rate=16000, seed=0):
+    """Alternating 2 s tone bursts and 1 s of silence."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * rng.uniform(150, 300) * t) + 0.02 * rng.standard_normal(t.size)
+    signal[(t % 3.0) >= 2.0] = 0.0
+    pcm = (signal * 32767).astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+
+
+def make_workflow(root):
+    return SoapNoteWorkflow(
+        recognizer=FakeRecognizer(latency=0.5),
+        llm_client=FakeChatClient(overhead=0.5),
+        artifact_store=ArtifactStore(root),
+    )
+
+
+async def run_sequential(audio_files, root):
+    workflow = make_workflow(root)
+    results = []
+    for audio_file in audio_files:
+        results.append(await workflow.execute_workflow(
+            {"mp3_file": audio_file, "use_transcript_cache": False}, executor=None
+        ))
+    return results
+
+
+async def run_pipeline(audio_files, root, queue_size):
+    pipeline = SoapPipeline(make_workflow(root), queue_size=queue_size, options={"use_transcript_cache": False})
+    return await pipeline.run(audio_files)
+
+
+def check(results):
+    failed = [r for r in results if r["status"] != "completed"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} recordings failed: {failed[0]['error']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=8, help="number of recordings")
+    parser.add_argument("--seconds", type=float, default=60.0, help="length of each recording")
+    parser.add_argument("--queue-size", type=int, default=2)
+    args = parser.parse_args()
+
+    if not check_ffmpeg_installed():
+        print("FFmpeg is not installed; cannot run the benchmark.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_files = []
+        for i in range(args.n):
+            path = os.path.join(tmp, f"recording_{i}.wav")
+            write_synthetic_recording(path, args.seconds, seed=i)
+            audio_files.append(path)
+
+        start = time.perf_counter()
+        check(await run_sequential(audio_files, os.path.join(tmp, "sequential")))
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await run_pipeline(audio_files, os.path.join(tmp, "pipeline"), args.queue_size)
+        check(results)
+        pipelined = time.perf_counter() - start
+
+    stages = ("decode", "stt", "extract", "generate")
+    print(f"{args.n} recordings x {args.seconds:.0f} s")
+    print(f"sequential loop: {sequential:6.2f} s  ({args.n / sequential * 60:.1f} recordings/min)")
+    print(f"pipeline:        {pipelined:6.2f} s  ({args.n / pipelined * 60:.1f} recordings/min, "
+          f"{sequential / pipelined:.2f}x)")
+    for stage in stages:
+        mean = sum(r["stage_timings"].get(stage, 0.0) for r in results) / len(results)
+        print(f"  {stage:<9} mean {mean:.2f} s per recording")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
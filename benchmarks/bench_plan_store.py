@@ -0,0 +1,126 @@
+"""
+Benchmark: planning_server storage backends.
+
+In a temporary directory:
+
+1. saves/s: the previous save_plan writes (two plain open/write calls),
+   FilePlanStore without fsync (temp file + rename for each file) and SQLitePlanStore
+   (one WAL transaction per save; synchronous=NORMAL, so fsync happens at
+   WAL checkpoints, whose cost depends on the filesystem)
+2. migrate the file layout into SQLite with plan_store.migrate_directory
+3. search latency: FilePlanStore.search (reads every plan) vs the FTS5 index
+4. startup: load_metadata() on each store
+
+Usage:
+    python benchmarks/bench_plan_store.py [-n N] [--body-kb K]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "example_mcp_servers"))
+
+from plan_store import FilePlanStore, SQLitePlanStore, migrate_directory  # noqa: E402
+
+WORDS = (
+    "budget owner milestone review risk launch vendor contract hiring onboarding "
+    "marketing analytics migration database rollout training audit compliance "
+    "roadmap quarterly retrospective staffing procurement security incident"
+).split()
+QUERIES = ["budget", "vendor contract", "security incident", "migration rollout training"]
+
+
+def make_plans(n, body_kb, seed=0):
+    rng = random.Random(seed)
+    plans = []
+    for i in range(n):
+        words = rng.choices(WORDS, k=int(body_kb * 1024 / 8))
+        body = f"# Plan {i}\n\n" + "\n".join(" ".join(words[j:j + 12]) for j in range(0, len(words), 12))
+        metadata = {"name": f"plan_{i:06d}", "tags": [rng.choice(WORDS)], "created_at": f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"}
+        plans.append((metadata["name"], body, metadata))
+    return plans
+
+
+def legacy_save(plans_dir, name, content, metadata):
+    """The previous save_plan writes."""
+    with open(plans_dir / f"{name}.txt", "w") as f:
+        f.write(content)
+    with open(plans_dir / f"{name}.meta.json", "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def fsync_latency(directory, repeat=10):
+    """Mean write + fsync time for one 4 KB block, to put the SQLite numbers in context."""
+    fd = os.open(directory / "fsync_probe", os.O_WRONLY | os.O_CREAT)
+    try:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            os.write(fd, b"x" * 4096)
+            os.fsync(fd)
+        return (time.perf_counter() - start) / repeat
+    finally:
+        os.close(fd)
+
+
+def timed(call):
+    start = time.perf_counter()
+    result = call()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=5000, help="number of plans")
+    parser.add_argument("--body-kb", type=float, default=4)
+    args = parser.parse_args()
+
+    plans = make_plans(args.n, args.body_kb)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        legacy_dir, files_dir = tmp / "legacy", tmp / "files"
+        legacy_dir.mkdir()
+        files = FilePlanStore(files_dir, fsync=False)
+        sqlite_store = SQLitePlanStore(str(tmp / "plans.sqlite3"))
+
+        # 预热：首轮写入会额外承担文件系统与缓存的冷启动开销
+        (tmp / "warmup").mkdir()
+        for plan in plans:
+            legacy_save(tmp / "warmup", *plan)
+
+        print(f"1. {args.n} saves, ~{args.body_kb:g} KB bodies (fsync here: {fsync_latency(tmp) * 1e3:.1f} ms)")
+        for label, save in (
+            ("previous (2 plain writes)", lambda p: legacy_save(legacy_dir, *p)),
+            ("FilePlanStore (no fsync)", lambda p: files.save(*p)),
+            ("SQLitePlanStore (WAL)", lambda p: sqlite_store.save(*p)),
+        ):
+            elapsed, _ = timed(lambda: [save(plan) for plan in plans])
+            print(f"   {label:<27} {args.n / elapsed:8.0f} saves/s")
+
+        migrated_store = SQLitePlanStore(str(tmp / "migrated.sqlite3"))
+        elapsed, count = timed(lambda: migrate_directory(legacy_dir, migrated_store))
+        print(f"2. migrated {count} plans from the file layout in {elapsed:.2f} s")
+
+        print("3. search latency")
+        for query in QUERIES:
+            scan, scan_results = timed(lambda: files.search(query, 20))
+            fts, fts_results = timed(lambda: migrated_store.search(query, 20))
+            print(f"   {query!r:<30} scan {scan * 1e3:8.1f} ms   FTS5 {fts * 1e3:6.2f} ms"
+                  f"   ({len(scan_results)} / {len(fts_results)} results)")
+
+        print("4. load_metadata()")
+        for label, store in (("FilePlanStore, no snapshot", FilePlanStore(legacy_dir)),
+                             ("FilePlanStore, snapshot", FilePlanStore(legacy_dir)),
+                             ("SQLitePlanStore", migrated_store)):
+            elapsed, metadata = timed(store.load_metadata)
+            print(f"   {label:<27} {elapsed * 1e3:8.1f} ms ({len(metadata)} plans)")
+
+
+if __name__ == "__main__":
+    main()
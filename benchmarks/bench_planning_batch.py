@@ -0,0 +1,111 @@
+"""
+Benchmark: planning_server batch tools over a real stdio MCP session.
+
+Starts example_mcp_servers/planning_server.py as a subprocess with an empty
+temporary PLANS_DIR, connects with the MCP stdio client, and times
+
+- N save_plan calls vs one save_plans call (same plans, fresh names)
+- N planning://plan/{name} reads vs one get_plans call vs one
+  planning://plans?names=... read, with the body cache disabled so every
+  read goes to the store
+
+Only the JSON-RPC round trips are measured; in an agent each single call
+also costs an LLM tool-call turn, which the batch variants save as well.
+
+Usage:
+    python benchmarks/bench_planning_batch.py [-n N] [--store files|sqlite] [--body-kb K]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(ROOT, "example_mcp_servers", "planning_server.py")
+LINE = "- Review the budget with each owner and record the agreed milestones.\n"
+
+
+def make_plans(prefix, n, body_kb):
+    body = "# Plan\n\n" + LINE * max(1, int(body_kb * 1024) // len(LINE))
+    return [{"plan_name": f"{prefix}_{i:04d}", "plan_content": body, "tags": ["bench"]} for i in range(n)]
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - start, result
+
+
+def server_params(plans_dir, store, cache_bytes):
+    env = dict(os.environ, PLANS_DIR=plans_dir, PLAN_STORE=store, PLAN_CACHE_MAX_BYTES=str(cache_bytes))
+    return StdioServerParameters(command=sys.executable, args=[SERVER], env=env)
+
+
+async def run(n, store, body_kb):
+    with tempfile.TemporaryDirectory() as plans_dir, open(os.devnull, "w") as errlog:
+        # 缓存预算为 0：每次读取都走存储，便于比较冷读
+        params = server_params(plans_dir, store, 0)
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                await session.call_tool("list_plans", {"limit": 1})  # 预热
+
+                singles = make_plans("single", n, body_kb)
+                start = time.perf_counter()
+                for plan in singles:
+                    result = await session.call_tool("save_plan", plan)
+                    if result.isError:
+                        raise RuntimeError(result.content)
+                single_save = time.perf_counter() - start
+
+                batch = make_plans("batch", n, body_kb)
+                batch_save = 0.0
+                for i in range(0, n, 100):
+                    elapsed, result = await timed(session.call_tool("save_plans", {"plans": batch[i:i + 100]}))
+                    if result.isError:
+                        raise RuntimeError(result.content)
+                    batch_save += elapsed
+
+                names = [plan["plan_name"] for plan in batch]
+                start = time.perf_counter()
+                for name in names:
+                    await session.read_resource(f"planning://plan/{name}")
+                single_read = time.perf_counter() - start
+
+                get_plans = 0.0
+                for i in range(0, n, 100):
+                    elapsed, _ = await timed(session.call_tool("get_plans", {"names": names[i:i + 100]}))
+                    get_plans += elapsed
+
+                resource_read = 0.0
+                for i in range(0, n, 100):
+                    uri = "planning://plans?names=" + ",".join(names[i:i + 100])
+                    elapsed, _ = await timed(session.read_resource(uri))
+                    resource_read += elapsed
+
+    calls = (n + 99) // 100
+    print(f"{n} plans, ~{body_kb:g} KB each, {store} store, stdio session")
+    print(f"  save:  {n} x save_plan     {single_save * 1e3:8.1f} ms  ({single_save / n * 1e3:.2f} ms/plan)")
+    print(f"         {calls} x save_plans    {batch_save * 1e3:8.1f} ms  ({single_save / batch_save:.1f}x)")
+    print(f"  read:  {n} x planning://plan  {single_read * 1e3:8.1f} ms  ({single_read / n * 1e3:.2f} ms/plan)")
+    print(f"         {calls} x get_plans     {get_plans * 1e3:8.1f} ms  ({single_read / get_plans:.1f}x)")
+    print(f"         {calls} x planning://plans {resource_read * 1e3:5.1f} ms  ({single_read / resource_read:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=100, help="number of plans")
+    parser.add_argument("--store", choices=["files", "sqlite"], default="sqlite")
+    parser.add_argument("--body-kb", type=float, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.n, args.store, args.body_kb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: planning_server list_plans at 100k plans.
+
+Compares the previous list_plans (linear scan over every cached plan, every
+match in one response) with the indexed, paginated list_plans on the same
+in-memory plans: latency per query and response size. Plans are generated
+in memory only; nothing is written to PLANS_DIR.
+
+Usage:
+    python benchmarks/bench_planning_index.py [-n N] [--repeat R]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "example_mcp_servers"))
+
+import planning_server  # noqa: E402
+
+TAGS = [f"tag{i:02d}" for i in range(50)]
+
+
+def populate(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    weights = [1 / (i + 1) for i in range(len(TAGS))]  # 少数标签很常见
+    plans = {}
+    for i in range(n):
+        name = f"plan_{i:06d}"
+        metadata = {
+            "name": name,
+            "tags": sorted(set(rng.choices(TAGS, weights, k=rng.randint(1, 4)))),
+            "created_at": str(start + timedelta(seconds=rng.randrange(365 * 24 * 3600))),
+        }
+        plans[name] = {"content": "", "metadata": metadata, "path": f"plans/{name}.txt"}
+        planning_server.plan_index.add(name, metadata)
+    return plans
+
+
+def scan_list_plans(plans, tag=None):
+    """The previous list_plans body: linear scan, all matches returned."""
+    if tag:
+        filtered = {
+            name: plan for name, plan in plans.items()
+            if tag in plan["metadata"].get("tags", [])
+        }
+    else:
+        filtered = plans
+    plan_list = [
+        {"name": name, "created_at": plan["metadata"].get("created_at", "Unknown"),
+         "tags": plan["metadata"].get("tags", []), "path": plan["path"]}
+        for name, plan in filtered.items()
+    ]
+    return {"success": True, "plans": plan_list, "count": len(plan_list)}
+
+
+def measure(call, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        best = min(best, time.perf_counter() - start)
+    return best, len(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=100_000, help="number of plans")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger("planning_server").setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    plans = populate(args.n)
+    print(f"{args.n} plans indexed in {time.perf_counter() - start:.2f} s")
+
+    def indexed(**kwargs):
+        return lambda: asyncio.run(planning_server.list_plans(**kwargs))
+
+    queries = [
+        ("common tag", {"tag": "tag00"}, True),
+        ("rare tag", {"tag": "tag49"}, True),
+        ("2 tags AND", {"tags": ["tag00", "tag01"]}, False),
+        ("3 tags OR", {"tags": ["tag10", "tag20", "tag30"], "match": "any"}, False),
+        ("one week", {"created_after": "2024-06-01", "created_before": "2024-06-08"}, False),
+        ("tag + month", {"tag": "tag00", "created_after": "2024-03-01", "created_before": "2024-04-01"}, False),
+        ("all, names only", {"fields": ["name"]}, True),
+    ]
+    print(f"{'query':<16} {'matches':>8} {'scan ms':>8} {'scan KB':>9} {'index ms':>9} {'page KB':>8}")
+    for label, kwargs, comparable in queries:
+        elapsed, size = measure(indexed(**kwargs), args.repeat)
+        total = asyncio.run(planning_server.list_plans(**kwargs))["total"]
+        if comparable:
+            scan_elapsed, scan_size = measure(lambda: scan_list_plans(plans, kwargs.get("tag")), args.repeat)
+            scan = f"{scan_elapsed * 1e3:8.1f} {scan_size / 1024:9.0f}"
+        else:
+            scan = f"{'-':>8} {'-':>9}"
+        print(f"{label:<16} {total:>8} {scan} {elapsed * 1e3:9.2f} {size / 1024:8.1f}")
+
+    # 翻页到最后一页：每页耗时与位置无关
+    cursor, pages, start = None, 0, time.perf_counter()
+    while True:
+        page = asyncio.run(planning_server.list_plans(tag="tag00", cursor=cursor, limit=1000, fields=["name"]))
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    print(f"paged through tag00 in {pages} pages of 1000: {(time.perf_counter() - start) * 1e3 / pages:.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
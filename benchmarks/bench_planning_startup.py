@@ -0,0 +1,140 @@
+"""
+Benchmark: planning_server startup and plan body cache.
+
+Writes N plans (body + .meta.json) to a temporary PLANS_DIR, then in a
+fresh subprocess each:
+
+- eager: the previous load_plans() (reproduced below), which read every
+  plan body into memory at import
+- lazy:  importing planning_server, which only indexes metadata; first
+  without a metadata snapshot (every .meta.json parsed), then with the
+  snapshot that run left behind
+
+and reports load time and, in a separate run under tracemalloc, the\nmemory it retains. Finally it serves
+--requests plan_resource reads with Zipf-distributed plan popularity through
+the lazy server and reports the body cache hit ratio for the byte budget.
+
+Usage:
+    python benchmarks/bench_planning_startup.py [-n N] [--body-kb K] [--budget-mb M]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, "example_mcp_servers")
+
+
+def write_plans(plans_dir, n, body_kb, seed=0):
+    rng = random.Random(seed)
+    line = "- Step: review the budget, assign owners and track weekly progress.\n"
+    for i in range(n):
+        name = f"plan_{i:06d}"
+        body = f"# Plan {i}\n\n" + line * max(1, int(body_kb * 1024 * rng.uniform(0.5, 1.5)) // len(line))
+        (plans_dir / f"{name}.txt").write_text(body)
+        metadata = {"name": name, "tags": [f"tag{rng.randrange(20):02d}"], "created_at": f"2024-01-01 00:00:{i % 60:02d}"}
+        (plans_dir / f"{name}.meta.json").write_text(json.dumps(metadata, indent=2))
+
+
+def legacy_load_plans(plans_dir):
+    """The previous load_plans(): every plan body and its metadata read at import."""
+    plans_cache = {}
+    for plan_path in plans_dir.glob("*.txt"):
+        plan_name = plan_path.stem
+        metadata_path = plans_dir / f"{plan_name}.meta.json"
+        with open(plan_path, "r") as f:
+            plan_content = f.read()
+        metadata = {}
+        if metadata_path.exists():
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+        plans_cache[plan_name] = {"content": plan_content, "metadata": metadata, "path": str(plan_path)}
+    return plans_cache
+
+
+def child(mode, plans_dir, trace):
+    """Runs in a subprocess: load once, print seconds (or retained MB under tracemalloc) as JSON."""
+    sys.path.insert(0, SERVER_DIR)
+    import mcp.server.fastmcp  # noqa: F401  导入开销不计入
+
+    if trace == "1":
+        tracemalloc.start()
+    start = time.perf_counter()
+    if mode == "eager":
+        loaded = legacy_load_plans(Path(plans_dir))
+    else:
+        os.environ["PLANS_DIR"] = plans_dir
+        import planning_server
+        loaded = planning_server.plan_index
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] if trace == "1" else 0
+    print(json.dumps({"seconds": elapsed, "mb": retained / 2**20, "plans": len(loaded)}))
+
+
+def run_child(mode, plans_dir, trace=False):
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", mode, plans_dir, "1" if trace else "0"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def serve(plans_dir, n, requests, budget_mb, seed=1):
+    os.environ["PLANS_DIR"] = plans_dir
+    os.environ["PLAN_CACHE_MAX_BYTES"] = str(int(budget_mb * 2**20))
+    sys.path.insert(0, SERVER_DIR)
+    import planning_server
+
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(n)]
+    names = [f"plan_{i:06d}" for i in rng.choices(range(n), weights, k=requests)]
+    start = time.perf_counter()
+    for name in names:
+        planning_server.plan_resource(name)
+    elapsed = time.perf_counter() - start
+    stats = planning_server.plan_bodies.stats()
+    print(f"{requests} reads, Zipf popularity, {budget_mb} MB budget: hit ratio {stats['hit_ratio']:.1%}, "
+          f"{stats['entries']} bodies / {stats['bytes'] / 2**20:.1f} MB cached, "
+          f"{elapsed / requests * 1e6:.0f} us/read")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=20_000, help="number of plans")
+    parser.add_argument("--body-kb", type=float, default=8, help="mean plan body size")
+    parser.add_argument("--budget-mb", type=float, default=32)
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    import logging
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as plans_dir:
+        write_plans(Path(plans_dir), args.n, args.body_kb)
+        print(f"{args.n} plans, ~{args.body_kb:g} KB bodies")
+        snapshot = Path(plans_dir) / ".plan_index.json"
+        for mode, label in (("eager", "eager"), ("lazy", "lazy, no snapshot"), ("lazy", "lazy, snapshot")):
+            if label == "lazy, no snapshot" and snapshot.exists():
+                snapshot.unlink()
+            memory = run_child(mode, plans_dir, trace=True)
+            if label == "lazy, no snapshot":
+                snapshot.unlink()
+            result = run_child(mode, plans_dir)
+            print(f"  {label:<18} startup {result['seconds'] * 1e3:8.0f} ms, retains {memory['mb']:7.1f} MB "
+                  f"({result['plans']} plans)")
+        serve(plans_dir, args.n, args.requests, args.budget_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: picking up plans written by another process.
+
+Fills a temporary PLANS_DIR with N plans, imports planning_server on it
+with the given watcher mode, then has a second writer (FilePlanStore
+without fsync, standing in for another server instance) save or delete K
+plans at a time. Reports how long until they are visible in list_plans,
+compared with what restarting the server costs: a full load_plans()
+into a fresh index. Also reports the CPU time of one polling scan, the
+per-interval cost of the fallback watcher.
+
+Usage:
+    python benchmarks/bench_planning_watch.py [-n N] [-k K] [--mode inotify|poll]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "example_mcp_servers"))
+
+
+def metadata_for(name, round_):
+    return {"name": name, "tags": [f"round{round_}"], "created_at": f"2024-02-01 00:00:{round_ % 60:02d}"}
+
+
+def wait_until(condition, timeout=30.0):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("change not picked up")
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=20_000, help="plans in the directory")
+    parser.add_argument("-k", type=int, default=10, help="plans changed per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mode", choices=["inotify", "poll"], default="inotify")
+    parser.add_argument("--interval", type=float, default=1.0, help="polling interval (poll mode)")
+    args = parser.parse_args()
+
+    plans_dir = tempfile.mkdtemp()
+    os.environ.update(PLANS_DIR=plans_dir, PLANS_WATCH=args.mode, PLANS_WATCH_INTERVAL=str(args.interval))
+    from plan_store import FilePlanStore
+
+    writer = FilePlanStore(plans_dir, fsync=False)
+    body = "# Plan\n\n" + "- Agree the budget and owners for each milestone.\n" * 60
+    writer.save_many((f"plan_{i:06d}", body, metadata_for(f"plan_{i:06d}", 0)) for i in range(args.n))
+
+    logging.disable(logging.INFO)
+    import planning_server
+    from plan_index import PlanIndex
+    from plan_watch import PollingWatcher
+
+    def visible(name, round_):
+        return (planning_server.plan_index.get(name) or {}).get("tags") == [f"round{round_}"]
+
+    print(f"{args.n} plans, {args.mode} watcher, {args.k} plans changed per round")
+    latencies = []
+    for round_ in range(1, args.rounds + 1):
+        names = [f"plan_{(round_ * args.k + i) % args.n:06d}" for i in range(args.k)]
+        writer.save_many((name, body, metadata_for(name, round_)) for name in names)
+        latencies.append(wait_until(lambda: all(visible(name, round_) for name in names)))
+    print(f"  external save visible after   {sum(latencies) / len(latencies) * 1e3:7.1f} ms (mean of {args.rounds})")
+
+    doomed = [f"plan_{i:06d}" for i in range(args.n - args.k, args.n)]
+    for name in doomed:
+        os.remove(os.path.join(plans_dir, f"{name}.txt"))
+        os.remove(os.path.join(plans_dir, f"{name}.meta.json"))
+    elapsed = wait_until(lambda: not any(name in planning_server.plan_index for name in doomed))
+    print(f"  external delete visible after {elapsed * 1e3:7.1f} ms")
+    listed = asyncio.run(planning_server.list_plans(limit=1))["total"]
+    print(f"  list_plans total {listed} (expected {args.n - args.k})")
+
+    # 以前只能重启：全量重建索引
+    index = PlanIndex()
+    start = time.perf_counter()
+    index.add_many(FilePlanStore(plans_dir).load_metadata().items())
+    print(f"  restart instead: load_plans   {(time.perf_counter() - start) * 1e3:7.1f} ms (+ process start)")
+
+    poller = PollingWatcher(plans_dir, lambda names: None)
+    start = time.process_time()
+    poller._scan()
+    print(f"  one polling scan              {(time.process_time() - start) * 1e3:7.1f} ms CPU")
+    print(f"  watcher stats: {planning_server.plan_watcher.stats()}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        if os.environ.get("PLANS_DIR", "").startswith(tempfile.gettempdir()):
+            shutil.rmtree(os.environ["PLANS_DIR"], ignore_errors=True)
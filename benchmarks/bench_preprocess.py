@@ -0,0 +1,93 @@
+"""
+Benchmark: serial vs process-pool audio preprocessing (decode, resample,
+loudness normalization, VAD) over N synthetic recordings.
+
+The serial baseline runs preprocess_file() in this process one file at a
+time; the pool run uses AudioPreprocessor sized to the host's cores. Also
+runs SoapPipeline end to end with and without the preprocessor, using the
+fake backends.
+
+Usage:
+    python benchmarks/bench_preprocess.py [-n N] [--seconds S] [--workers W]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from audio_preprocess import AudioPreprocessor, preprocess_file  # noqa: E402
+from bench_pipeline import make_workflow, write_synthetic_recording  # noqa: E402
+from soap_pipeline import SoapPipeline  # noqa: E402
+from speech_to_text import check_ffmpeg_installed  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=8, help="number of recordings")
+    parser.add_argument("--seconds", type=float, default=300.0, help="length of each recording")
+    parser.add_argument("--workers", type=int, default=None, help="pool size (default: CPU cores)")
+    args = parser.parse_args()
+
+    if not check_ffmpeg_installed():
+        print("FFmpeg is not installed; cannot run the benchmark.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_files = []
+        for i in range(args.n):
+            path = os.path.join(tmp, f"recording_{i}.wav")
+            write_synthetic_recording(path, args.seconds, seed=i)
+            audio_files.append(path)
+        out_dir = os.path.join(tmp, "npy")
+        os.makedirs(out_dir)
+
+        start = time.perf_counter()
+        serial_results = [preprocess_file(path, out_dir) for path in audio_files]
+        serial = time.perf_counter() - start
+
+        with AudioPreprocessor(max_workers=args.workers) as preprocessor:
+            start = time.perf_counter()
+            pooled_results = list(preprocessor.map(audio_files))
+            pooled = time.perf_counter() - start
+            workers = preprocessor.max_workers
+
+            for a, b in zip(serial_results, pooled_results):
+                if not (a.load() == b.load()).all():
+                    raise RuntimeError(f"pool output differs from serial output for {a.source}")
+            kept = sum(r.kept_seconds for r in pooled_results) / sum(r.duration_seconds for r in pooled_results)
+            npy_bytes = sum(os.path.getsize(r.path) for r in pooled_results)
+
+            pipeline = SoapPipeline(make_workflow(os.path.join(tmp, "runs")),
+                                    options={"use_transcript_cache": False})
+            start = time.perf_counter()
+            asyncio.run(pipeline.run(audio_files))
+            plain_pipeline = time.perf_counter() - start
+
+            pipeline = SoapPipeline(make_workflow(os.path.join(tmp, "runs")), preprocessor=preprocessor,
+                                    stage_workers={"decode": workers}, options={"use_transcript_cache": False})
+            start = time.perf_counter()
+            results = asyncio.run(pipeline.run(audio_files))
+            pre_pipeline = time.perf_counter() - start
+            failed = [r for r in results if r["status"] != "completed"]
+            if failed:
+                raise RuntimeError(f"{len(failed)} recordings failed: {failed[0]['error']}")
+
+    audio_minutes = args.n * args.seconds / 60
+    print(f"{args.n} recordings x {args.seconds:.0f} s, {workers} worker processes")
+    print(f"serial preprocessing: {serial:6.2f} s  ({audio_minutes / serial:.1f} audio min/s)")
+    print(f"pool preprocessing:   {pooled:6.2f} s  ({audio_minutes / pooled:.1f} audio min/s, {serial / pooled:.2f}x)")
+    print(f"speech kept by VAD: {kept:.0%}, .npy output {npy_bytes / 1e6:.1f} MB")
+    print(f"pipeline without preprocessor: {plain_pipeline:6.2f} s")
+    print(f"pipeline with preprocessor:    {pre_pipeline:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
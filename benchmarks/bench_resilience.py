@@ -0,0 +1,240 @@
+"""
+Benchmark: LLM calls against a local fake server that injects latency and 429s.
+
+The fake server speaks the chat-completions endpoint, enforces its own
+requests-per-second limit (answering 429 with Retry-After and
+x-ratelimit-* headers), and gives a small share of requests a long tail
+latency. Two loads are run:
+
+    burst     N calls at once, well over the server limit:
+              raw (plain client, no retries) vs retry (ResilientAsyncClient:
+              deadlines, backoff, header-driven pacing)
+    steady    N calls at half the server limit:
+              retry vs hedged (as retry, plus a duplicate request after
+              --hedge-after seconds)
+
+and the success count, latency percentiles and retry/hedge counts are
+printed. By default a small stdlib HTTP client stands in for the SDK; with
+--sdk the real AsyncOpenAI client is pointed at the fake server.
+
+Usage:
+    python benchmarks/bench_resilience.py [-n N] [--server-rate R] [--sdk]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import ResilientAsyncClient, RetryPolicy, TokenBucket  # noqa: E402
+
+
+class FakeLLMServer:
+    """Chat-completions server with a request-rate limit and injected tail latency."""
+
+    def __init__(self, rate=10.0, latency=0.2, tail_latency=3.0, tail_ratio=0.05, seed=0):
+        self.rate = rate
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_ratio = tail_ratio
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+
+    def _admit(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.requests += 1
+            admitted = self.tokens >= 1
+            if admitted:
+                self.tokens -= 1
+            else:
+                self.rejected += 1
+            tail = self.random.random() < self.tail_ratio
+            reset = (self.rate - self.tokens) / self.rate
+            return admitted, tail, int(self.tokens), reset
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                admitted, tail, remaining, reset = server._admit()
+                headers = {
+                    "x-ratelimit-limit-requests": str(int(server.rate)),
+                    "x-ratelimit-remaining-requests": str(remaining),
+                    "x-ratelimit-reset-requests": f"{int(reset * 1000)}ms",
+                }
+                if not admitted:
+                    headers["retry-after-ms"] = str(int(1000 / server.rate))
+                    return self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, headers)
+                time.sleep(server.tail_latency if tail else server.latency)
+                content = "S: fake\nO: fake\nA: fake\nP: fake"
+                self._reply(200, {
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model", "gpt-4"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+                }, headers)
+
+            def _reply(self, status, data, headers):
+                payload = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status_code, headers, message):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers)
+
+
+class _RawResponse:
+    def __init__(self, headers, data):
+        self.headers = headers
+        self._data = data
+
+    def parse(self):
+        message = SimpleNamespace(**self._data["choices"][0]["message"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class StdlibChatClient:
+    """Minimal async chat-completions client on urllib (requests run in threads)."""
+
+    def __init__(self, base_url):
+        self.url = base_url + "/chat/completions"
+        raw = SimpleNamespace(create=self._create_raw)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create, with_raw_response=raw))
+
+    def _post(self, kwargs):
+        request = urllib.request.Request(self.url, data=json.dumps(kwargs).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                headers = {key.lower(): value for key, value in response.headers.items()}
+                return _RawResponse(headers, json.loads(response.read()))
+        except urllib.error.HTTPError as e:
+            headers = {key.lower(): value for key, value in e.headers.items()}
+            raise HTTPStatusError(e.code, headers, e.read().decode("utf-8", errors="replace"))
+
+    async def _create_raw(self, **kwargs):
+        return await asyncio.to_thread(self._post, kwargs)
+
+    async def _create(self, **kwargs):
+        return (await self._create_raw(**kwargs)).parse()
+
+
+async def run_calls(client, n, interval=0.0):
+    """Start ``n`` calls, ``interval`` seconds apart (0: all at once)."""
+    async def one(delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        try:
+            await client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "hi"}])
+            return time.perf_counter() - start
+        except Exception:
+            return None
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i * interval) for i in range(n)))
+    return latencies, time.perf_counter() - start
+
+
+def report(label, latencies, wall, stats=None):
+    ok = sorted(l for l in latencies if l is not None)
+    pct = (lambda q: ok[min(len(ok) - 1, int(q * len(ok)))]) if ok else (lambda q: float("nan"))
+    extra = ""
+    if stats:
+        extra = f"  retries={stats['retries']} 429s={stats['rate_limited']} hedges={stats['hedges']} " \
+                f"hedge wins={stats['hedge_wins']}"
+    print(f"{label:<7} ok {len(ok):>3}/{len(latencies):<3} p50 {pct(0.5):5.2f} s  p95 {pct(0.95):5.2f} s  "
+          f"max {ok[-1] if ok else float('nan'):5.2f} s  wall {wall:5.2f} s{extra}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=60, help="calls per run")
+    parser.add_argument("--server-rate", type=float, default=10.0, help="server limit, requests/s")
+    parser.add_argument("--hedge-after", type=float, default=0.6)
+    parser.add_argument("--sdk", action="store_true", help="use openai.AsyncOpenAI against the fake server")
+    args = parser.parse_args()
+    logging.getLogger("resilience").setLevel(logging.ERROR)
+
+    with FakeLLMServer(rate=args.server_rate) as server:
+        def make_client():
+            if args.sdk:
+                from openai import AsyncOpenAI
+
+                return AsyncOpenAI(base_url=server.url, api_key="fake", max_retries=0)
+            return StdlibChatClient(server.url)
+
+        def resilient(hedge_after=None):
+            return ResilientAsyncClient(
+                make_client(), timeout=10, deadline=60, retry=RetryPolicy(max_attempts=8),
+                bucket=TokenBucket(), hedge_after=hedge_after,
+            )
+
+        print(f"server limit {args.server_rate:.0f} req/s, "
+              f"{server.tail_ratio:.0%} of requests take {server.tail_latency:.0f} s")
+        print(f"\nburst: {args.n} calls at once")
+        latencies, wall = await run_calls(make_client(), args.n)
+        report("raw", latencies, wall)
+        await asyncio.sleep(1.5)
+        client = resilient()
+        latencies, wall = await run_calls(client, args.n)
+        report("retry", latencies, wall, client.stats.as_dict())
+        await asyncio.sleep(1.5)
+
+        # 低于限速的稳定负载下比较尾延迟
+        interval = 2.0 / args.server_rate
+        print(f"\nsteady: {args.n} calls at {1 / interval:.0f} req/s")
+        for label, hedge_after in (("retry", None), ("hedged", args.hedge_after)):
+            client = resilient(hedge_after)
+            latencies, wall = await run_calls(client, args.n, interval)
+            report(label, latencies, wall, client.stats.as_dict())
+            await asyncio.sleep(1.5)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Benchmark: SOAP jobs submitted to the service over HTTP with fake backends.
+
+Starts soap_service in-process on a free port with the local fake recognizer
+and chat client, submits N jobs through POST /jobs, polls until they finish,
+fetches each job's soap_note.html artifact and prints per-job latency,
+throughput and the /metrics snapshot. ffmpeg is used to decode the input.
+
+Usage:
+    python benchmarks/bench_service.py [audio_file] [-n N] [--workers W]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from soap_service import SoapService, build_runner, serve  # noqa: E402
+from speech_to_text import check_ffmpeg_installed  # noqa: E402
+
+
+def request(base, path, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as response:
+        body = response.read()
+    return json.loads(body) if response.headers.get_content_type() == "application/json" else body
+
+
+def run_client(base, audio_file, n):
+    start = time.perf_counter()
+    job_ids = [request(base, "/jobs", {"audio_file": audio_file, "options": {"use_transcript_cache": False}})["job_id"]
+               for _ in range(n)]
+    pending, jobs = set(job_ids), {}
+    while pending:
+        time.sleep(0.1)
+        for job_id in list(pending):
+            job = request(base, f"/jobs/{job_id}")
+            if job["status"] not in ("queued", "running"):
+                jobs[job_id] = job
+                pending.discard(job_id)
+    elapsed = time.perf_counter() - start
+
+    failed = [job for job in jobs.values() if job["status"] != "completed"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} jobs failed: {failed[0]['error']}")
+    for job_id in job_ids:
+        if "soap_note.html" not in request(base, f"/jobs/{job_id}/artifacts")["artifacts"]:
+            raise RuntimeError(f"job {job_id} has no soap_note.html artifact")
+        request(base, f"/jobs/{job_id}/artifacts/soap_note.html")
+    return elapsed, jobs, request(base, "/metrics")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("audio_file", nargs="?", default=os.path.join(ROOT, "Record_test.mp3"))
+    parser.add_argument("-n", type=int, default=8, help="number of jobs")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if not check_ffmpeg_installed():
+        print("FFmpeg is not installed; cannot run the benchmark.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SOAP_ARTIFACT_ROOT"] = tmp
+        ready = threading.Event()
+        loop = asyncio.new_event_loop()
+        stop = asyncio.Event()
+        service = SoapService(build_runner(fake=True), workers=args.workers)
+        server_thread = threading.Thread(
+            target=loop.run_until_complete, args=(serve(service, port=0, ready=ready, stop=stop),)
+        )
+        server_thread.start()
+        ready.wait()
+        try:
+            elapsed, jobs, metrics = run_client(f"http://127.0.0.1:{service.port}", os.path.abspath(args.audio_file), args.n)
+        finally:
+            loop.call_soon_threadsafe(stop.set)
+            server_thread.join()
+
+    latencies = sorted(job["finished_at"] - job["submitted_at"] for job in jobs.values())
+    print(f"{args.n} jobs, {args.workers} workers: {elapsed:.2f} s ({args.n / elapsed * 60:.1f} jobs/min)")
+    print(f"job latency: mean {sum(latencies) / len(latencies):.2f} s, max {latencies[-1]:.2f} s")
+    print(f"queue depth at end: {metrics['queue_depth']}, jobs: {metrics['jobs']}")
+    for stage, s in metrics["stages"].items():
+        print(f"  {stage:<7} calls={s['count']:<5} mean={s['mean']:.2f} s p95={s['p95']:.2f} s "
+              f"mean wait={s['mean_wait']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Microbenchmark: SOAP note text -> HTML.
+
+Compares the previous per-line renderer (reproduced below: up to twelve
+line.upper() calls per line across four header branches, prefix-stripping
+loops and hand-built section markup) with soap_sections.parse_soap_note +
+soap_html.render_soap_html, on large synthetic notes.
+
+Usage:
+    python benchmarks/bench_soap_render.py [--notes N] [--lines L] [--repeat R]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from soap_html import HTML_HEAD, render_footer, render_soap_html  # noqa: E402
+from soap_sections import parse_soap_note  # noqa: E402
+
+HEADER_FORMS = ["{l}: ", "{w}: ", "{l} ({w}): "]
+WORDS = ["Subjective", "Objective", "Assessment", "Plan"]
+FILLER = [
+    "Patient reports intermittent frontal headaches, worse in the evening.",
+    "Denies fever, nausea or visual aura; sleep has been poor for a week.",
+    "Blood pressure 148/92 seated, 132/84 standing; pulse 78 and regular.",
+    "Consider ambulatory blood pressure monitoring and a fundoscopic exam.",
+    "- Continue current medication and keep a headache diary.",
+]
+
+# 旧实现中各段的判断前缀与需去除的标题前缀
+_LEGACY_BRANCHES = [
+    ("subjective", "Subjective", ("S:", "SUBJECTIVE", "S (SUBJECTIVE)"), ["S:", "SUBJECTIVE:", "S (SUBJECTIVE):"]),
+    ("objective", "Objective", ("O:", "OBJECTIVE", "O (OBJECTIVE)"), ["O:", "OBJECTIVE:", "O (OBJECTIVE):"]),
+    ("assessment", "Assessment", ("A:", "ASSESSMENT", "A (ASSESSMENT)"), ["A:", "ASSESSMENT:", "A (ASSESSMENT):"]),
+    ("plan", "Plan", ("P:", "PLAN", "P (PLAN)"), ["P:", "PLAN:", "P (PLAN):"]),
+]
+
+
+def legacy_render(soap_content):
+    """The renderer this benchmark replaces, kept for comparison."""
+    html_content = [HTML_HEAD]
+    current_section = None
+    current_section_content = []
+    for line in soap_content.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        for section, title, starts, prefixes in _LEGACY_BRANCHES:
+            # 旧实现每个分支对同一行调用三次 upper()
+            if (line.upper().startswith(starts[0]) or line.upper().startswith(starts[1])
+                    or line.upper().startswith(starts[2])):
+                if current_section:
+                    html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
+                    html_content.append('        </div>')
+                current_section = section
+                html_content.append(f'        <div class="section {current_section}">')
+                html_content.append('            <div class="section-header">')
+                html_content.append('                <div class="section-icon"></div>')
+                html_content.append(f'                {title}')
+                html_content.append('            </div>')
+                content = line
+                for prefix in prefixes:
+                    if content.upper().startswith(prefix):
+                        content = content[len(prefix):].strip()
+                        break
+                current_section_content = [content] if content else []
+                break
+        else:
+            if current_section and line and not line.upper().startswith("SOAP NOTE"):
+                current_section_content.append(line)
+    if current_section:
+        html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
+        html_content.append('        </div>')
+    html_content.append(render_footer())
+    return "\n".join(html_content)
+
+
+def synthetic_note(lines, rng):
+    out = ["SOAP Note", ""]
+    per_section = max(1, lines // 4)
+    for letter, word in zip("SOAP", WORDS):
+        out.append(rng.choice(HEADER_FORMS).format(l=letter, w=word) + rng.choice(FILLER))
+        out.extend(rng.choice(FILLER) for _ in range(per_section - 1))
+        out.append("")
+    return "\n".join(out)
+
+
+def time_it(render, notes, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for note in notes:
+            render(note)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=2000, help="lines per note")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    notes = [synthetic_note(args.lines, rng) for _ in range(args.notes)]
+    timestamp = "2000-01-01 00:00:00"
+    legacy = legacy_render(notes[0]).rsplit("Generated on", 1)[0]
+    current = render_soap_html(parse_soap_note(notes[0]), timestamp=timestamp).rsplit("Generated on", 1)[0]
+    if legacy != current:
+        raise RuntimeError("renderers disagree on the synthetic note")
+
+    total_lines = sum(note.count("\n") + 1 for note in notes)
+    old = time_it(legacy_render, notes, args.repeat)
+    new = time_it(lambda note: render_soap_html(parse_soap_note(note), timestamp=timestamp), notes, args.repeat)
+    parse_only = time_it(parse_soap_note, notes, args.repeat)
+    print(f"{args.notes} notes x {args.lines} lines ({total_lines} lines), best of {args.repeat}")
+    print(f"legacy renderer:          {old * 1e3:8.1f} ms  ({old / total_lines * 1e9:6.0f} ns/line)")
+    print(f"parse + cached template:  {new * 1e3:8.1f} ms  ({new / total_lines * 1e9:6.0f} ns/line, {old / new:.2f}x)")
+    print(f"  of which parsing:       {parse_only * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: extraction reply parsing and validation.
+
+1. Parse rate on a corpus of typical malformed replies (markdown fences,
+   preamble, trailing commas, truncation, Python literals): bare json.loads
+   vs structured_output.parse_extraction.
+2. Validation time per document: the compiled validator vs the jsonschema
+   package (if installed).
+3. N extractions through ModelRouter against a fake client whose replies are
+   malformed at --malformed-rate (half of them beyond repair). Counts the
+   runs that would have failed with json.loads, and the re-asks the router
+   spent instead.
+
+Usage:
+    python benchmarks/bench_structured_output.py [-n N] [--malformed-rate R]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SOAP_LLM_CACHE"] = "off"
+
+from fake_backends import FAKE_EXTRACTION, SAMPLE_TRANSCRIPT, FakeChatClient  # noqa: E402
+from model_router import ModelRouter, load_tiers  # noqa: E402
+from soap_prompts import EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt  # noqa: E402
+from structured_output import EXTRACTION_SCHEMA, parse_extraction, validate_extraction  # noqa: E402
+
+GOOD = json.dumps(FAKE_EXTRACTION, indent=2)
+REPAIRABLE = [
+    f"```json\n{GOOD}\n```",
+    f"Here is the extracted information:\n\n{GOOD}\n\nLet me know if you need anything else.",
+    GOOD.replace('"\n  ]', '",\n  ]'),  # 列表末尾多余逗号
+    GOOD[:-40],  # 输出被截断
+    str(FAKE_EXTRACTION),  # Python dict 写法
+]
+UNREPAIRABLE = [
+    "The patient has headaches, dizziness and blurry vision; possible migraine or hypertension.",
+    json.dumps({"symptoms": FAKE_EXTRACTION["symptom_raw"]}),
+]
+
+
+class MalformingChatClient:
+    """FakeChatClient whose extraction replies are malformed at ``rate``; re-asks get a clean reply.
+
+    ``bare_failures`` counts first replies that json.loads plus validation would reject.
+    """
+
+    def __init__(self, rate, seed=0):
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.bare_failures = 0
+        self.client = FakeChatClient(overhead=0.05, per_prompt_token=0, per_completion_token=0.0005)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, model, messages, **params):
+        response = await self.client.chat.completions.create(model=model, messages=messages, **params)
+        is_reask = messages[-1]["role"] == "user" and "could not be used" in messages[-1]["content"]
+        if not is_reask and self.random.random() < self.rate:
+            pool = REPAIRABLE if self.random.random() < 0.5 else UNREPAIRABLE
+            response.choices[0].message.content = self.random.choice(pool)
+        if not is_reask:
+            self.bare_failures += not bare_parse(response.choices[0].message.content)
+        return response
+
+
+def bare_parse(content):
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return False
+    return not validate_extraction(data)
+
+
+def parse_rates():
+    print("1. parse rate on malformed replies")
+    for label, corpus in (("repairable", REPAIRABLE), ("unrepairable", UNREPAIRABLE)):
+        bare = sum(bare_parse(c) for c in corpus)
+        repaired = sum(not parse_extraction(c)[1] for c in corpus)
+        print(f"   {label:<13} {len(corpus)} replies: json.loads {bare}/{len(corpus)}, "
+              f"parse_extraction {repaired}/{len(corpus)}")
+
+
+def validation_speed(repeat=20000):
+    print("2. validation time per document")
+    documents = [FAKE_EXTRACTION, {"symptom_raw": "headache"}, {**FAKE_EXTRACTION, "possible_conditions": [1, 2]}]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for doc in documents:
+            validate_extraction(doc)
+    compiled = (time.perf_counter() - start) / (repeat * len(documents))
+    print(f"   compiled validator   {compiled * 1e6:6.2f} us")
+    try:
+        import jsonschema
+    except ImportError:
+        print("   jsonschema not installed; skipped")
+        return
+    validator = jsonschema.Draft7Validator(EXTRACTION_SCHEMA)
+    start = time.perf_counter()
+    for _ in range(repeat // 10):
+        for doc in documents:
+            list(validator.iter_errors(doc))
+    reference = (time.perf_counter() - start) / (repeat // 10 * len(documents))
+    print(f"   jsonschema           {reference * 1e6:6.2f} us  ({reference / compiled:.0f}x slower)")
+
+
+async def end_to_end(n, rate):
+    print(f"3. {n} extractions, {rate:.0%} malformed replies")
+    tiers = load_tiers()
+    router = ModelRouter(tiers, routes={"extraction": ["soap_note_strong"]})
+    client = MalformingChatClient(rate)
+    failures = 0
+    for i in range(n):
+        transcript = f"{SAMPLE_TRANSCRIPT} Visit {i}."
+        messages = [
+            {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+            {"role": "user", "content": build_extraction_prompt(transcript)},
+        ]
+        try:
+            await router.extract(client, transcript, messages)
+        except ValueError:
+            failures += 1
+    stats = router.report()["soap_note_strong"]
+    print(f"   json.loads: {client.bare_failures} runs failed (each a full STT + LLM re-run)")
+    print(f"   router:     {failures} failed, {stats['repairs']} repaired locally, "
+          f"{stats['reasks']} re-asks ({stats['calls']} calls for {n} extractions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=100, help="number of extractions")
+    parser.add_argument("--malformed-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    parse_rates()
+    validation_speed()
+    asyncio.run(end_to_end(args.n, args.malformed_rate))
+
+
+if __name__ == "__main__":
+    main()
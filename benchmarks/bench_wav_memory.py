@@ -0,0 +1,102 @@
+"""
+Benchmark: peak RSS of transcribing a long WAV with three ways of reading it.
+
+    read   whole file read into memory and copied for upload (the original
+           transcribe_speech behaviour)
+    wave   wave.readframes() in fixed-size chunks
+    mmap   wav_reader.MappedWav views (current transcribe_speech)
+
+Each mode runs in its own subprocess on the same synthetic recording (tone
+bursts and silence, 16 kHz mono) with an instant fake recognizer, and
+reports that process's peak RSS.
+
+Usage:
+    python benchmarks/bench_wav_memory.py [--minutes M]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("read", "wave", "mmap")
+CHUNK_BYTES = 16 * 1024
+
+
+def write_long_recording(path, seconds, sample_rate=16000):
+    """Tone bursts and silence, written one minute at a time so this process stays small.
+
+    The peak RSS of the parent carries over to the child processes on Linux,
+    so the recording must not be built in memory here.
+    """
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        for block_start in range(0, int(seconds), 60):
+            t = block_start + np.arange(int(min(60, seconds - block_start) * sample_rate)) / sample_rate
+            signal = 0.3 * np.sin(2 * np.pi * 220 * t)
+            signal[(t % 3.0) >= 2.0] = 0.0
+            wf.writeframes((signal * 32767).astype("<i2").tobytes())
+
+
+def run_mode(mode, wav_path):
+    from fake_backends import FakeRecognizer
+    from speech_to_text import transcribe_pcm_segments, transcribe_speech
+    from transcription_engine import stitch_transcripts
+
+    recognizer = FakeRecognizer(latency=0)
+    if mode == "mmap":
+        return transcribe_speech(wav_path, recognizer=recognizer, use_cache=False)
+
+    with wave.open(wav_path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        if mode == "read":
+            content = wav_file.readframes(wav_file.getnframes())
+            upload = bytes(bytearray(content))  # RecognitionAudio(content=...) 的副本
+            chunks = (upload[i:i + CHUNK_BYTES] for i in range(0, len(upload), CHUNK_BYTES))
+        else:
+            chunks = iter(lambda: wav_file.readframes(CHUNK_BYTES // 2), b"")
+        return stitch_transcripts(transcribe_pcm_segments(chunks, sample_rate, recognizer))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60.0, help="length of the synthetic recording")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "WAV"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, wav_path = args.child
+        start = time.perf_counter()
+        transcript = run_mode(mode, wav_path)
+        elapsed = time.perf_counter() - start
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{peak_mb:.1f} {elapsed:.2f} {len(transcript)}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wav_path = os.path.join(tmp, "long.wav")
+        write_long_recording(wav_path, args.minutes * 60)
+        size_mb = os.path.getsize(wav_path) / 1e6
+        print(f"{args.minutes:.0f} min recording, {size_mb:.0f} MB WAV")
+        print(f"{'mode':<6} {'peak RSS MB':>12} {'seconds':>8}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, wav_path],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            print(f"{mode:<6} {float(output[0]):>12.1f} {float(output[1]):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
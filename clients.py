@@ -0,0 +1,125 @@
+"""
+Shared, lazily constructed API clients.
+
+Clients are created on first use and reused for the rest of the process, so
+importing a module never opens connections or reads credentials. OpenAI
+clients share a bounded keep-alive connection pool, which a long-running
+process (see soap_service.py) keeps warm between jobs. They are wrapped in
+the retry / deadline / rate-limit layer from resilience.py, which replaces
+the SDK's own retries.
+"""
+
+import os
+import threading
+
+from dotenv import load_dotenv
+
+MAX_CONNECTIONS_ENV_VAR = "SOAP_HTTP_MAX_CONNECTIONS"
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_TIMEOUT_SECONDS = 120.0
+
+# 单次请求超时、整体截止时间、最大尝试次数、对冲延迟（秒）与初始限速（请求/秒）
+LLM_TIMEOUT_ENV_VAR = "SOAP_LLM_TIMEOUT"
+LLM_DEADLINE_ENV_VAR = "SOAP_LLM_DEADLINE"
+LLM_MAX_ATTEMPTS_ENV_VAR = "SOAP_LLM_MAX_ATTEMPTS"
+LLM_HEDGE_AFTER_ENV_VAR = "SOAP_LLM_HEDGE_AFTER"
+LLM_RATE_ENV_VAR = "SOAP_LLM_RATE"
+
+_clients = {}
+_lock = threading.RLock()  # 工厂函数内部可能再取共享对象
+
+
+def _openai_api_key():
+    # 加载 .env 文件中的环境变量
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("Cannot find OPENAI_API_KEY, please set the environment variable or provide it in the .env file")
+    return api_key
+
+
+def _get_or_create(name, factory):
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def _llm_bucket():
+    """Token bucket shared by the sync and async OpenAI clients (same account limits)."""
+    from resilience import TokenBucket
+
+    rate = os.getenv(LLM_RATE_ENV_VAR)
+    return _get_or_create("llm_bucket", lambda: TokenBucket(float(rate) if rate else None))
+
+
+def _resilience_options():
+    from resilience import RetryPolicy
+
+    hedge_after = os.getenv(LLM_HEDGE_AFTER_ENV_VAR)
+    return dict(
+        timeout=float(os.getenv(LLM_TIMEOUT_ENV_VAR, 60)),
+        deadline=float(os.getenv(LLM_DEADLINE_ENV_VAR, 180)),
+        retry=RetryPolicy(max_attempts=int(os.getenv(LLM_MAX_ATTEMPTS_ENV_VAR, 4))),
+        bucket=_llm_bucket(),
+        hedge_after=float(hedge_after) if hedge_after else None,
+    )
+
+
+def _pool_limits():
+    import httpx
+
+    max_connections = int(os.getenv(MAX_CONNECTIONS_ENV_VAR, DEFAULT_MAX_CONNECTIONS))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=60.0,
+    )
+
+
+def get_openai_client():
+    """Process-wide synchronous OpenAI client."""
+    def factory():
+        import httpx
+        from openai import OpenAI
+
+        from resilience import ResilientClient
+
+        http_client = httpx.Client(limits=_pool_limits(), timeout=DEFAULT_TIMEOUT_SECONDS)
+        client = OpenAI(api_key=_openai_api_key(), http_client=http_client, max_retries=0)
+        return ResilientClient(client, **_resilience_options())
+
+    return _get_or_create("openai", factory)
+
+
+def get_async_openai_client():
+    """Process-wide AsyncOpenAI client for use inside the event loop."""
+    def factory():
+        import httpx
+        from openai import AsyncOpenAI
+
+        from resilience import ResilientAsyncClient
+
+        http_client = httpx.AsyncClient(limits=_pool_limits(), timeout=DEFAULT_TIMEOUT_SECONDS)
+        client = AsyncOpenAI(api_key=_openai_api_key(), http_client=http_client, max_retries=0)
+        return ResilientAsyncClient(client, **_resilience_options())
+
+    return _get_or_create("async_openai", factory)
+
+
+def get_speech_client():
+    """Process-wide Google Speech-to-Text client (gRPC channel reused across calls)."""
+    def factory():
+        from google.cloud import speech
+
+        return speech.SpeechClient()
+
+    return _get_or_create("speech", factory)
+
+
+def warm_up_clients(openai=True, speech=True):
+    """Construct the shared clients ahead of the first job."""
+    if openai:
+        get_async_openai_client()
+    if speech:
+        get_speech_client()
@@ -1,310 +1,253 @@
 
-import subprocess
+import asyncio
 import json
+import logging
+
+from artifact_store import ArtifactStore
+from clients import get_async_openai_client
+from model_router import get_model_router
+from soap_html import render_soap_html
+from soap_prompts import (
+    EXTRACTION_SYSTEM_PROMPT,
+    FUSED_SYSTEM_PROMPT,
+    SOAP_SYSTEM_PROMPT,
+    build_extraction_prompt,
+    build_fused_prompt,
+    build_soap_prompt,
+    split_fused_result,
+)
+from soap_sections import parse_soap_note
+from soap_stream import StreamingSoapRenderer
+from stage_limits import LimitedRecognizer, get_stage_limiter
+from transcription_engine import default_recognizer
+
+logger = logging.getLogger(__name__)
+
+
+def _write_file(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+async def _write_text(path, content):
+    """在线程中写文件，避免阻塞事件循环"""
+    await asyncio.to_thread(_write_file, path, content)
+
 
 class SoapNoteWorkflow:
     """
-    自动化：音频转录            soap_note = response2.choices[0].message.content
-            with open(soap_file, "w", encoding="utf-8") as f:
-                f.write(soap_note)
-            
-            # 创建 HTML 格式的 SOAP note
-            html_soap_note = self._create_html_soap_note(soap_note)
-            html_soap_file = "soap_note.html"
-            with open(html_soap_file, "w", encoding="utf-8") as f:
-                f.write(html_soap_note)
-                
-        except Exception as e:
-            return {"status": "failed", "error": f"SOAP note 生成失败: {e}"}
-
-        return {
-            "status": "completed",
-            "soap_note_file": soap_file,
-            "soap_note_html_file": html_soap_file, -> SOAP note 生成
+    自动化：音频转录 -> 症状结构化 -> SOAP note 生成
     """
 
+    def __init__(self, recognizer=None, llm_client=None, artifact_store=None, model_router=None):
+        """
+        recognizer: 可选语音识别后端（默认 Google Speech-to-Text）
+        llm_client: 可选 AsyncOpenAI 兼容客户端（默认共享的 AsyncOpenAI 客户端）
+        artifact_store: 可选 ArtifactStore（默认根目录 runs/，可用 SOAP_ARTIFACT_ROOT 配置）
+        model_router: 可选 ModelRouter（默认按 aurite_config.json 的 llms 配置分级路由）
+        """
+        self.recognizer = recognizer
+        self.llm_client = llm_client
+        self.artifact_store = artifact_store or ArtifactStore()
+        self.model_router = model_router or get_model_router()
+        self._default_recognizer = default_recognizer()
+
     async def execute_workflow(self, initial_input, executor, session_id=None):
         """
         initial_input: dict, 需包含 'mp3_file'（音频文件名）
+            可选 'fused': True —— 单次 LLM 请求同时完成症状结构化与 SOAP 生成
+            可选 'stream': True —— 流式生成 SOAP note，每完成一段即写入 soap_note.html
+                （可选 'on_stream_event' 回调接收 server-sent event 字符串）
+
+        所有阻塞操作（ffmpeg 解码、语音识别、文件读写）都在线程中执行，
+        LLM 调用使用 AsyncOpenAI，不会阻塞 Aurite 的事件循环。
+
+        每次运行的中间文件与结果写入独立目录 <artifact root>/<run_id>/，
+        run_id 取 initial_input["run_id"]、session_id 或自动生成，目录已存在时追加序号后缀，
+        并发运行与重试互不覆盖。
+
+        各阶段（decode / stt / llm）的并发数由进程级 StageLimiter 控制，
+        本次运行各阶段耗时（秒）在结果的 stage_timings 中返回。
+
+        症状结构化先用快速模型，结果不符合 schema 或置信度低时才升级到强模型；
+        本次运行各模型的调用次数、耗时与估算费用在结果的 llm_usage 中返回。
         """
+        run = await asyncio.to_thread(
+            self.artifact_store.create_run, initial_input.get("run_id") or session_id
+        )
+        timings = {}
+        llm_usage = {}
+        try:
+            result = await self._run(initial_input, run, timings, llm_usage)
+        finally:
+            await asyncio.to_thread(self.artifact_store.finish_run, run)
+            # 按保留策略清理旧的运行目录（带 .in_progress 标记的运行不会被删除）
+            await asyncio.to_thread(self.artifact_store.prune)
+        result["run_id"] = run.run_id
+        result["run_dir"] = str(run.path)
+        result["stage_timings"] = timings
+        result["llm_usage"] = llm_usage
+        return result
+
+    async def _run(self, initial_input, run, timings, llm_usage=None):
         mp3_file = initial_input.get("mp3_file", "Record_test.mp3")
-        wav_file = "converted.wav"
-        transcript_file = "transcribed_text.txt"
-        interpret_file = "interpret_text.json"
-        soap_file = "soap_note.txt"
+        transcript_file = run.file("transcribed_text.txt")
+        interpret_file = run.file("interpret_text.json")
+        soap_file = run.file("soap_note.txt")
 
-        # 步骤1：mp3转wav
-        try:
-            subprocess.run([
-                "ffmpeg", "-i", mp3_file, "-acodec", "pcm_s16le", "-ar", "44100", "-ac", "1", wav_file
-            ], check=True)
-        except Exception as e:
-            return {"status": "failed", "error": f"ffmpeg conversion failed: {e}"}
+        limiter = get_stage_limiter()
+        # 每个识别请求占用一个 stt 槽位
+        recognizer = LimitedRecognizer(self.recognizer or self._default_recognizer, limiter, timings)
 
-        # 步骤2：调用 Google Speech-to-Text
+        # 步骤1+2：ffmpeg 流式解码 -> VAD -> Google Speech-to-Text（不落盘 WAV）
+        # 解码以流的形式直接送入识别，因此 decode 槽位覆盖整个音频阶段
         try:
-            from speech_to_text import transcribe_speech
-            transcript = transcribe_speech(wav_file)
-            with open(transcript_file, "w", encoding="utf-8") as f:
-                f.write(transcript)
+            from speech_to_text import transcribe_audio_file
+            # VAD 预处理去除静音段，可通过 initial_input["vad"] = False 关闭
+            # 采样率由 audio profile 决定（默认 16 kHz 单声道，可用 initial_input["audio_profile"] 覆盖）
+            async with limiter.stage("decode", timings):
+                transcript = await asyncio.to_thread(
+                    transcribe_audio_file,
+                    mp3_file,
+                    profile=initial_input.get("audio_profile"),
+                    recognizer=recognizer,
+                    vad=initial_input.get("vad", True),
+                    # 命中转录缓存时跳过解码与识别
+                    use_cache=initial_input.get("use_transcript_cache", True),
+                )
+            await _write_text(transcript_file, transcript)
         except Exception as e:
             return {"status": "failed", "error": f"Speech-to-text conversion failed: {e}"}
 
-        # 步骤3：结构化症状（OpenAI）
-        try:
-            from interpret_call_content import client as openai_client
-            with open(transcript_file, "r", encoding="utf-8") as f:
-                transcript = f.read().strip()
-            structured_prompt = f"""
-Extract the following from the transcript:
-1. Original symptom descriptions.
-2. Standardized medical terms.
-3. Possible conditions (based on symptoms).
-Return output in JSON.
-Transcript:
-"{transcript}"
-"""
-            response = openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a medical assistant that extracts and standardizes symptoms from patient transcripts."},
-                    {"role": "user", "content": structured_prompt}
-                ],
-                temperature=0.1
-            )
-            result_json = json.loads(response.choices[0].message.content)
-            with open(interpret_file, "w", encoding="utf-8") as f:
-                json.dump(result_json, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            return {"status": "failed", "error": f"Symptom structuring failed: {e}"}
+        openai_client = self.llm_client or get_async_openai_client()
+        # 相同转录命中 LLM 响应缓存；initial_input["bypass_llm_cache"] 可强制重新生成
+        bypass_cache = initial_input.get("bypass_llm_cache", False)
+        stream = initial_input.get("stream", False)
+        stream_rendered = False
+        html_soap_file = run.file("soap_note.html")
+
+        if initial_input.get("fused", False):
+            # 融合模式：一次请求同时返回结构化症状与 SOAP 四段
+            try:
+                async with limiter.stage("llm", timings):
+                    result_json, soap_note = await self._extract_and_generate(
+                        openai_client, transcript, bypass_cache, llm_usage
+                    )
+                await _write_text(interpret_file, json.dumps(result_json, ensure_ascii=False, indent=2))
+            except Exception as e:
+                return {"status": "failed", "error": f"Fused symptom structuring / SOAP generation failed: {e}"}
+        else:
+            # 步骤3：结构化症状（OpenAI）
+            try:
+                async with limiter.stage("llm", timings):
+                    result_json = await self._extract_symptoms(openai_client, transcript, bypass_cache, llm_usage)
+                await _write_text(interpret_file, json.dumps(result_json, ensure_ascii=False, indent=2))
+            except Exception as e:
+                return {"status": "failed", "error": f"Symptom structuring failed: {e}"}
+
+            # 步骤4：生成SOAP note（流式模式下边生成边写入 HTML）
+            try:
+                async with limiter.stage("llm", timings):
+                    if stream:
+                        soap_note, time_to_first_section = await self._generate_soap_note_streaming(
+                            openai_client, result_json, html_soap_file, bypass_cache,
+                            on_event=initial_input.get("on_stream_event"), usage=llm_usage,
+                        )
+                        stream_rendered = True
+                    else:
+                        soap_note = await self._generate_soap_note(openai_client, result_json, bypass_cache, llm_usage)
+            except Exception as e:
+                return {"status": "failed", "error": f"SOAP note 生成失败: {e}"}
 
-        # 步骤4：生成SOAP note
         try:
-            soap_prompt = f"""
-请根据以下结构化医学信息，生成一份标准的 SOAP note（英文）：\n\n结构化信息：\n{json.dumps(result_json, ensure_ascii=False, indent=2)}\n\nSOAP note 要求：\nS（Subjective）：主观信息，直接引用原始主诉和症状描述。\nO（Objective）：客观信息，标准化医学术语和体征。\nA（Assessment）：根据症状和体征，给出可能的诊断或评估。\nP（Plan）：给出合理的下一步计划或建议。\n\n请严格按照 SOAP 四段输出，内容简明、专业。\n"""
-            response2 = openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a medical assistant that writes SOAP notes based on structured medical data."},
-                    {"role": "user", "content": soap_prompt}
-                ],
-                temperature=0.1
-            )
-            soap_note = response2.choices[0].message.content
-            with open(soap_file, "w", encoding="utf-8") as f:
-                f.write(soap_note)
-            
+            await _write_text(soap_file, soap_note)
+
             # 创建 HTML 格式的 SOAP note
-            html_soap_note = self._create_html_soap_note(soap_note)
-            html_soap_file = "soap_note.html"
-            with open(html_soap_file, "w", encoding="utf-8") as f:
-                f.write(html_soap_note)
-                
+            if not stream_rendered:
+                html_soap_note = self._create_html_soap_note(soap_note)
+                await _write_text(html_soap_file, html_soap_note)
+
         except Exception as e:
             return {"status": "failed", "error": f"SOAP note 生成失败: {e}"}
 
-        return {
+        result = {
             "status": "completed",
             "soap_note_file": soap_file,
             "soap_note_html_file": html_soap_file,
             "soap_note": soap_note
         }
+        if stream_rendered:
+            result["time_to_first_section"] = time_to_first_section
+        return result
+
+    async def _extract_symptoms(self, openai_client, transcript, bypass_cache=False, usage=None):
+        """结构化症状提取，返回 symptom_raw / symptom_standardized / possible_conditions
+
+        请求结构化 JSON 输出，回复经修复解析与 schema 校验；格式有误时只重问这一步，
+        不会让整个运行（转录 + LLM）失败重跑。快速模型优先，必要时升级到强模型。
+        """
+        return await self.model_router.extract(
+            openai_client,
+            transcript,
+            [
+                {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+                {"role": "user", "content": build_extraction_prompt(transcript)}
+            ],
+            bypass=bypass_cache,
+            usage=usage,
+        )
+
+    async def _generate_soap_note(self, openai_client, result_json, bypass_cache=False, usage=None):
+        """根据结构化症状生成 SOAP note 文本"""
+        return await self.model_router.complete(
+            openai_client,
+            "soap",
+            [
+                {"role": "system", "content": SOAP_SYSTEM_PROMPT},
+                {"role": "user", "content": build_soap_prompt(result_json)}
+            ],
+            bypass=bypass_cache,
+            usage=usage,
+        )
+
+    async def _generate_soap_note_streaming(self, openai_client, result_json, html_file, bypass_cache=False,
+                                            on_event=None, usage=None):
+        """流式生成 SOAP note，逐段写入 HTML；返回 (SOAP note 文本, 首段渲染耗时秒数)"""
+        renderer = await asyncio.to_thread(StreamingSoapRenderer, html_file, on_event)
+        deltas = self.model_router.stream(
+            openai_client,
+            "soap",
+            [
+                {"role": "system", "content": SOAP_SYSTEM_PROMPT},
+                {"role": "user", "content": build_soap_prompt(result_json)}
+            ],
+            bypass=bypass_cache,
+            usage=usage,
+        )
+        soap_note = await renderer.arender(deltas)
+        logger.info(f"SOAP note streamed: {renderer.sections_rendered} sections, "
+                    f"time to first section {renderer.time_to_first_section}")
+        return soap_note, renderer.time_to_first_section
+
+    async def _extract_and_generate(self, openai_client, transcript, bypass_cache=False, usage=None):
+        """融合模式：单次结构化输出请求返回 (结构化症状, SOAP note 文本)
+
+        回复按融合 schema 校验（SOAP 四段必填）；格式有误时重问，仍不合格则抛出 ValueError。
+        """
+        fused = await self.model_router.fused(
+            openai_client,
+            [
+                {"role": "system", "content": FUSED_SYSTEM_PROMPT},
+                {"role": "user", "content": build_fused_prompt(transcript)}
+            ],
+            bypass=bypass_cache,
+            usage=usage,
+        )
+        return split_fused_result(fused)
 
     def _create_html_soap_note(self, soap_content):
         """将 SOAP note 转换为格式化的 HTML"""
-        
-        # 分割 SOAP note 内容
-        lines = soap_content.split('\n')
-        html_content = []
-        current_section = None
-        
-        html_content.append("""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>SOAP Note</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            line-height: 1.6;
-            background-color: #f8f9fa;
-        }
-        .container {
-            background-color: white;
-            padding: 30px;
-            border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        h1 {
-            color: #2c3e50;
-            text-align: center;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 10px;
-            margin-bottom: 30px;
-        }
-        .section {
-            margin-bottom: 25px;
-            padding: 15px;
-            border-left: 4px solid #3498db;
-            background-color: #f8f9fa;
-            border-radius: 5px;
-        }
-        .section-header {
-            font-size: 1.3em;
-            font-weight: bold;
-            color: #2c3e50;
-            margin-bottom: 10px;
-            display: flex;
-            align-items: center;
-        }
-        .section-content {
-            color: #34495e;
-            padding-left: 10px;
-        }
-        .subjective { border-left-color: #e74c3c; }
-        .objective { border-left-color: #f39c12; }
-        .assessment { border-left-color: #27ae60; }
-        .plan { border-left-color: #9b59b6; }
-        .section-icon {
-            width: 20px;
-            height: 20px;
-            margin-right: 10px;
-            border-radius: 50%;
-        }
-        .subjective .section-icon { background-color: #e74c3c; }
-        .objective .section-icon { background-color: #f39c12; }
-        .assessment .section-icon { background-color: #27ae60; }
-        .plan .section-icon { background-color: #9b59b6; }
-        .timestamp {
-            text-align: center;
-            color: #7f8c8d;
-            font-size: 0.9em;
-            margin-top: 20px;
-            padding-top: 20px;
-            border-top: 1px solid #ecf0f1;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>📋 SOAP Note</h1>
-""")
-        
-        # 解析 SOAP note 内容
-        current_section_content = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 检测 SOAP 节标题 - 支持多种格式
-            if (line.upper().startswith('S:') or 
-                line.upper().startswith('SUBJECTIVE') or 
-                line.upper().startswith('S (SUBJECTIVE)')):
-                if current_section:
-                    html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
-                    html_content.append('        </div>')
-                current_section = 'subjective'
-                html_content.append(f'        <div class="section {current_section}">')
-                html_content.append('            <div class="section-header">')
-                html_content.append('                <div class="section-icon"></div>')
-                html_content.append('                Subjective')
-                html_content.append('            </div>')
-                # 提取内容，去除标题部分
-                content = line
-                for prefix in ['S:', 'SUBJECTIVE:', 'S (SUBJECTIVE):']:
-                    if content.upper().startswith(prefix):
-                        content = content[len(prefix):].strip()
-                        break
-                current_section_content = [content] if content else []
-                
-            elif (line.upper().startswith('O:') or 
-                  line.upper().startswith('OBJECTIVE') or 
-                  line.upper().startswith('O (OBJECTIVE)')):
-                if current_section:
-                    html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
-                    html_content.append('        </div>')
-                current_section = 'objective'
-                html_content.append(f'        <div class="section {current_section}">')
-                html_content.append('            <div class="section-header">')
-                html_content.append('                <div class="section-icon"></div>')
-                html_content.append('                Objective')
-                html_content.append('            </div>')
-                # 提取内容，去除标题部分
-                content = line
-                for prefix in ['O:', 'OBJECTIVE:', 'O (OBJECTIVE):']:
-                    if content.upper().startswith(prefix):
-                        content = content[len(prefix):].strip()
-                        break
-                current_section_content = [content] if content else []
-                
-            elif (line.upper().startswith('A:') or 
-                  line.upper().startswith('ASSESSMENT') or 
-                  line.upper().startswith('A (ASSESSMENT)')):
-                if current_section:
-                    html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
-                    html_content.append('        </div>')
-                current_section = 'assessment'
-                html_content.append(f'        <div class="section {current_section}">')
-                html_content.append('            <div class="section-header">')
-                html_content.append('                <div class="section-icon"></div>')
-                html_content.append('                Assessment')
-                html_content.append('            </div>')
-                # 提取内容，去除标题部分
-                content = line
-                for prefix in ['A:', 'ASSESSMENT:', 'A (ASSESSMENT):']:
-                    if content.upper().startswith(prefix):
-                        content = content[len(prefix):].strip()
-                        break
-                current_section_content = [content] if content else []
-                
-            elif (line.upper().startswith('P:') or 
-                  line.upper().startswith('PLAN') or 
-                  line.upper().startswith('P (PLAN)')):
-                if current_section:
-                    html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
-                    html_content.append('        </div>')
-                current_section = 'plan'
-                html_content.append(f'        <div class="section {current_section}">')
-                html_content.append('            <div class="section-header">')
-                html_content.append('                <div class="section-icon"></div>')
-                html_content.append('                Plan')
-                html_content.append('            </div>')
-                # 提取内容，去除标题部分
-                content = line
-                for prefix in ['P:', 'PLAN:', 'P (PLAN):']:
-                    if content.upper().startswith(prefix):
-                        content = content[len(prefix):].strip()
-                        break
-                current_section_content = [content] if content else []
-                
-            else:
-                # 添加到当前节的内容
-                if current_section and line and not line.upper().startswith('SOAP NOTE'):
-                    current_section_content.append(line)
-        
-        # 添加最后一个节
-        if current_section:
-            html_content.append(f'            <div class="section-content">{"<br>".join(current_section_content)}</div>')
-            html_content.append('        </div>')
-        
-        # 添加时间戳和结尾
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        html_content.append(f"""        <div class="timestamp">
-            Generated on {timestamp}
-        </div>
-    </div>
-</body>
-</html>""")
-        
-        return '\n'.join(html_content)
+        return render_soap_html(parse_soap_note(soap_content))
 
     def get_input_type(self):
         return dict
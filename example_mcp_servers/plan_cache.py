@@ -0,0 +1,105 @@
+"""
+Byte-bounded LRU cache for plan bodies.
+
+planning_server keeps only plan metadata resident (see plan_index.py); plan
+contents are read from disk on first use and kept here, least recently used
+first out, until their UTF-8 size would exceed ``max_bytes``. A body larger
+than the whole budget is returned but not cached.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class PlanBodyCache:
+    """LRU of plan name -> content, bounded by total content bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()  # name -> (content, size in bytes)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str, load: Callable[[str], str]) -> str:
+        """Cached content of ``name``; on a miss ``load(name)`` reads it and the result is cached."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        content = load(name)  # 不持锁读盘
+        self.put(name, content)
+        return content
+
+    def get_many(self, names: Iterable[str], load_many: Callable[[List[str]], Dict[str, str]]) -> Dict[str, str]:
+        """Contents by name; all misses are read with one ``load_many(missing)`` call.
+
+        Names ``load_many`` does not return are left out of the result.
+        """
+        found, missing = {}, []
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries.move_to_end(name)
+                    found[name] = entry[0]
+                else:
+                    missing.append(name)
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            loaded = load_many(missing)
+            for name, content in loaded.items():
+                self.put(name, content)
+            found.update(loaded)
+        return found
+
+    def put(self, name: str, content: str):
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._discard(name)
+            if size > self.max_bytes:
+                return
+            self._entries[name] = (content, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def invalidate(self, name: str):
+        with self._lock:
+            self._discard(name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _discard(self, name: str):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
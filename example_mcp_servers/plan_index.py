@@ -0,0 +1,223 @@
+"""
+In-memory indexes over plan metadata for planning_server.
+
+PlanIndex keeps an inverted tag -> plan-name index, plus (created_at, name)
+keys kept sorted for all plans and per tag, all updated incrementally on
+every add/remove. query() answers multi-tag AND/OR filters and created_at ranges
+from those indexes instead of scanning every plan, and pages through the
+result with an opaque cursor, so a page costs the same whatever its
+position and stays valid while plans are added.
+"""
+
+import base64
+import bisect
+import heapq
+import itertools
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+MATCH_MODES = ("all", "any")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def _created_key(metadata: Dict[str, Any]) -> str:
+    """Sortable created_at: ``str(datetime)`` and ISO strings compare correctly once 'T' is a space."""
+    created_at = metadata.get("created_at")
+    return created_at.replace("T", " ") if isinstance(created_at, str) else ""
+
+
+def normalize_date(value: Optional[str]) -> Optional[str]:
+    return value.strip().replace("T", " ") if value else None
+
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created, name = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(created), str(name)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+class PlanIndex:
+    """Tag and created_at indexes over plan metadata, keyed by plan name."""
+
+    def __init__(self):
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+        # 每个标签及全部计划各自维护按 (created_at, name) 排序的键列表
+        self._tag_keys: Dict[str, List[Tuple[str, str]]] = {}
+        self._by_created: List[Tuple[str, str]] = []
+        # 变更监视线程与请求处理并发访问
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._metadata)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._metadata
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._metadata.get(name)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._metadata)
+
+    def add(self, name: str, metadata: Dict[str, Any]):
+        """Index ``name`` with ``metadata``, replacing any previous entry."""
+        with self._lock:
+            self._add(name, metadata)
+
+    def _add(self, name: str, metadata: Dict[str, Any]):
+        if name in self._metadata:
+            self._remove(name)
+        self._metadata[name] = metadata
+        key = (_created_key(metadata), name)
+        for tag in set(metadata.get("tags") or []):
+            self._by_tag.setdefault(tag, set()).add(name)
+            bisect.insort(self._tag_keys.setdefault(tag, []), key)
+        bisect.insort(self._by_created, key)
+
+    def add_many(self, entries: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Index many ``(name, metadata)`` pairs, sorting each key list once."""
+        entries = dict(entries)
+        with self._lock:
+            self._add_many(entries)
+
+    def _add_many(self, entries: Dict[str, Dict[str, Any]]):
+        for name in entries:
+            self._remove(name)  # 先删旧条目，追加期间列表不保证有序
+        touched = set()
+        for name, metadata in entries.items():
+            self._metadata[name] = metadata
+            key = (_created_key(metadata), name)
+            for tag in set(metadata.get("tags") or []):
+                self._by_tag.setdefault(tag, set()).add(name)
+                self._tag_keys.setdefault(tag, []).append(key)
+                touched.add(tag)
+            self._by_created.append(key)
+        # timsort 对已有序的前缀与追加部分是线性合并
+        self._by_created.sort()
+        for tag in touched:
+            self._tag_keys[tag].sort()
+
+    def remove(self, name: str):
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name: str):
+        metadata = self._metadata.pop(name, None)
+        if metadata is None:
+            return
+        key = (_created_key(metadata), name)
+        for tag in set(metadata.get("tags") or []):
+            names = self._by_tag.get(tag)
+            if names is None:
+                continue
+            names.discard(name)
+            _discard_key(self._tag_keys[tag], key)
+            if not names:
+                del self._by_tag[tag]
+                del self._tag_keys[tag]
+        _discard_key(self._by_created, key)
+
+    def tag_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {tag: len(names) for tag, names in self._by_tag.items()}
+
+    def query(
+        self,
+        tags: Optional[List[str]] = None,
+        match: str = "all",
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ) -> Tuple[List[str], Optional[str], int]:
+        """One page of plan names, oldest first.
+
+        ``created_after`` is inclusive, ``created_before`` exclusive; plans
+        without a created_at never match a date filter. Returns
+        ``(names, next_cursor, total matches)``; ``next_cursor`` is None on
+        the last page.
+        """
+        if match not in MATCH_MODES:
+            raise ValueError(f"match must be one of {MATCH_MODES}, got {match!r}")
+        with self._lock:
+            return self._query(tags, match, created_after, created_before, cursor, limit)
+
+    def _query(self, tags, match, created_after, created_before, cursor, limit):
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        after = normalize_date(created_after)
+        before = normalize_date(created_before)
+        if after is not None:
+            low = (after, "")
+        elif before is not None:
+            low = ("\x00", "")  # 跳过没有 created_at 的计划
+        else:
+            low = None
+        high = (before, "") if before is not None else None
+        position = decode_cursor(cursor) if cursor else None
+
+        requested = list(dict.fromkeys(tags or []))
+        tags = [tag for tag in requested if tag in self._by_tag]
+        if requested and (not tags or (match == "all" and len(tags) < len(requested))):
+            return [], None, 0
+
+        if len(tags) <= 1 or match == "all":
+            # 在最小的有序列表上按位置取页，其余标签只做成员判断
+            tags.sort(key=lambda tag: len(self._by_tag[tag]))
+            keys = self._tag_keys[tags[0]] if tags else self._by_created
+            others = [self._by_tag[tag] for tag in tags[1:]]
+            lo, hi, start = _bounds(keys, low, high, position)
+            if not others:
+                page = keys[start:min(start + limit + 1, hi)]
+                total = hi - lo
+            else:
+                page = []
+                for i in range(start, hi):
+                    if all(keys[i][1] in names for names in others):
+                        page.append(keys[i])
+                        if len(page) > limit:
+                            break
+                if low is None and high is None:
+                    total = len(self._by_tag[tags[0]].intersection(*others))
+                else:
+                    total = sum(1 for i in range(lo, hi) if all(keys[i][1] in names for names in others))
+        else:
+            # 任一标签：按序归并各标签的有序列表并去重
+            ranges = [(self._tag_keys[tag], _bounds(self._tag_keys[tag], low, high, position)) for tag in tags]
+            merged = heapq.merge(*(itertools.islice(keys, start, hi) for keys, (_, hi, start) in ranges))
+            page = []
+            for key in merged:
+                if not page or page[-1] != key:
+                    page.append(key)
+                    if len(page) > limit:
+                        break
+            if low is None and high is None:
+                total = len(set().union(*(self._by_tag[tag] for tag in tags)))
+            else:
+                total = len({keys[i][1] for keys, (lo, hi, _) in ranges for i in range(lo, hi)})
+
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        return [name for _, name in page[:limit]], next_cursor, total
+
+
+def _discard_key(keys: List[Tuple[str, str]], key: Tuple[str, str]):
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+def _bounds(keys, low, high, position) -> Tuple[int, int, int]:
+    """``(lo, hi, start)`` indexes into sorted ``keys`` for a date range and cursor."""
+    lo = bisect.bisect_left(keys, low) if low is not None else 0
+    hi = max(lo, bisect.bisect_left(keys, high)) if high is not None else len(keys)
+    start = min(hi, max(lo, bisect.bisect_right(keys, position))) if position else lo
+    return lo, hi, start
@@ -0,0 +1,403 @@
+"""
+Storage backends for planning_server.
+
+- FilePlanStore: the original layout, ``<name>.txt`` plus ``<name>.meta.json``
+  in PLANS_DIR. Each file is written to a temporary name, fsynced and
+  renamed into place, and the directory is fsynced once per save_many()
+  call. Metadata is snapshotted to ``.plan_index.json`` so a restart only
+  parses the .meta.json files that changed. search() reads every plan.
+- SQLitePlanStore: one WAL-mode SQLite database; each save_many() call is
+  one transaction, and an FTS5 index over plan content, kept in sync by
+  triggers, serves search().
+
+PLAN_STORE selects the backend ("files", the default, or "sqlite");
+PLAN_DB_PATH sets the database path (default PLANS_DIR/plans.sqlite3).
+Move an existing plans directory into SQLite once with
+
+    python example_mcp_servers/plan_store.py migrate [--plans-dir DIR] [--db PATH]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STORE_ENV_VAR = "PLAN_STORE"
+DB_PATH_ENV_VAR = "PLAN_DB_PATH"
+DEFAULT_DB_NAME = "plans.sqlite3"
+SNAPSHOT_NAME = ".plan_index.json"
+SNAPSHOT_VERSION = 1
+SYNC_CHUNK_FILES = 256
+
+
+def _tmp_path(path: Path) -> Path:
+    """Temporary name next to ``path`` that no other process or thread will pick."""
+    # 多个进程共享 PLANS_DIR：临时文件名带上 pid 与随机后缀，互不覆盖
+    return path.with_name(f".{path.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+
+
+def _write_files(files: List[Tuple[Path, str]], fsync: bool):
+    """Write ``files`` as (path, text); with ``fsync``, all are written before any is fsynced.
+
+    Files are handled in chunks of SYNC_CHUNK_FILES so a large batch does
+    not hold too many descriptors open at once.
+    """
+    for start in range(0, len(files), SYNC_CHUNK_FILES):
+        handles = []
+        try:
+            for path, text in files[start:start + SYNC_CHUNK_FILES]:
+                f = open(path, "x")
+                handles.append(f)
+                f.write(text)
+                f.flush()
+            if fsync:
+                for f in handles:
+                    os.fsync(f.fileno())
+        finally:
+            for f in handles:
+                f.close()
+
+
+def _fsync_path(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _remove_files(paths: Iterable[Path]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_atomic(path: Path, text: str):
+    tmp_path = _tmp_path(path)
+    try:
+        with open(tmp_path, "x") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_files([tmp_path])
+        raise
+
+
+def _snippet(content: str, terms: List[str], width: int = 80) -> str:
+    lowered = content.lower()
+    positions = [i for i in (lowered.find(term) for term in terms) if i >= 0]
+    start = max(0, min(positions) - width // 2) if positions else 0
+    text = " ".join(content[start:start + width].split())
+    return ("..." if start else "") + text + ("..." if start + width < len(content) else "")
+
+
+class FilePlanStore:
+    """Plans as ``<name>.txt`` + ``<name>.meta.json`` files in one directory."""
+
+    name = "files"
+
+    def __init__(self, plans_dir: Path, fsync: bool = True):
+        self.plans_dir = Path(plans_dir)
+        self.fsync = fsync
+        self.plans_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.plans_dir / SNAPSHOT_NAME
+        self.metadata_files_read = 0
+
+    def location(self, plan_name: str) -> str:
+        return str(self.plans_dir / f"{plan_name}.txt")
+
+    def _read_metadata(self, plan_name: str) -> Dict[str, Any]:
+        with open(self.plans_dir / f"{plan_name}.meta.json", "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                logger.warning(f"Failed to parse metadata for plan: {plan_name}")
+                return {}
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        try:
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") == SNAPSHOT_VERSION:
+                return snapshot["plans"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def load_metadata(self) -> Dict[str, Dict[str, Any]]:
+        """Metadata of every plan; only .meta.json files whose mtime differs from the snapshot are parsed."""
+        # 一次目录扫描取得计划名与元数据文件的 mtime
+        plan_names, meta_mtimes = [], {}
+        with os.scandir(self.plans_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".meta.json"):
+                    meta_mtimes[entry.name[: -len(".meta.json")]] = entry.stat().st_mtime_ns
+                elif entry.name.endswith(".txt"):
+                    plan_names.append(entry.name[: -len(".txt")])
+
+        snapshot = self._read_snapshot()
+        entries, reread = {}, 0
+        for plan_name in plan_names:
+            mtime = meta_mtimes.get(plan_name)
+            cached = snapshot.get(plan_name)
+            if cached is not None and cached[0] == mtime:
+                metadata = cached[1]
+            else:
+                try:
+                    metadata = self._read_metadata(plan_name) if mtime is not None else {}
+                except FileNotFoundError:
+                    metadata = {}  # 扫描之后被其他进程删除
+                reread += 1
+            entries[plan_name] = [mtime, metadata]
+
+        if reread or len(entries) != len(snapshot):
+            try:
+                _write_atomic(
+                    self.snapshot_path,
+                    json.dumps({"version": SNAPSHOT_VERSION, "plans": entries}, separators=(",", ":")),
+                )
+            except OSError as e:
+                # 快照只是启动加速：写入失败不影响本次已读取的元数据
+                logger.warning(f"Failed to write plan index snapshot {self.snapshot_path}: {e}")
+        self.metadata_files_read = reread
+        return {plan_name: entry[1] for plan_name, entry in entries.items()}
+
+    def read_metadata(self, plan_name: str) -> Optional[Dict[str, Any]]:
+        """Current metadata of one plan; None if the plan no longer exists."""
+        if not (self.plans_dir / f"{plan_name}.txt").exists():
+            return None
+        try:
+            return self._read_metadata(plan_name)
+        except FileNotFoundError:
+            return {}
+
+    def read_body(self, plan_name: str) -> str:
+        with open(self.plans_dir / f"{plan_name}.txt", "r") as f:
+            return f.read()
+
+    def read_bodies(self, plan_names: Iterable[str]) -> Dict[str, str]:
+        """Bodies of the plans that exist, by name."""
+        bodies = {}
+        for plan_name in plan_names:
+            try:
+                bodies[plan_name] = self.read_body(plan_name)
+            except FileNotFoundError:
+                pass
+        return bodies
+
+    def save(self, plan_name: str, content: str, metadata: Dict[str, Any]):
+        self.save_many([(plan_name, content, metadata)])
+
+    def save_many(self, plans: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Write several plans: all temporary files, their fsyncs, then the renames.
+
+        The directory is fsynced once after the renames. If a name appears
+        more than once, the last item wins.
+        """
+        # 同名计划只写最后一项
+        latest = {plan_name: (content, metadata) for plan_name, content, metadata in plans}
+        # 正文排在元数据之前改名：崩溃时最多留下缺元数据的计划，不会有半个文件
+        files = []
+        for plan_name, (content, metadata) in latest.items():
+            files.append((self.plans_dir / f"{plan_name}.txt", content))
+            files.append((self.plans_dir / f"{plan_name}.meta.json", json.dumps(metadata, indent=2)))
+        tmp_paths = [_tmp_path(path) for path, _ in files]
+        try:
+            _write_files([(tmp_path, text) for tmp_path, (_, text) in zip(tmp_paths, files)], self.fsync)
+            for tmp_path, (path, _) in zip(tmp_paths, files):
+                os.replace(tmp_path, path)
+        except BaseException:
+            _remove_files(tmp_paths)
+            raise
+        if self.fsync and files:
+            _fsync_path(self.plans_dir)
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Plans containing every word of ``query`` (case-insensitive), most occurrences first."""
+        terms = [term.lower() for term in re.findall(r"\w+", query)]
+        if not terms:
+            return []
+        results = []
+        for path in self.plans_dir.glob("*.txt"):
+            content = path.read_text()
+            lowered = content.lower()
+            counts = [lowered.count(term) for term in terms]
+            if all(counts):
+                results.append({"name": path.stem, "score": float(sum(counts)), "snippet": _snippet(content, terms)})
+        results.sort(key=lambda result: -result["score"])
+        return results[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "metadata_files_read": self.metadata_files_read}
+
+
+class SQLitePlanStore:
+    """Plans in a WAL-mode SQLite database with an FTS5 index over their content."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL 下仍保证一致性，仅掉电时可能丢最后的事务
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                " id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE,"
+                " content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS plans_fts USING fts5("
+                " name, content, content='plans', content_rowid='id')"
+            )
+            # 外部内容表：由触发器同步 FTS 索引
+            self._conn.executescript(
+                """
+                CREATE TRIGGER IF NOT EXISTS plans_ai AFTER INSERT ON plans BEGIN
+                    INSERT INTO plans_fts (rowid, name, content) VALUES (new.id, new.name, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS plans_ad AFTER DELETE ON plans BEGIN
+                    INSERT INTO plans_fts (plans_fts, rowid, name, content)
+                    VALUES ('delete', old.id, old.name, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS plans_au AFTER UPDATE ON plans BEGIN
+                    INSERT INTO plans_fts (plans_fts, rowid, name, content)
+                    VALUES ('delete', old.id, old.name, old.content);
+                    INSERT INTO plans_fts (rowid, name, content) VALUES (new.id, new.name, new.content);
+                END;
+                """
+            )
+
+    def location(self, plan_name: str) -> str:
+        return f"{self.path}#{plan_name}"
+
+    def load_metadata(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, metadata FROM plans").fetchall()
+        return {name: json.loads(metadata) for name, metadata in rows}
+
+    def read_metadata(self, plan_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT metadata FROM plans WHERE name = ?", (plan_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits to the database."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def read_body(self, plan_name: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM plans WHERE name = ?", (plan_name,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(plan_name)
+        return row[0]
+
+    def read_bodies(self, plan_names: Iterable[str]) -> Dict[str, str]:
+        """Bodies of the plans that exist, by name, in one query per 500 names."""
+        plan_names = list(plan_names)
+        bodies = {}
+        with self._lock:
+            for i in range(0, len(plan_names), 500):
+                chunk = plan_names[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                bodies.update(self._conn.execute(
+                    f"SELECT name, content FROM plans WHERE name IN ({placeholders})", chunk
+                ).fetchall())
+        return bodies
+
+    def save(self, plan_name: str, content: str, metadata: Dict[str, Any]):
+        self.save_many([(plan_name, content, metadata)])
+
+    def save_many(self, plans: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Save several plans in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO plans (name, content, metadata) VALUES (?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET content = excluded.content, metadata = excluded.metadata",
+                ((name, content, json.dumps(metadata)) for name, content, metadata in plans),
+            )
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Plans matching ``query`` in FTS5 syntax, best bm25 rank first.
+
+        A query that is not valid FTS5 syntax is searched as plain words.
+        """
+        sql = (
+            "SELECT name, bm25(plans_fts), snippet(plans_fts, 1, '', '', '...', 12)"
+            " FROM plans_fts WHERE plans_fts MATCH ? ORDER BY rank LIMIT ?"
+        )
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, (query, limit)).fetchall()
+            except sqlite3.OperationalError:
+                words = " ".join(f'"{word}"' for word in re.findall(r"\w+", query))
+                rows = self._conn.execute(sql, (words, limit)).fetchall() if words else []
+        # bm25 越小越相关，取反使分数越大越好
+        return [{"name": name, "score": round(-rank, 4), "snippet": snippet} for name, rank, snippet in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "path": self.path}
+
+
+def get_plan_store(plans_dir: Path):
+    """Store selected by PLAN_STORE / PLAN_DB_PATH."""
+    backend = os.getenv(STORE_ENV_VAR, "files").lower()
+    if backend == "sqlite":
+        return SQLitePlanStore(os.getenv(DB_PATH_ENV_VAR, str(Path(plans_dir) / DEFAULT_DB_NAME)))
+    if backend != "files":
+        raise ValueError(f"Unknown {STORE_ENV_VAR} {backend!r}; expected 'files' or 'sqlite'")
+    return FilePlanStore(plans_dir)
+
+
+def migrate_directory(plans_dir: Path, store: SQLitePlanStore, batch_size: int = 500) -> int:
+    """Copy every plan of a FilePlanStore directory into ``store``; returns the number of plans.
+
+    The source files are left in place. Running it again overwrites the
+    plans with the same names.
+    """
+    source = FilePlanStore(plans_dir)
+    metadata = source.load_metadata()
+    batch, migrated = [], 0
+    for plan_name, plan_metadata in metadata.items():
+        batch.append((plan_name, source.read_body(plan_name), plan_metadata))
+        if len(batch) >= batch_size:
+            store.save_many(batch)
+            migrated += len(batch)
+            batch = []
+    if batch:
+        store.save_many(batch)
+        migrated += len(batch)
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planning server plan store utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="copy a plans directory into a SQLite plan store")
+    migrate.add_argument("--plans-dir", default=str(Path(__file__).parent / "plans"))
+    migrate.add_argument("--db", default=None, help=f"database path (default: PLANS_DIR/{DEFAULT_DB_NAME})")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db_path = args.db or str(Path(args.plans_dir) / DEFAULT_DB_NAME)
+    count = migrate_directory(Path(args.plans_dir), SQLitePlanStore(db_path))
+    print(f"Migrated {count} plans from {args.plans_dir} to {db_path}")
+    print(f"Start the server with {STORE_ENV_VAR}=sqlite {DB_PATH_ENV_VAR}={db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Change watchers for planning_server's plan storage.
+
+Another planning_server process or ops tooling may write to the same
+plans directory or database. These watchers run in a daemon thread and
+report which plans changed, so the server can update just those entries
+in its index and body cache instead of restarting.
+
+- InotifyWatcher: Linux inotify through ctypes. It batches events for
+  ``debounce`` seconds and reports the affected plan names. If the kernel
+  queue overflows, it reports None, meaning "rescan everything".
+- PollingWatcher: portable fallback that re-scans the directory every
+  ``interval`` seconds and compares (mtime, size) per file.
+- SQLiteWatcher: polls ``PRAGMA data_version``, which changes only when
+  another connection commits, and reports None for a full diff.
+
+start_watcher() picks the watcher for a store; PLANS_WATCH selects the
+mode ("auto", the default, "inotify", "poll" or "off") and
+PLANS_WATCH_INTERVAL the polling interval in seconds.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+WATCH_ENV_VAR = "PLANS_WATCH"
+WATCH_INTERVAL_ENV_VAR = "PLANS_WATCH_INTERVAL"
+DEFAULT_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.05
+
+PLAN_SUFFIXES = (".meta.json", ".txt")
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+_EVENT_HEADER = struct.Struct("iIII")
+
+# 回调参数：变更的计划名集合；None 表示需要全量对比
+ChangeCallback = Callable[[Optional[Set[str]]], None]
+
+
+def plan_name_of(filename: str) -> Optional[str]:
+    """Plan name for a plan body or metadata file name; None for anything else (temp files, snapshot)."""
+    if filename.startswith("."):
+        return None
+    for suffix in PLAN_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[: -len(suffix)]
+    return None
+
+
+class _Watcher:
+    """Shared thread handling and counters."""
+
+    backend = ""
+
+    def __init__(self, callback: ChangeCallback):
+        self.callback = callback
+        self.events = 0
+        self.batches = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"plan-watch-{self.backend}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _deliver(self, names: Optional[Set[str]]):
+        self.batches += 1
+        try:
+            self.callback(names)
+        except Exception as e:
+            logger.error(f"Plan watcher callback failed: {e}")
+
+    def _run(self):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": self.backend, "events": self.events, "batches": self.batches}
+
+
+class InotifyWatcher(_Watcher):
+    """Watches one directory with inotify; raises OSError where inotify is unavailable."""
+
+    backend = "inotify"
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, directory: Path, callback: ChangeCallback, debounce: float = DEFAULT_DEBOUNCE):
+        super().__init__(callback)
+        self.directory = Path(directory)
+        self.debounce = debounce
+        libc_name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(libc_name, use_errno=True) if libc_name else None
+        if libc is None or not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(self.directory), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {self.directory}")
+
+    def _read_events(self) -> Tuple[Set[str], bool]:
+        """Plan names touched by the pending events, and whether a full rescan is needed."""
+        names, rescan = set(), False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return names, rescan
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                filename = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+                offset += length
+                self.events += 1
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                    continue
+                name = plan_name_of(filename)
+                if name is not None:
+                    names.add(name)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                # 去抖：同一计划的正文与元数据通常相继写入，合并为一批
+                time.sleep(self.debounce)
+                names, rescan = self._read_events()
+                if rescan:
+                    self._deliver(None)
+                elif names:
+                    self._deliver(names)
+        finally:
+            os.close(self._fd)
+
+
+class PollingWatcher(_Watcher):
+    """Re-scans a directory every ``interval`` seconds and reports plans whose files changed."""
+
+    backend = "poll"
+
+    def __init__(self, directory: Path, callback: ChangeCallback, interval: float = DEFAULT_INTERVAL):
+        super().__init__(callback)
+        self.directory = Path(directory)
+        self.interval = interval
+        self._state = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        state = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if plan_name_of(entry.name) is not None:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    state[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                state = self._scan()
+            except OSError as e:
+                logger.warning(f"Plan directory scan failed: {e}")
+                continue
+            changed = {name for name in state.keys() | self._state.keys() if state.get(name) != self._state.get(name)}
+            self._state = state
+            if changed:
+                self.events += len(changed)
+                self._deliver({plan_name_of(filename) for filename in changed})
+
+
+class SQLiteWatcher(_Watcher):
+    """Polls a SQLitePlanStore for commits made by other connections."""
+
+    backend = "sqlite-poll"
+
+    def __init__(self, store, callback: ChangeCallback, interval: float = DEFAULT_INTERVAL):
+        super().__init__(callback)
+        self.store = store
+        self.interval = interval
+        self._version = store.data_version()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            version = self.store.data_version()
+            if version != self._version:
+                self._version = version
+                self.events += 1
+                self._deliver(None)
+
+
+def start_watcher(store, callback: ChangeCallback) -> Optional[_Watcher]:
+    """Start the watcher selected by PLANS_WATCH for ``store``; None when watching is off."""
+    mode = os.getenv(WATCH_ENV_VAR, "auto").lower()
+    interval = float(os.getenv(WATCH_INTERVAL_ENV_VAR, DEFAULT_INTERVAL))
+    if mode == "off":
+        return None
+    if mode not in ("auto", "inotify", "poll"):
+        raise ValueError(f"Unknown {WATCH_ENV_VAR} {mode!r}; expected 'auto', 'inotify', 'poll' or 'off'")
+    if store.name == "sqlite":
+        return SQLiteWatcher(store, callback, interval).start()
+    if mode != "poll":
+        try:
+            return InotifyWatcher(store.plans_dir, callback).start()
+        except OSError as e:
+            if mode == "inotify":
+                raise
+            logger.info(f"inotify unavailable ({e}); polling {store.plans_dir} every {interval:g} s")
+    return PollingWatcher(store.plans_dir, callback, interval).start()
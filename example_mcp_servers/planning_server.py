@@ -5,78 +5,182 @@ This server provides:
 1. A planning prompt that guides an LLM to create structured plans
 2. Tools for plan management:
    - save_plan: Save a plan to disk with metadata
-   - list_plans: List available plans with optional filtering
-3. Resources for plan retrieval and analysis
+   - save_plans / get_plans: Save or read many plans in one call
+   - list_plans: List available plans with tag/date filters and pagination
+   - search_plans: Full-text search over plan contents
+   - get_server_stats: Startup time and plan cache statistics
+3. Resources for plan retrieval and analysis: planning://plan/{plan_name}
+   and planning://plans?names=a,b,c
+
+At startup only plan metadata is read and indexed in memory (see
+plan_index.py): an inverted tag -> plan index and a created_at-sorted
+index, kept up to date by load_plans() and save_plan(). Plan bodies are
+read on demand through a byte-bounded LRU (plan_cache.py, sized by
+PLAN_CACHE_MAX_BYTES). get_server_stats reports startup time and cache hit
+ratio.
+
+Plans written by other processes (another planning_server sharing
+PLANS_DIR, ops tooling) are picked up while running: a watcher
+(plan_watch.py; inotify, polling or SQLite data_version, see PLANS_WATCH)
+reports the changed plans and refresh_plans() updates only those entries.
+
+Plans are stored through plan_store.py: as .txt + .meta.json files in
+PLANS_DIR (default) or, with PLAN_STORE=sqlite, in a WAL-mode SQLite
+database with an FTS5 index.
 """
 
-import json
 import logging
+import os
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
+from urllib.parse import parse_qs
 
 # MCP imports
 from mcp.server.fastmcp import FastMCP
 
+from plan_cache import DEFAULT_MAX_BYTES, PlanBodyCache
+from plan_index import DEFAULT_PAGE_SIZE, PlanIndex
+from plan_store import get_plan_store
+from plan_watch import start_watcher
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
-PLANS_DIR = Path(__file__).parent / "plans"
+PLANS_DIR = Path(os.getenv("PLANS_DIR", Path(__file__).parent / "plans"))
 PLANS_DIR.mkdir(exist_ok=True)
+PLAN_CACHE_MAX_BYTES = int(os.getenv("PLAN_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
 
 # Create the MCP server
 mcp = FastMCP("Planning Assistant")
 
-# In-memory cache for plans
-plans_cache = {}
+# Plan storage backend (PLAN_STORE: files or sqlite)
+plan_store = get_plan_store(PLANS_DIR)
 
+# Tag and created_at indexes over plan metadata
+plan_index = PlanIndex()
 
-# Load existing plans into memory
-def load_plans():
-    """Load all existing plans into memory for faster access"""
-    global plans_cache
+# Plan bodies, loaded on demand
+plan_bodies = PlanBodyCache(PLAN_CACHE_MAX_BYTES)
+
+# Largest list save_plans, get_plans and planning://plans accept
+MAX_BATCH_SIZE = 100
+
+# Fields list_plans can return
+PLAN_FIELDS = ("name", "created_at", "tags", "path")
+
+# Filled in by load_plans()
+startup_stats: Dict[str, Any] = {}
+
+# Set once load_plans() has finished; watcher refreshes wait for it
+plans_loaded = threading.Event()
+
+# Plans updated from outside this process (see refresh_plans)
+refresh_stats = {"refreshes": 0, "updated": 0, "removed": 0}
 
-    try:
-        # Get all plan files
-        plan_files = list(PLANS_DIR.glob("*.txt"))
-
-        for plan_path in plan_files:
-            plan_name = plan_path.stem
-            metadata_path = PLANS_DIR / f"{plan_name}.meta.json"
-
-            # Load plan content
-            with open(plan_path, "r") as f:
-                plan_content = f.read()
-
-            # Load metadata if available
-            metadata = {}
-            if metadata_path.exists():
-                with open(metadata_path, "r") as f:
-                    try:
-                        metadata = json.load(f)
-                    except json.JSONDecodeError:
-                        logger.warning(
-                            f"Failed to parse metadata for plan: {plan_name}"
-                        )
-
-            # Store in cache
-            plans_cache[plan_name] = {
-                "content": plan_content,
-                "metadata": metadata,
-                "path": str(plan_path),
-            }
 
-        logger.info(f"Loaded {len(plans_cache)} plans into memory")
+# Index existing plans
+def load_plans():
+    """Index the metadata of all existing plans; plan bodies are not read."""
+    start = time.perf_counter()
+    try:
+        plan_index.add_many(plan_store.load_metadata().items())
     except Exception as e:
         logger.error(f"Failed to load plans: {e}")
+    plans_loaded.set()
+    startup_stats["plans"] = len(plan_index)
+    startup_stats["seconds"] = round(time.perf_counter() - start, 4)
+    logger.info(
+        f"Indexed {len(plan_index)} plans from {plan_store.name} store "
+        f"in {startup_stats['seconds'] * 1000:.1f} ms"
+    )
 
 
-# Load plans at startup
+def refresh_plans(plan_names: Optional[Set[str]]):
+    """Bring the index and body cache up to date with the store for ``plan_names``.
+
+    Called by the watcher when plans change outside this process; None
+    means any plan may have changed, and the whole index is compared with
+    the store. Only entries whose metadata changed are re-indexed.
+    """
+    plans_loaded.wait()
+    if plan_names is None:
+        current = plan_store.load_metadata()
+        plan_names = set(current) | set(plan_index.names())
+        lookup = current.get
+        plan_bodies.clear()
+    else:
+        lookup = plan_store.read_metadata
+        for name in plan_names:
+            plan_bodies.invalidate(name)
+
+    updated = removed = 0
+    for name in plan_names:
+        metadata = lookup(name)
+        if metadata is None:
+            if name in plan_index:
+                plan_index.remove(name)
+                removed += 1
+        elif metadata != plan_index.get(name):
+            plan_index.add(name, metadata)
+            updated += 1
+    refresh_stats["refreshes"] += 1
+    refresh_stats["updated"] += updated
+    refresh_stats["removed"] += removed
+    if updated or removed:
+        logger.info(f"Refreshed plans from {plan_store.name} store: {updated} updated, {removed} removed")
+
+
+# Watch for plans written by other processes, then index plans at startup
+plan_watcher = start_watcher(plan_store, refresh_plans)
 load_plans()
 
 
+def sanitize_plan_name(plan_name: str) -> str:
+    """Make a plan name safe for the filesystem."""
+    return plan_name.replace("/", "_").replace("\\", "_")
+
+
+def new_plan_metadata(plan_name: str, tags: Optional[List[str]]) -> Dict[str, Any]:
+    return {
+        "name": plan_name,
+        "tags": tags or [],
+        "created_at": str(datetime.now()),
+    }
+
+
+def format_plan(plan_name: str, metadata: Dict[str, Any], content: str) -> str:
+    """A plan as markdown, as served by the plan resources."""
+    # Format as markdown
+    result = f"# Plan: {plan_name}\n\n"
+
+    # Add metadata
+    result += "## Metadata\n\n"
+    result += f"- **Created**: {metadata.get('created_at', 'Unknown')}\n"
+    if "tags" in metadata and metadata["tags"]:
+        result += f"- **Tags**: {', '.join(metadata['tags'])}\n"
+
+    result += "\n## Content\n\n"
+    result += content
+
+    return result
+
+
+def read_plans(plan_names: List[str]) -> Dict[str, str]:
+    """Bodies of the indexed plans among ``plan_names``; cache misses are read in one batch."""
+    known = [name for name in plan_names if name in plan_index]
+    bodies = plan_bodies.get_many(known, plan_store.read_bodies)
+    for name in known:
+        if name not in bodies:
+            # 文件已在服务运行期间被删除
+            plan_index.remove(name)
+    return bodies
+
+
 @mcp.tool()
 async def save_plan(
     plan_name: str,
@@ -94,42 +198,22 @@ async def save_plan(
     Returns:
         Dictionary with results of the operation
     """
-    # Sanitize plan name to make it safe for filesystem
-    plan_name = plan_name.replace("/", "_").replace("\\", "_")
-
-    # Create plan file path
-    plan_path = PLANS_DIR / f"{plan_name}.txt"
-
-    # Create plan metadata
-    metadata = {
-        "name": plan_name,
-        "tags": tags or [],
-        "created_at": str(datetime.now()),
-    }
+    plan_name = sanitize_plan_name(plan_name)
+    metadata = new_plan_metadata(plan_name, tags)
 
-    # Save plan content to file
+    # Save plan content and metadata
     try:
         logger.debug(f"Saving plan: {plan_name}")
+        plan_store.save(plan_name, plan_content, metadata)
 
-        with open(plan_path, "w") as f:
-            f.write(plan_content)
-
-        # Also save metadata
-        metadata_path = PLANS_DIR / f"{plan_name}.meta.json"
-        with open(metadata_path, "w") as f:
-            json.dump(metadata, f, indent=2)
-
-        # Update cache
-        plans_cache[plan_name] = {
-            "content": plan_content,
-            "metadata": metadata,
-            "path": str(plan_path),
-        }
+        # Update index and cache
+        plan_index.add(plan_name, metadata)
+        plan_bodies.put(plan_name, plan_content)
 
         return {
             "success": True,
             "message": f"Plan '{plan_name}' saved successfully",
-            "path": str(plan_path),
+            "path": plan_store.location(plan_name),
         }
 
     except Exception as e:
@@ -141,43 +225,188 @@ async def save_plan(
 
 
 @mcp.tool()
-async def list_plans(tag: Optional[str] = None) -> Dict[str, Any]:
+async def save_plans(plans: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    List all available plans, optionally filtered by tag.
+    Save several plans in one call, written and synced to storage together.
 
     Args:
-        tag: Optional tag to filter plans by
+        plans: Up to 100 items, each {"plan_name": str, "plan_content": str,
+            "tags": optional list of str}
 
     Returns:
-        Dictionary with list of available plans
+        Dictionary with one result per item, in order, and the number saved.
+        When several items share a plan_name, only the last one is saved;
+        the earlier ones are reported with "superseded": True.
     """
+    if len(plans) > MAX_BATCH_SIZE:
+        return {
+            "success": False,
+            "message": f"At most {MAX_BATCH_SIZE} plans can be saved at once, got {len(plans)}",
+        }
+
+    results: List[Dict[str, Any]] = []
+    batch: Dict[str, Any] = {}  # 同名计划以最后一项为准，之前的项标记为 superseded
+    for item in plans:
+        plan_name = item.get("plan_name") if isinstance(item, dict) else None
+        plan_content = item.get("plan_content") if isinstance(item, dict) else None
+        tags = item.get("tags") if isinstance(item, dict) else None
+        if not isinstance(plan_name, str) or not plan_name.strip():
+            results.append({"success": False, "message": "plan_name must be a non-empty string"})
+            continue
+        if not isinstance(plan_content, str):
+            results.append({"plan_name": plan_name, "success": False, "message": "plan_content must be a string"})
+            continue
+        if tags is not None and not (isinstance(tags, list) and all(isinstance(tag, str) for tag in tags)):
+            results.append({"plan_name": plan_name, "success": False, "message": "tags must be a list of strings"})
+            continue
+        plan_name = sanitize_plan_name(plan_name)
+        if plan_name in batch:
+            earlier = batch[plan_name][3]
+            earlier.update(success=False, superseded=True,
+                           message="Superseded by a later item with the same plan_name in this batch")
+        result = {"plan_name": plan_name, "success": True}
+        batch[plan_name] = (plan_name, plan_content, new_plan_metadata(plan_name, tags), result)
+        results.append(result)
+
     try:
-        logger.debug(f"Listing plans{' with tag: ' + tag if tag else ''}")
+        logger.debug(f"Saving {len(batch)} plans")
+        plan_store.save_many(item[:3] for item in batch.values())
+    except Exception as e:
+        logger.error(f"Error saving plans: {e}")
+        for result in results:
+            if result["success"]:
+                result.update(success=False, message=f"Failed to save plan: {str(e)}")
+    else:
+        for plan_name, plan_content, metadata, _ in batch.values():
+            plan_index.add(plan_name, metadata)
+            plan_bodies.put(plan_name, plan_content)
+        for result in results:
+            if result["success"]:
+                result["path"] = plan_store.location(result["plan_name"])
+
+    saved = sum(result["success"] for result in results)
+    failed = [result for result in results if not result["success"] and not result.get("superseded")]
+    return {"success": not failed, "results": results, "saved": saved}
 
-        # Filter plans by tag if specified
-        if tag:
-            filtered_plans = {
-                name: plan
-                for name, plan in plans_cache.items()
-                if tag in plan["metadata"].get("tags", [])
-            }
+
+@mcp.tool()
+async def get_plans(names: List[str], include_content: bool = True) -> Dict[str, Any]:
+    """
+    Get several plans in one call.
+
+    Args:
+        names: Up to 100 plan names
+        include_content: Return plan contents as well as metadata
+
+    Returns:
+        Dictionary with one entry per name, in order, each with found and,
+        for found plans, created_at, tags and content
+    """
+    if len(names) > MAX_BATCH_SIZE:
+        return {
+            "success": False,
+            "message": f"At most {MAX_BATCH_SIZE} plans can be read at once, got {len(names)}",
+        }
+    try:
+        if include_content:
+            bodies = read_plans(names)
+            found = bodies.keys()
         else:
-            filtered_plans = plans_cache
+            bodies, found = {}, [name for name in names if name in plan_index]
+
+        plan_list = []
+        for name in names:
+            if name not in found:
+                plan_list.append({"name": name, "found": False})
+                continue
+            metadata = plan_index.get(name)
+            plan = {
+                "name": name,
+                "found": True,
+                "created_at": metadata.get("created_at", "Unknown"),
+                "tags": metadata.get("tags", []),
+            }
+            if include_content:
+                plan["content"] = bodies[name]
+            plan_list.append(plan)
+
+        return {
+            "success": True,
+            "plans": plan_list,
+            "found": sum(plan["found"] for plan in plan_list),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting plans: {e}")
+        return {
+            "success": False,
+            "message": f"Failed to get plans: {str(e)}",
+        }
+
+
+@mcp.tool()
+async def list_plans(
+    tag: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    match: str = "all",
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    List available plans, oldest first, one page at a time.
+
+    Args:
+        tag: Optional single tag to filter plans by
+        tags: Optional list of tags to filter plans by
+        match: "all" (plan has every tag) or "any" (plan has at least one)
+        created_after: Optional date/time (ISO format); only plans created at or after it
+        created_before: Optional date/time (ISO format); only plans created before it
+        cursor: next_cursor from the previous page, to continue listing
+        limit: Maximum number of plans to return (at most 1000)
+        fields: Fields to return per plan: name, created_at, tags, path (default: all)
+
+    Returns:
+        Dictionary with the page of plans, its size, the total number of
+        matches and next_cursor (null on the last page)
+    """
+    try:
+        filter_tags = list(tags or [])
+        if tag:
+            filter_tags.append(tag)
+        fields = list(fields or PLAN_FIELDS)
+        unknown = [field for field in fields if field not in PLAN_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}; available: {list(PLAN_FIELDS)}")
+        logger.debug(f"Listing plans{' with tags: ' + ', '.join(filter_tags) if filter_tags else ''}")
+
+        names, next_cursor, total = plan_index.query(
+            filter_tags, match, created_after, created_before, cursor, limit
+        )
 
         # Format plan information
         plan_list = []
-        for name, plan in filtered_plans.items():
-            metadata = plan["metadata"]
-            plan_list.append(
-                {
-                    "name": name,
-                    "created_at": metadata.get("created_at", "Unknown"),
-                    "tags": metadata.get("tags", []),
-                    "path": plan["path"],
-                }
-            )
-
-        return {"success": True, "plans": plan_list, "count": len(plan_list)}
+        for name in names:
+            metadata = plan_index.get(name)
+            if metadata is None:
+                continue  # 刚被其他进程删除
+            plan = {
+                "name": name,
+                "created_at": metadata.get("created_at", "Unknown"),
+                "tags": metadata.get("tags", []),
+                "path": plan_store.location(name),
+            }
+            plan_list.append({field: plan[field] for field in fields})
+
+        return {
+            "success": True,
+            "plans": plan_list,
+            "count": len(plan_list),
+            "total": total,
+            "next_cursor": next_cursor,
+        }
 
     except Exception as e:
         logger.error(f"Error listing plans: {e}")
@@ -187,6 +416,55 @@ async def list_plans(tag: Optional[str] = None) -> Dict[str, Any]:
         }
 
 
+@mcp.tool()
+async def search_plans(query: str, limit: int = 20) -> Dict[str, Any]:
+    """
+    Search plan contents.
+
+    Args:
+        query: Words to search for. With the SQLite store, FTS5 syntax is
+            supported ("exact phrase", AND/OR/NOT, prefix*)
+        limit: Maximum number of results to return (at most 100)
+
+    Returns:
+        Dictionary with matching plans, best match first, each with a
+        relevance score, a snippet of the matching content and its tags
+    """
+    try:
+        results = plan_store.search(query, max(1, min(limit, 100)))
+        for result in results:
+            metadata = plan_index.get(result["name"]) or {}
+            result["created_at"] = metadata.get("created_at", "Unknown")
+            result["tags"] = metadata.get("tags", [])
+        return {"success": True, "results": results, "count": len(results)}
+
+    except Exception as e:
+        logger.error(f"Error searching plans: {e}")
+        return {
+            "success": False,
+            "message": f"Failed to search plans: {str(e)}",
+        }
+
+
+@mcp.tool()
+async def get_server_stats() -> Dict[str, Any]:
+    """
+    Report planning server startup time and plan cache usage.
+
+    Returns:
+        Dictionary with the number of indexed plans, startup indexing time
+        and plan body cache statistics (entries, bytes, hit ratio)
+    """
+    return {
+        "success": True,
+        "plans": len(plan_index),
+        "startup_seconds": startup_stats.get("seconds"),
+        "store": plan_store.stats(),
+        "cache": plan_bodies.stats(),
+        "watcher": dict(plan_watcher.stats(), **refresh_stats) if plan_watcher else None,
+    }
+
+
 @mcp.prompt("create_plan_prompt")
 def create_plan_prompt() -> str:
     """
@@ -228,25 +506,47 @@ def plan_resource(plan_name: str) -> str:
     Args:
         plan_name: Name of the plan to retrieve
     """
-    if plan_name not in plans_cache:
+    metadata = plan_index.get(plan_name)
+    if metadata is None:
+        return "# Error\n\nPlan not found. Please check the plan name or create a new plan."
+    try:
+        content = plan_bodies.get(plan_name, plan_store.read_body)
+    except FileNotFoundError:
+        # 文件已在服务运行期间被删除
+        plan_index.remove(plan_name)
         return "# Error\n\nPlan not found. Please check the plan name or create a new plan."
 
-    plan = plans_cache[plan_name]
-    metadata = plan["metadata"]
+    return format_plan(plan_name, metadata, content)
 
-    # Format as markdown
-    result = f"# Plan: {plan_name}\n\n"
 
-    # Add metadata
-    result += "## Metadata\n\n"
-    result += f"- **Created**: {metadata.get('created_at', 'Unknown')}\n"
-    if "tags" in metadata and metadata["tags"]:
-        result += f"- **Tags**: {', '.join(metadata['tags'])}\n"
-
-    result += "\n## Content\n\n"
-    result += plan["content"]
+@mcp.resource("planning://plans{query}")
+def plans_resource(query: str) -> str:
+    """
+    Get several saved plans as one resource: planning://plans?names=a,b,c
 
-    return result
+    Args:
+        query: The URI query string; ``names`` is a comma-separated list of
+            plan names (at most 100)
+    """
+    names = [
+        name
+        for value in parse_qs(query.lstrip("?")).get("names", [])
+        for name in value.split(",")
+        if name
+    ]
+    if not names:
+        return "# Error\n\nNo plan names given. Use planning://plans?names=plan_a,plan_b"
+    if len(names) > MAX_BATCH_SIZE:
+        return f"# Error\n\nAt most {MAX_BATCH_SIZE} plans can be read at once."
+
+    bodies = read_plans(names)
+    sections = []
+    for name in names:
+        if name in bodies:
+            sections.append(format_plan(name, plan_index.get(name), bodies[name]))
+        else:
+            sections.append(f"# Plan: {name}\n\nPlan not found.")
+    return "\n\n---\n\n".join(sections)
 
 
 # Allow direct execution of the server
@@ -0,0 +1,81 @@
+"""
+Local stand-ins for the speech recognition and chat-completion backends.
+
+Used by the benchmarks and by ``soap_service.py --fake`` to exercise the full
+workflow offline: latency is simulated, responses are canned.
+"""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+SAMPLE_TRANSCRIPT = (
+    "The patient reports persistent headaches for two weeks, occasional dizziness when standing up, "
+    "and blurry vision in the evenings. She denies fever or nausea."
+)
+
+FAKE_EXTRACTION = {
+    "symptom_raw": ["persistent headaches", "occasional dizziness when standing up", "blurry vision"],
+    "symptom_standardized": ["Cephalalgia", "Orthostatic dizziness", "Blurred vision"],
+    "possible_conditions": ["Migraine", "Hypertension", "Orthostatic hypotension"],
+    "confidence": 0.9,
+}
+FAKE_SOAP = {
+    "subjective": "Persistent headaches for two weeks, dizziness on standing, evening blurry vision.",
+    "objective": "Cephalalgia, orthostatic dizziness, blurred vision. No fever or nausea.",
+    "assessment": "Rule out hypertension, migraine or orthostatic hypotension.",
+    "plan": "Check blood pressure lying and standing, fundoscopy, follow up in one week.",
+}
+
+
+def _tokens(text):
+    # 粗略估算：约 4 个字符一个 token
+    return max(1, len(text) // 4)
+
+
+class FakeRecognizer:
+    """Blocking recognizer stand-in with a fixed per-segment latency."""
+
+    language_code = "en-US"
+
+    def __init__(self, latency=1.0):
+        self.latency = latency
+
+    def recognize(self, pcm, sample_rate):
+        time.sleep(self.latency)
+        return "The patient reports persistent headaches and occasional dizziness."
+
+
+class FakeChatClient:
+    """Async chat client stand-in: fixed overhead plus per-token prompt and completion cost."""
+
+    def __init__(self, overhead=0.8, per_prompt_token=0.0002, per_completion_token=0.02):
+        self.overhead = overhead
+        self.per_prompt_token = per_prompt_token
+        self.per_completion_token = per_completion_token
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @staticmethod
+    def _content(prompt):
+        if '"soap_note"' in prompt:
+            return json.dumps({**FAKE_EXTRACTION, "soap_note": FAKE_SOAP})
+        if "SOAP note" in prompt:
+            return "\n\n".join(f"{key[0].upper()}: {value}" for key, value in FAKE_SOAP.items())
+        return json.dumps(FAKE_EXTRACTION)
+
+    async def _stream(self, content):
+        await asyncio.sleep(self.overhead)
+        for line in content.splitlines(keepends=True):
+            await asyncio.sleep(_tokens(line) * self.per_completion_token)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=line))])
+
+    async def _create(self, model, messages, stream=False, **params):
+        prompt = "".join(m["content"] for m in messages)
+        content = self._content(prompt)
+        if stream:
+            return self._stream(content)
+        usage = SimpleNamespace(prompt_tokens=_tokens(prompt), completion_tokens=_tokens(content))
+        await asyncio.sleep(self.overhead + usage.prompt_tokens * self.per_prompt_token
+                            + usage.completion_tokens * self.per_completion_token)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
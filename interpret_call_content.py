@@ -1,67 +1,110 @@
-from openai import OpenAI
-import json
-import os
-from dotenv import load_dotenv
-
-# 加载 .env 文件中的环境变量
-load_dotenv()
-
-# 获取 API 密钥
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("Cannot find OPENAI_API_KEY, please set the environment variable or provide it in the .env file")
-
-client = OpenAI(api_key=api_key)
-
-# 从本地文件读取转录文本
-try:
-    with open("transcribed_text.txt", "r", encoding="utf-8") as file:
-        transcript = file.read().strip()
-    print("Successfully read transcribed_text.txt file")
-except FileNotFoundError:
-    # 如果文件不存在，使用默认示例
-    transcript = "The patient reports persistent headaches, occasional dizziness, and blurry vision."
-    print("Warning: transcribed_text.txt file not found, using default example text")
-
-# 构建结构化 prompt
-structured_prompt = f"""
-Extract the following from the transcript:
-1. Original symptom descriptions.
-2. Standardized medical terms.
-3. Possible conditions (based on symptoms).
-Return output in JSON.
-Transcript:
-"{transcript}"
-
-Expected format:
-{{
-  "symptom_raw": [...],
-  "symptom_standardized": [...],
-  "possible_conditions": [...]
-}}
 """
+Symptom extraction from a visit transcript.
+
+Importing this module has no side effects: the OpenAI client is created on
+first use (see clients.py). Run it as a script to interpret
+transcribed_text.txt and save the result to interpret_text.json.
+
+The reply is requested as structured JSON where the model supports it,
+parsed with the tolerant repair parser and validated against the
+extraction schema; an unusable reply gets one targeted re-ask.
+"""
+
+import json
+
+from clients import get_openai_client
+from llm_cache import cached_chat_completion
+from soap_prompts import EXTRACTION_JSON_FORMAT, EXTRACTION_SYSTEM_PROMPT, build_extraction_prompt, build_reask_prompt
+from structured_output import EXTRACTION_SCHEMA, parse_extraction, response_format_for, structured_output_mode
+
+TRANSCRIPT_FILE = "transcribed_text.txt"
+OUTPUT_FILE = "interpret_text.json"
+DEFAULT_TRANSCRIPT = "The patient reports persistent headaches, occasional dizziness, and blurry vision."
+
+EXPECTED_FORMAT = EXTRACTION_JSON_FORMAT
+
+
+def __getattr__(name):
+    # 兼容旧代码的 `from interpret_call_content import client`，按需创建共享客户端
+    if name == "client":
+        return get_openai_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def build_structured_prompt(transcript):
+    """Extraction prompt with the expected JSON layout spelled out."""
+    return build_extraction_prompt(transcript) + EXPECTED_FORMAT
+
 
-# 使用新版 OpenAI API 生成结果
-response = client.chat.completions.create(
-    model="gpt-4",  # 或者使用 "gpt-3.5-turbo"
-    messages=[
-        {"role": "system", "content": "You are a medical assistant that extracts and standardizes symptoms from patient transcripts."},
-        {"role": "user", "content": structured_prompt}
-    ],
-    temperature=0.1  # 降低随机性以获得更确定性的回答
-)
-
-# 打印结果 - 新API的访问方式有所不同
-print(response.choices[0].message.content)
-
-# 如果需要解析 JSON 输出，并保存到 interpret_text.json 文件
-try:
-    result_json = json.loads(response.choices[0].message.content)
+def load_transcript(path=TRANSCRIPT_FILE):
+    """Read the transcript, falling back to a short example when the file is missing."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            transcript = file.read().strip()
+        print(f"Successfully read {path} file")
+    except FileNotFoundError:
+        # 如果文件不存在，使用默认示例
+        transcript = DEFAULT_TRANSCRIPT
+        print(f"Warning: {path} file not found, using default example text")
+    return transcript
+
+
+def _extraction_messages(transcript):
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": build_structured_prompt(transcript)}
+    ]
+
+
+def _complete(client, model, messages, bypass_cache):
+    # 相同输入命中 LLM 响应缓存
+    return cached_chat_completion(
+        client or get_openai_client(),
+        model=model,  # 或者使用 "gpt-3.5-turbo"
+        messages=messages,
+        bypass=bypass_cache,
+        temperature=0.1,  # 降低随机性以获得更确定性的回答
+        **response_format_for(structured_output_mode(model), "symptom_extraction", EXTRACTION_SCHEMA)
+    )
+
+
+def interpret_transcript(transcript, client=None, model="gpt-4", bypass_cache=False):
+    """Return the raw model response with the extracted symptoms (expected to be JSON)."""
+    return _complete(client, model, _extraction_messages(transcript), bypass_cache)
+
+
+def extract_symptoms(transcript, client=None, model="gpt-4", bypass_cache=False):
+    """Extracted symptoms as a dict matching the extraction schema.
+
+    Raises ValueError when neither the reply nor the one re-ask can be used.
+    """
+    messages = _extraction_messages(transcript)
+    content = _complete(client, model, messages, bypass_cache)
+    data, problems, _ = parse_extraction(content)
+    if problems:
+        print(f"Warning: extraction reply unusable ({'; '.join(problems)}), asking again")
+        messages = messages + [
+            {"role": "assistant", "content": content or ""},
+            {"role": "user", "content": build_reask_prompt(problems)},
+        ]
+        data, problems, _ = parse_extraction(_complete(client, model, messages, bypass_cache))
+    if problems:
+        raise ValueError(f"Extraction does not match the expected format: {'; '.join(problems)}")
+    return data
+
+
+def main():
+    try:
+        result_json = extract_symptoms(load_transcript())
+    except ValueError as e:
+        print(f"\nWarning: {e}")
+        return
     print("\nParsed JSON:")
     print(json.dumps(result_json, indent=2))
-    # 保存到 interpret_text.json
-    with open("interpret_text.json", "w", encoding="utf-8") as f:
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump(result_json, f, ensure_ascii=False, indent=2)
-    print("\nSuccessfully saved parsed result to: interpret_text.json")
-except json.JSONDecodeError:
-    print("\nWarning: Response could not be parsed as JSON")
\ No newline at end of file
+    print(f"\nSuccessfully saved parsed result to: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
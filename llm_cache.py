@@ -0,0 +1,307 @@
+"""
+Response cache for chat-completion calls.
+
+The SOAP pipeline sends deterministic, low-temperature prompts, so identical
+transcripts produce identical completions. Responses are memoized under a
+normalized hash of model, messages and request parameters, in a pluggable
+storage backend (in-memory LRU or SQLite), with a TTL and an explicit bypass.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND_ENV_VAR = "SOAP_LLM_CACHE"  # "sqlite" (default), "memory" or "off"
+CACHE_PATH_ENV_VAR = "SOAP_LLM_CACHE_PATH"
+CACHE_TTL_ENV_VAR = "SOAP_LLM_CACHE_TTL"
+
+DEFAULT_CACHE_PATH = ".cache/llm_responses.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MEMORY_ENTRIES = 256
+
+
+class MemoryLRUStorage:
+    """In-process LRU storage bounded by entry count."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str, expires_at: Optional[float]):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStorage:
+    """Persistent storage in a single SQLite table, shared across runs."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, expires_at REAL)"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, expires_at: Optional[float]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, time.time(), expires_at),
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+
+def _normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    normalized = []
+    for message in messages:
+        message = dict(message)
+        if isinstance(message.get("content"), str):
+            # 统一换行与首尾空白，避免格式差异导致缓存未命中
+            message["content"] = message["content"].replace("\r\n", "\n").strip()
+        normalized.append(message)
+    return normalized
+
+
+class LLMResponseCache:
+    """Chat-completion response cache with TTL on top of a storage backend."""
+
+    def __init__(self, storage=None, ttl: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.storage = storage if storage is not None else MemoryLRUStorage()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, Any]], **params) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": _normalize_messages(messages), "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.storage.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.time():
+                self.hits += 1
+                return value
+            self.storage.delete(key)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Store ``value``; ``ttl`` (default: the cache's) None never expires, 0 or less is not cached."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        self.storage.set(key, value, expires_at)
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Process-wide cache configured from the environment; None when disabled."""
+    global _default_cache
+    backend = os.getenv(CACHE_BACKEND_ENV_VAR, "sqlite").lower()
+    if backend == "off":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            ttl = float(os.getenv(CACHE_TTL_ENV_VAR, DEFAULT_TTL_SECONDS))
+            if backend == "memory":
+                storage = MemoryLRUStorage()
+            else:
+                storage = SQLiteStorage(os.getenv(CACHE_PATH_ENV_VAR, DEFAULT_CACHE_PATH))
+            _default_cache = LLMResponseCache(storage, ttl=ttl)
+        return _default_cache
+
+
+def cached_chat_completion(
+    client,
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    cache: Optional[LLMResponseCache] = None,
+    bypass: bool = False,
+    ttl: Optional[float] = None,
+    on_usage: Optional[Callable[[Any], None]] = None,
+    **params,
+) -> str:
+    """Return the message content of a chat completion, served from cache when possible.
+
+    With ``bypass=True`` the cache is not read, but the fresh response is still
+    stored so later calls see it. ``on_usage`` is called with the response's
+    ``usage`` (possibly None) whenever a fresh completion was requested.
+    """
+    cache = cache if cache is not None else get_llm_cache()
+    key = LLMResponseCache.make_key(model, messages, **params) if cache else None
+    if cache and not bypass:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for model {model}")
+            return cached
+
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    if on_usage is not None:
+        on_usage(getattr(response, "usage", None))
+    content = response.choices[0].message.content
+    if cache and content is not None:
+        cache.set(key, content, ttl)
+    return content
+
+
+def stream_chat_completion(
+    client,
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    cache: Optional[LLMResponseCache] = None,
+    bypass: bool = False,
+    ttl: Optional[float] = None,
+    on_usage: Optional[Callable[[Any], None]] = None,
+    **params,
+) -> Iterator[str]:
+    """Yield the content of a chat completion as text deltas while it is generated.
+
+    A cache hit is yielded as a single delta. A streamed response is stored
+    in the cache only once it has completed. ``on_usage`` is called with
+    None (streamed responses carry no usage) when a fresh completion is
+    requested, so callers can tell cache hits apart.
+    """
+    cache = cache if cache is not None else get_llm_cache()
+    key = LLMResponseCache.make_key(model, messages, **params) if cache else None
+    if cache and not bypass:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for model {model}")
+            yield cached
+            return
+
+    parts = []
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    if on_usage is not None:
+        on_usage(None)
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    if cache and parts:
+        cache.set(key, "".join(parts), ttl)
+
+
+async def acached_chat_completion(
+    client,
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    cache: Optional[LLMResponseCache] = None,
+    bypass: bool = False,
+    ttl: Optional[float] = None,
+    on_usage: Optional[Callable[[Any], None]] = None,
+    **params,
+) -> str:
+    """Async variant of cached_chat_completion for an AsyncOpenAI client.
+
+    Cache storage access runs in a worker thread so a SQLite lookup never
+    blocks the event loop.
+    """
+    cache = cache if cache is not None else get_llm_cache()
+    key = LLMResponseCache.make_key(model, messages, **params) if cache else None
+    if cache and not bypass:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for model {model}")
+            return cached
+
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    if on_usage is not None:
+        on_usage(getattr(response, "usage", None))
+    content = response.choices[0].message.content
+    if cache and content is not None:
+        await asyncio.to_thread(cache.set, key, content, ttl)
+    return content
+
+
+async def astream_chat_completion(
+    client,
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    cache: Optional[LLMResponseCache] = None,
+    bypass: bool = False,
+    ttl: Optional[float] = None,
+    on_usage: Optional[Callable[[Any], None]] = None,
+    **params,
+) -> AsyncIterator[str]:
+    """Async variant of stream_chat_completion for an AsyncOpenAI client."""
+    cache = cache if cache is not None else get_llm_cache()
+    key = LLMResponseCache.make_key(model, messages, **params) if cache else None
+    if cache and not bypass:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for model {model}")
+            yield cached
+            return
+
+    parts = []
+    stream = await client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+    if on_usage is not None:
+        on_usage(None)
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+    if cache and parts:
+        await asyncio.to_thread(cache.set, key, "".join(parts), ttl)
@@ -0,0 +1,410 @@
+"""
+Model tiering for the SOAP workflow's LLM stages.
+
+Tiers are the ``llms`` entries of aurite_config.json. Each stage has an
+ordered list of tiers (its route): symptom extraction goes to a fast model
+first, as structured output where the model supports it. The reply goes
+through the repair parser and the compiled extraction schema validator
+(``symptom_raw`` / ``symptom_standardized`` / ``possible_conditions``, see
+structured_output.py); a reply that is still unusable gets a targeted
+re-ask on the same tier, and only a persistent schema failure or a
+low-confidence result is escalated to the next, stronger tier. SOAP generation and the fused mode go
+straight to the strong tier; the fused reply is structured output too, checked
+against FUSED_SCHEMA and re-asked the same way, but fails instead of escalating. Calls, latency, tokens and estimated cost are
+accounted per tier; responses served from the LLM cache are counted as
+cache hits, not calls, and cost nothing.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from llm_cache import acached_chat_completion, astream_chat_completion
+from soap_prompts import EXTRACTION_JSON_FORMAT, FUSED_JSON_FORMAT, build_reask_prompt
+from structured_output import (
+    EXTRACTION_SCHEMA,
+    FUSED_SCHEMA,
+    parse_extraction,
+    response_format_for,
+    structured_output_mode,
+    validate_extraction,
+    validate_fused,
+)
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH_ENV_VAR = "SOAP_AURITE_CONFIG"
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent / "aurite_config.json"
+
+# 各阶段使用的 llm_id，逗号分隔，按升级顺序排列
+ROUTE_ENV_VARS = {
+    "extraction": "SOAP_EXTRACTION_LLMS",
+    "soap": "SOAP_NOTE_LLMS",
+    "fused": "SOAP_FUSED_LLMS",
+}
+DEFAULT_ROUTES = {
+    "extraction": ["soap_extraction_fast", "soap_note_strong"],
+    "soap": ["soap_note_strong"],
+    "fused": ["soap_note_strong"],
+}
+MIN_CONFIDENCE_ENV_VAR = "SOAP_EXTRACTION_MIN_CONFIDENCE"
+DEFAULT_MIN_CONFIDENCE = 0.6
+REASKS_ENV_VAR = "SOAP_EXTRACTION_REASKS"
+DEFAULT_REASKS = 1
+# 每个模型保留的最近调用耗时样本数（长驻进程中避免无限增长）
+LATENCY_WINDOW = 2048
+
+# 美元 / 1K tokens（输入, 输出）；配置项可用 cost_per_1k_input / cost_per_1k_output 覆盖
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4-turbo-preview": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+@dataclass
+class ModelTier:
+    """One configured model: an ``llms`` entry of aurite_config.json."""
+
+    llm_id: str
+    model_name: str
+    temperature: float = 0.1
+    max_tokens: Optional[int] = None
+    cost_per_1k_input: float = 0.0
+    cost_per_1k_output: float = 0.0
+    structured_output: Optional[str] = None  # "json_schema"、"json_object" 或 None（配置中写 null 可关闭）
+
+    @classmethod
+    def from_config(cls, entry: Dict[str, Any]) -> "ModelTier":
+        model_name = entry["model_name"]
+        input_price, output_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+        return cls(
+            llm_id=entry["llm_id"],
+            model_name=model_name,
+            temperature=entry.get("temperature", 0.1),
+            max_tokens=entry.get("max_tokens"),
+            cost_per_1k_input=entry.get("cost_per_1k_input", input_price),
+            cost_per_1k_output=entry.get("cost_per_1k_output", output_price),
+            structured_output=entry.get("structured_output", structured_output_mode(model_name)),
+        )
+
+    def params(self) -> Dict[str, Any]:
+        params = {"temperature": self.temperature}
+        if self.max_tokens:
+            params["max_tokens"] = self.max_tokens
+        return params
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.cost_per_1k_input + completion_tokens * self.cost_per_1k_output) / 1000
+
+
+# 配置中缺少所引用的 llm_id 时使用，保持原先的 gpt-4 行为
+FALLBACK_TIER = ModelTier.from_config({"llm_id": "gpt-4", "model_name": "gpt-4"})
+
+
+def load_tiers(path=None) -> Dict[str, ModelTier]:
+    """Read the ``llms`` entries of the Aurite project config, keyed by llm_id."""
+    path = Path(path or os.getenv(CONFIG_PATH_ENV_VAR) or DEFAULT_CONFIG_PATH)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("llms", [])
+    except FileNotFoundError:
+        logger.warning(f"{path} not found; all LLM stages use {FALLBACK_TIER.model_name}")
+        return {}
+    return {entry["llm_id"]: ModelTier.from_config(entry) for entry in entries}
+
+
+def _estimate_tokens(text: str) -> int:
+    # 无 usage 信息（流式响应）时粗略估算：约 4 个字符一个 token
+    return max(1, len(text) // 4)
+
+
+def extraction_confidence(data: Dict[str, Any], transcript: str) -> float:
+    """Confidence in a schema-valid extraction, between 0 and 1.
+
+    Uses the model's own ``confidence`` field when it reports one; otherwise
+    checks that symptoms were found at all, that every raw symptom has a
+    standardized term, and that the raw descriptions are grounded in the
+    transcript (most of their words appear in it).
+    """
+    reported = data.get("confidence")
+    if isinstance(reported, (int, float)) and not isinstance(reported, bool):
+        return max(0.0, min(1.0, float(reported)))
+
+    raw = data["symptom_raw"]
+    standardized = data["symptom_standardized"]
+    if not raw:
+        # 转录内容很短时没有症状是合理的
+        return 1.0 if len(_WORD.findall(transcript.lower())) < 20 else 0.0
+    confidence = 1.0
+    if len(standardized) != len(raw):
+        confidence *= 0.7
+    if not data["possible_conditions"]:
+        confidence *= 0.8
+    transcript_words = set(_WORD.findall(transcript.lower()))
+    grounded = 0
+    for phrase in raw:
+        words = _WORD.findall(phrase.lower())
+        if words and sum(word in transcript_words for word in words) / len(words) >= 0.5:
+            grounded += 1
+    return confidence * grounded / len(raw)
+
+
+class _TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.escalations = 0
+        self.repairs = 0
+        self.reasks = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+
+class ModelRouter:
+    """Routes LLM stages to configured model tiers and escalates extraction on failure."""
+
+    def __init__(
+        self,
+        tiers: Optional[Dict[str, ModelTier]] = None,
+        routes: Optional[Dict[str, List[str]]] = None,
+        min_confidence: Optional[float] = None,
+        reasks: Optional[int] = None,
+    ):
+        self.tiers = load_tiers() if tiers is None else tiers
+        self.routes = dict(DEFAULT_ROUTES)
+        for stage, env_var in ROUTE_ENV_VARS.items():
+            if os.getenv(env_var):
+                self.routes[stage] = [llm_id.strip() for llm_id in os.getenv(env_var).split(",") if llm_id.strip()]
+        self.routes.update(routes or {})
+        if min_confidence is None:
+            min_confidence = float(os.getenv(MIN_CONFIDENCE_ENV_VAR, DEFAULT_MIN_CONFIDENCE))
+        self.min_confidence = min_confidence
+        self.reasks = int(os.getenv(REASKS_ENV_VAR, DEFAULT_REASKS)) if reasks is None else reasks
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _TierStats] = {}
+
+    def tiers_for(self, stage: str) -> List[ModelTier]:
+        """Tiers of ``stage`` in escalation order; unknown llm_ids are skipped."""
+        tiers = []
+        for llm_id in self.routes.get(stage, []):
+            if llm_id in self.tiers:
+                tiers.append(self.tiers[llm_id])
+            else:
+                logger.warning(f"LLM '{llm_id}' for stage '{stage}' is not in the llms config; skipped")
+        return tiers or [FALLBACK_TIER]
+
+    def _record(self, tier, latency, prompt_tokens, completion_tokens, usage,
+                escalated=False, repaired=False, reask=False):
+        fresh = prompt_tokens is not None
+        cost = tier.cost(prompt_tokens, completion_tokens) if fresh else 0.0
+        with self._lock:
+            stats = self._stats.setdefault(tier.llm_id, _TierStats())
+            if fresh:
+                stats.calls += 1
+                stats.latencies.append(latency)
+                stats.total_latency += latency
+                stats.prompt_tokens += prompt_tokens
+                stats.completion_tokens += completion_tokens
+                stats.cost += cost
+            else:
+                stats.cache_hits += 1
+            if escalated:
+                stats.escalations += 1
+            if repaired:
+                stats.repairs += 1
+            if reask:
+                stats.reasks += 1
+        if usage is not None:
+            run = usage.setdefault(
+                tier.llm_id, {"model": tier.model_name, "calls": 0, "cache_hits": 0, "seconds": 0.0, "cost_usd": 0.0}
+            )
+            if fresh:
+                run["calls"] += 1
+                run["seconds"] += latency
+                run["cost_usd"] += cost
+            else:
+                run["cache_hits"] += 1
+
+    async def _complete(self, client, tier, messages, bypass, usage, **extra_params):
+        """One non-streaming call on ``tier``; returns (content, latency)."""
+        tokens = {}
+
+        def on_usage(response_usage):
+            prompt = getattr(response_usage, "prompt_tokens", None)
+            completion = getattr(response_usage, "completion_tokens", None)
+            tokens["prompt"] = prompt if prompt is not None else _estimate_tokens("".join(m["content"] for m in messages))
+            tokens["completion"] = completion
+
+        started_at = time.perf_counter()
+        content = await acached_chat_completion(
+            client, bypass=bypass, model=tier.model_name, messages=messages, on_usage=on_usage,
+            **tier.params(), **extra_params
+        )
+        latency = time.perf_counter() - started_at
+        if tokens and tokens["completion"] is None:
+            tokens["completion"] = _estimate_tokens(content or "")
+        return content, latency, tokens.get("prompt"), tokens.get("completion")
+
+    async def complete(self, client, stage: str, messages, bypass: bool = False, usage: Optional[dict] = None) -> str:
+        """Message content from the first tier of ``stage``."""
+        tier = self.tiers_for(stage)[0]
+        content, latency, prompt_tokens, completion_tokens = await self._complete(client, tier, messages, bypass, usage)
+        self._record(tier, latency, prompt_tokens, completion_tokens, usage)
+        return content
+
+    async def stream(
+        self, client, stage: str, messages, bypass: bool = False, usage: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """Stream the content of the first tier of ``stage``; tokens are estimated from text length."""
+        tier = self.tiers_for(stage)[0]
+        parts = []
+        requested = []
+        started_at = time.perf_counter()
+        async for delta in astream_chat_completion(
+            client, bypass=bypass, model=tier.model_name, messages=messages,
+            on_usage=requested.append, **tier.params()
+        ):
+            parts.append(delta)
+            yield delta
+        latency = time.perf_counter() - started_at
+        if requested:
+            prompt_tokens = _estimate_tokens("".join(m["content"] for m in messages))
+            self._record(tier, latency, prompt_tokens, _estimate_tokens("".join(parts)), usage)
+        else:
+            # 命中缓存：不计调用次数与费用
+            self._record(tier, latency, None, None, usage)
+
+    async def _structured_on_tier(self, client, tier, messages, bypass, usage, fused=False):
+        """Structured reply on one tier with targeted re-asks; returns (data, problems, latency, tokens).
+
+        The reply is checked against EXTRACTION_SCHEMA, or FUSED_SCHEMA when ``fused``.
+        """
+        if fused:
+            name, schema, validate, expected_format = "fused_soap", FUSED_SCHEMA, validate_fused, FUSED_JSON_FORMAT
+        else:
+            name, schema, validate, expected_format = (
+                "symptom_extraction", EXTRACTION_SCHEMA, validate_extraction, EXTRACTION_JSON_FORMAT
+            )
+        response_format = response_format_for(tier.structured_output, name, schema)
+        for attempt in range(self.reasks + 1):
+            content, latency, prompt_tokens, completion_tokens = await self._complete(
+                client, tier, messages, bypass, usage, **response_format
+            )
+            data, problems, repaired = parse_extraction(content, validate)
+            if not problems or attempt == self.reasks:
+                return data, problems, repaired, attempt > 0, (latency, prompt_tokens, completion_tokens)
+            # 只重问格式有误的这一步，带上原回复和具体问题
+            logger.info(f"Re-asking {tier.llm_id} for a valid {name} reply: {'; '.join(problems)}")
+            self._record(tier, latency, prompt_tokens, completion_tokens, usage, repaired=repaired, reask=attempt > 0)
+            messages = messages + [
+                {"role": "assistant", "content": content or ""},
+                {"role": "user", "content": build_reask_prompt(problems, expected_format)},
+            ]
+
+    async def extract(
+        self, client, transcript: str, messages, bypass: bool = False, usage: Optional[dict] = None
+    ) -> Dict[str, Any]:
+        """Symptom extraction with repair, re-ask and escalation.
+
+        Each tier's reply is parsed (tolerating fences, surrounding text and
+        similar slips) and validated; an unusable reply is re-asked up to
+        ``reasks`` times on the same tier. A reply that still fails the
+        schema or stays below ``min_confidence`` goes to the next tier. The
+        last tier's parsed reply is returned even if it does not match the
+        schema (with a warning); ValueError is raised if it cannot be parsed.
+        """
+        tiers = self.tiers_for("extraction")
+        for i, tier in enumerate(tiers):
+            last = i == len(tiers) - 1
+            data, problems, repaired, reasked, call = await self._structured_on_tier(
+                client, tier, messages, bypass, usage
+            )
+            if not problems and not last:
+                confidence = extraction_confidence(data, transcript)
+                if confidence < self.min_confidence:
+                    problems = [f"confidence {confidence:.2f} < {self.min_confidence:.2f}"]
+            self._record(tier, *call, usage, escalated=bool(problems) and not last, repaired=repaired, reask=reasked)
+            if last:
+                if data is None:
+                    raise ValueError(f"Extraction from {tier.llm_id} is not valid JSON: {'; '.join(problems)}")
+                if problems:
+                    logger.warning(f"Extraction from {tier.llm_id} does not match the schema: {'; '.join(problems)}")
+            elif problems:
+                logger.info(f"Escalating extraction from {tier.llm_id} to {tiers[i + 1].llm_id}: {'; '.join(problems)}")
+                continue
+            if usage is not None:
+                usage["extraction_llm"] = tier.llm_id
+            return data
+
+    async def fused(
+        self, client, messages, bypass: bool = False, usage: Optional[dict] = None
+    ) -> Dict[str, Any]:
+        """Extraction and SOAP note in one structured reply from the first tier of the fused stage.
+
+        The reply must match FUSED_SCHEMA, all four SOAP sections included; an
+        unusable reply is re-asked up to ``reasks`` times, then ValueError is
+        raised.
+        """
+        tier = self.tiers_for("fused")[0]
+        data, problems, repaired, reasked, call = await self._structured_on_tier(
+            client, tier, messages, bypass, usage, fused=True
+        )
+        self._record(tier, *call, usage, repaired=repaired, reask=reasked)
+        if problems:
+            raise ValueError(f"Fused reply from {tier.llm_id} does not match the schema: {'; '.join(problems)}")
+        return data
+
+    def report(self) -> Dict[str, dict]:
+        """Calls, cache hits, escalations, tokens and estimated cost (USD) per tier since start.
+
+        Mean and p95 latency cover the last ``LATENCY_WINDOW`` model calls.
+        """
+        with self._lock:
+            report = {}
+            for llm_id, stats in self._stats.items():
+                ordered = sorted(stats.latencies) or [0.0]
+                tier = self.tiers.get(llm_id, FALLBACK_TIER)
+                report[llm_id] = {
+                    "model": tier.model_name,
+                    "calls": stats.calls,
+                    "cache_hits": stats.cache_hits,
+                    "escalations": stats.escalations,
+                    "repairs": stats.repairs,
+                    "reasks": stats.reasks,
+                    "mean_latency": sum(ordered) / len(ordered),
+                    "p95_latency": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                    "total_latency": stats.total_latency,
+                    "prompt_tokens": stats.prompt_tokens,
+                    "completion_tokens": stats.completion_tokens,
+                    "cost_usd": stats.cost,
+                }
+            return report
+
+
+_default_router: Optional[ModelRouter] = None
+_default_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router configured from aurite_config.json and the environment."""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
@@ -0,0 +1,418 @@
+"""
+Retries, deadlines, rate limiting and request hedging for the API clients.
+
+ResilientAsyncClient / ResilientClient wrap an (Async)OpenAI-compatible
+client and keep its ``chat.completions.create`` interface, so callers such
+as llm_cache and SoapNoteWorkflow do not change. Each call gets a per-attempt
+timeout and an overall deadline; retryable failures (429, 5xx, timeouts,
+connection errors) are retried with exponential backoff and full jitter,
+honouring Retry-After. A shared TokenBucket paces requests and is re-tuned
+from the x-ratelimit-* response headers. With ``hedge_after`` set, a
+duplicate request is sent when the first one is slow and whichever finishes
+first wins. ResilientRecognizer applies the same retry/rate-limit policy to
+speech recognition calls.
+"""
+
+import asyncio
+import inspect
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from types import SimpleNamespace
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The overall deadline of a call ran out before it succeeded."""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset durations such as ``"1s"``, ``"6m0s"`` or ``"120ms"``."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    # openai: status_code；google.api_core: code
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _headers(exc: BaseException) -> Mapping[str, str]:
+    response = getattr(exc, "response", None)
+    return getattr(response, "headers", None) or {}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return not isinstance(exc, DeadlineExceeded)
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # openai.APIConnectionError / APITimeoutError 没有状态码
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    headers = _headers(exc)
+    if headers.get("retry-after-ms"):
+        return parse_duration(headers["retry-after-ms"] + "ms")
+    return parse_duration(headers.get("retry-after"))
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped at ``max_delay``."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 20.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+
+class TokenBucket:
+    """Request pacing shared by all callers of a client; safe across threads and event loops.
+
+    ``rate`` is requests per second (None: unpaced until the server's rate
+    limit headers or a 429 say otherwise).
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity or 0.0
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _reserve(self) -> float:
+        """Take a token; returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            wait_for = max(0.0, self._blocked_until - now)
+            if self.rate:
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                # 允许透支，排队的调用按顺序等待
+                self.tokens -= 1
+                if self.tokens < 0:
+                    wait_for = max(wait_for, -self.tokens / self.rate)
+            return wait_for
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now."""
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until > now:
+                return False
+            if self.rate:
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self.tokens < 1:
+                    return False
+                self.tokens -= 1
+            return True
+
+    async def acquire(self):
+        wait_for = self._reserve()
+        if wait_for > 0:
+            await asyncio.sleep(wait_for)
+
+    def acquire_blocking(self):
+        wait_for = self._reserve()
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+    def pause(self, seconds: float):
+        """Hold back all requests for ``seconds`` (after a 429)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Re-tune from ``x-ratelimit-{limit,remaining,reset}-requests`` headers."""
+        try:
+            limit = headers.get("x-ratelimit-limit-requests")
+            remaining = headers.get("x-ratelimit-remaining-requests")
+            if limit is None or remaining is None:
+                return
+            limit, remaining = float(limit), float(remaining)
+        except (TypeError, ValueError):
+            return
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        with self._lock:
+            now = time.monotonic()
+            if reset and limit > remaining:
+                # 服务端在 reset 秒内补满 (limit - remaining) 个额度
+                self.rate = (limit - remaining) / reset
+            self.capacity = limit
+            self.tokens = min(self.tokens, remaining) if self.rate else remaining
+            self._updated_at = now
+
+
+class _Stats:
+    """Call counters; updated from caller and hedge threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {key: value for key, value in vars(self).items() if not key.startswith("_")}
+
+
+def _is_stream(kwargs):
+    # 流式响应不能重复发送：不做对冲
+    return bool(kwargs.get("stream"))
+
+
+class ResilientAsyncClient:
+    """AsyncOpenAI-compatible wrapper adding deadlines, retries, pacing and hedging.
+
+    timeout: seconds allowed for one attempt.
+    deadline: seconds allowed for the whole call including retries.
+    hedge_after: send one duplicate request when an attempt has not finished
+        after this many seconds (None disables hedging; never used for streams).
+    """
+
+    def __init__(self, client, timeout: float = 60.0, deadline: float = 180.0,
+                 retry: Optional[RetryPolicy] = None, bucket: Optional[TokenBucket] = None,
+                 hedge_after: Optional[float] = None):
+        self._client = client
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry = retry or RetryPolicy()
+        self.bucket = bucket or TokenBucket()
+        self.hedge_after = hedge_after
+        self.stats = _Stats()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def _send(self, kwargs):
+        self.stats.incr("attempts")
+        completions = self._client.chat.completions
+        raw_api = getattr(completions, "with_raw_response", None)
+        if raw_api is None:
+            return await completions.create(**kwargs)
+        raw = await raw_api.create(**kwargs)
+        self.bucket.update_from_headers(raw.headers)
+        parsed = raw.parse()
+        return await parsed if inspect.isawaitable(parsed) else parsed
+
+    async def _attempt(self, kwargs):
+        await self.bucket.acquire()
+        if self.hedge_after is None or _is_stream(kwargs):
+            return await self._send(kwargs)
+        tasks = [asyncio.ensure_future(self._send(kwargs))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            # 只有限速器有空闲额度时才对冲，避免在限流时加重积压
+            if not done and self.bucket.try_acquire():
+                self.stats.incr("hedges")
+                tasks.append(asyncio.ensure_future(self._send(kwargs)))
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.stats.incr("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _create(self, **kwargs):
+        self.stats.incr("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.retry.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return await asyncio.wait_for(self._attempt(kwargs), timeout=min(self.timeout, remaining))
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.retry.max_attempts - 1:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if _status_code(e) == 429:
+                    self.stats.incr("rate_limited")
+                    self.bucket.pause(retry_after or self.retry.base_delay)
+                delay = self.retry.delay(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded(f"LLM call deadline of {self.deadline:.0f}s exceeded: {e}") from e
+                self.stats.incr("retries")
+                logger.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        raise DeadlineExceeded(f"LLM call deadline of {self.deadline:.0f}s exceeded")
+
+
+class ResilientClient:
+    """Synchronous counterpart of ResilientAsyncClient for the OpenAI client.
+
+    The per-attempt timeout is passed to the SDK call as ``timeout=``, so a
+    slow request fails by itself instead of being left running. Without
+    hedging an attempt runs in the calling thread; with hedging the original
+    and the duplicate each run in their own short-lived thread, bounded by
+    the same timeout.
+    """
+
+    def __init__(self, client, timeout: float = 60.0, deadline: float = 180.0,
+                 retry: Optional[RetryPolicy] = None, bucket: Optional[TokenBucket] = None,
+                 hedge_after: Optional[float] = None):
+        self._client = client
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry = retry or RetryPolicy()
+        self.bucket = bucket or TokenBucket()
+        self.hedge_after = hedge_after
+        self.stats = _Stats()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _send(self, kwargs, timeout):
+        self.stats.incr("attempts")
+        kwargs = dict(kwargs, timeout=timeout)
+        completions = self._client.chat.completions
+        raw_api = getattr(completions, "with_raw_response", None)
+        if raw_api is None:
+            return completions.create(**kwargs)
+        raw = raw_api.create(**kwargs)
+        self.bucket.update_from_headers(raw.headers)
+        return raw.parse()
+
+    def _spawn(self, kwargs, timeout) -> Future:
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._send(kwargs, timeout))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="llm-call", daemon=True).start()
+        return future
+
+    def _attempt(self, kwargs, timeout):
+        self.bucket.acquire_blocking()
+        if self.hedge_after is None or _is_stream(kwargs) or self.hedge_after >= timeout:
+            return self._send(kwargs, timeout)
+        end = time.monotonic() + timeout
+        futures = [self._spawn(kwargs, timeout)]
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done and self.bucket.try_acquire():
+            self.stats.incr("hedges")
+            futures.append(self._spawn(kwargs, max(0.0, end - time.monotonic())))
+        # 每个请求都带 SDK 超时，最迟在 timeout 后返回，这里无需另设等待上限
+        pending, error = set(futures), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self.stats.incr("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _create(self, **kwargs):
+        self.stats.incr("calls")
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.retry.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                return self._attempt(kwargs, min(self.timeout, remaining))
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.retry.max_attempts - 1:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if _status_code(e) == 429:
+                    self.stats.incr("rate_limited")
+                    self.bucket.pause(retry_after or self.retry.base_delay)
+                delay = self.retry.delay(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded(f"LLM call deadline of {self.deadline:.0f}s exceeded: {e}") from e
+                self.stats.incr("retries")
+                logger.warning(f"LLM call failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+        raise DeadlineExceeded(f"LLM call deadline of {self.deadline:.0f}s exceeded")
+
+
+class ResilientRecognizer:
+    """Recognizer wrapper retrying transient STT failures with backoff and pacing.
+
+    Per-request timeouts are set on the wrapped recognizer itself (see
+    GoogleSpeechRecognizer's ``timeout``).
+    """
+
+    def __init__(self, recognizer, retry: Optional[RetryPolicy] = None, bucket: Optional[TokenBucket] = None,
+                 deadline: float = 300.0):
+        self.recognizer = recognizer
+        self.retry = retry or RetryPolicy()
+        self.bucket = bucket or TokenBucket()
+        self.deadline = deadline
+        self.language_code = getattr(recognizer, "language_code", "en-US")
+
+    @property
+    def backend_name(self) -> str:
+        return getattr(self.recognizer, "backend_name", type(self.recognizer).__name__)
+
+    def recognize(self, pcm: bytes, sample_rate: int) -> str:
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.retry.max_attempts):
+            self.bucket.acquire_blocking()
+            try:
+                return self.recognizer.recognize(pcm, sample_rate)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.retry.max_attempts - 1:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if _status_code(e) == 429:
+                    self.bucket.pause(retry_after or self.retry.base_delay)
+                delay = self.retry.delay(attempt, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded(f"STT deadline of {self.deadline:.0f}s exceeded: {e}") from e
+                logger.warning(f"STT request failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+        raise DeadlineExceeded(f"STT deadline of {self.deadline:.0f}s exceeded")
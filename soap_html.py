@@ -0,0 +1,132 @@
+"""
+HTML building blocks for rendering SOAP notes.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from html import escape
+
+# 页面头部（样式 + 标题），各 SOAP 段落片段追加在其后
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>SOAP Note</title>
+    <style>
+        body {
+            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            line-height: 1.6;
+            background-color: #f8f9fa;
+        }
+        .container {
+            background-color: white;
+            padding: 30px;
+            border-radius: 10px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }
+        h1 {
+            color: #2c3e50;
+            text-align: center;
+            border-bottom: 3px solid #3498db;
+            padding-bottom: 10px;
+            margin-bottom: 30px;
+        }
+        .section {
+            margin-bottom: 25px;
+            padding: 15px;
+            border-left: 4px solid #3498db;
+            background-color: #f8f9fa;
+            border-radius: 5px;
+        }
+        .section-header {
+            font-size: 1.3em;
+            font-weight: bold;
+            color: #2c3e50;
+            margin-bottom: 10px;
+            display: flex;
+            align-items: center;
+        }
+        .section-content {
+            color: #34495e;
+            padding-left: 10px;
+        }
+        .subjective { border-left-color: #e74c3c; }
+        .objective { border-left-color: #f39c12; }
+        .assessment { border-left-color: #27ae60; }
+        .plan { border-left-color: #9b59b6; }
+        .section-icon {
+            width: 20px;
+            height: 20px;
+            margin-right: 10px;
+            border-radius: 50%;
+        }
+        .subjective .section-icon { background-color: #e74c3c; }
+        .objective .section-icon { background-color: #f39c12; }
+        .assessment .section-icon { background-color: #27ae60; }
+        .plan .section-icon { background-color: #9b59b6; }
+        .timestamp {
+            text-align: center;
+            color: #7f8c8d;
+            font-size: 0.9em;
+            margin-top: 20px;
+            padding-top: 20px;
+            border-top: 1px solid #ecf0f1;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>📋 SOAP Note</h1>
+"""
+
+SECTION_TITLES = {
+    "subjective": "Subjective",
+    "objective": "Objective",
+    "assessment": "Assessment",
+    "plan": "Plan",
+}
+
+
+@lru_cache(maxsize=None)
+def _section_template(section, title):
+    """Markup before and after the content of one section, built once per (section, title)."""
+    before = "\n".join([
+        f'        <div class="section {section}">',
+        '            <div class="section-header">',
+        '                <div class="section-icon"></div>',
+        f'                {title}',
+        '            </div>',
+        '            <div class="section-content">',
+    ])
+    return before, "</div>\n        </div>"
+
+
+def render_section(section, content_lines, title=None):
+    """Render one SOAP section as an HTML fragment."""
+    before, after = _section_template(section, title or SECTION_TITLES[section])
+    # 各行已去除首尾空白，整段转义一次后再换成 <br>
+    return before + escape("\n".join(content_lines), quote=False).replace("\n", "<br>") + after
+
+
+def render_soap_html(sections, titles=None, timestamp=None):
+    """Render parsed sections (soap_sections.SoapSection) as a complete HTML page."""
+    titles = titles or SECTION_TITLES
+    parts = [HTML_HEAD]
+    parts.extend(render_section(s.key, s.lines, titles[s.key]) for s in sections)
+    parts.append(render_footer(timestamp))
+    return "\n".join(parts)
+
+
+def render_footer(timestamp=None):
+    """Render the timestamp block and closing tags."""
+    timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return f"""        <div class="timestamp">
+            Generated on {timestamp}
+        </div>
+    </div>
+</body>
+</html>"""
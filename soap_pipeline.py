@@ -0,0 +1,263 @@
+"""
+Staged pipeline for generating SOAP notes from many recordings.
+
+SoapNoteWorkflow runs decode -> STT -> extraction -> note generation strictly
+in sequence for one file. SoapPipeline runs the same four stages as separate
+worker pools connected by bounded asyncio queues, so while recording N is in
+the LLM stages, recording N+1 is being transcribed and N+2 decoded. The
+bounded queues provide back-pressure: at most ``queue_size`` decoded
+recordings wait for STT, which caps the PCM held in memory.
+
+With an AudioPreprocessor the decode stage runs decode, resampling,
+loudness normalization and VAD in worker processes and passes memory-mapped
+.npy files on to STT instead of PCM byte strings.
+
+Usage:
+    results = await SoapPipeline(SoapNoteWorkflow()).run(["a.mp3", "b.mp3"])
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from artifact_store import RunArtifacts
+from audio_profile import get_audio_profile
+from clients import get_async_openai_client
+from speech_to_text import _transcript_cache_key, stream_pcm, transcribe_pcm_segments
+from stage_limits import LimitedRecognizer, get_stage_limiter
+from transcript_cache import get_transcript_cache
+from transcription_engine import DEFAULT_MAX_WORKERS, stitch_transcripts, transcribe_long_audio_segments
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STAGES = ("decode", "stt", "extract", "generate")
+DEFAULT_STAGE_WORKERS = {"decode": 1, "stt": 2, "extract": 2, "generate": 2}
+DEFAULT_QUEUE_SIZE = 2
+
+
+def _write_file(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+@dataclass
+class PipelineJob:
+    index: int
+    audio_file: str
+    run: RunArtifacts
+    timings: Dict[str, float] = field(default_factory=dict)
+    llm_usage: Dict[str, Any] = field(default_factory=dict)
+    pcm: Optional[bytes] = None
+    audio: Optional[Any] = None  # PreprocessedAudio when a preprocessor is used
+    sample_rate: int = 16000
+    cache_key: Optional[str] = None
+    transcript: Optional[str] = None
+    extraction: Optional[Dict[str, Any]] = None
+    soap_note: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_result(self) -> Dict[str, Any]:
+        result = {"run_id": self.run.run_id, "run_dir": str(self.run.path), "stage_timings": self.timings,
+                  "llm_usage": self.llm_usage}
+        if self.error:
+            result.update(status="failed", error=self.error)
+        else:
+            result.update(
+                status="completed",
+                soap_note_file=self.run.file("soap_note.txt"),
+                soap_note_html_file=self.run.file("soap_note.html"),
+                soap_note=self.soap_note,
+            )
+        return result
+
+
+class SoapPipeline:
+    """Runs many recordings through decode / stt / extract / generate worker pools.
+
+    workflow: SoapNoteWorkflow whose recognizer, LLM client, prompts, HTML
+        renderer and artifact store are reused.
+    options: the same optional keys as the workflow's ``initial_input``
+        (``audio_profile``, ``vad``, ``use_transcript_cache``,
+        ``bypass_llm_cache``, ``fused``).
+    preprocessor: optional AudioPreprocessor; its sample rate and VAD
+        setting replace ``audio_profile`` and ``vad``.
+    """
+
+    def __init__(self, workflow, stage_workers: Optional[Dict[str, int]] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, options: Optional[Dict[str, Any]] = None,
+                 max_workers: int = DEFAULT_MAX_WORKERS, preprocessor=None):
+        self.workflow = workflow
+        self.preprocessor = preprocessor
+        self.stage_workers = {**DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+        self.queue_size = queue_size
+        self.options = dict(options or {})
+        self.max_workers = max_workers
+        self.limiter = get_stage_limiter()
+        self.profile = get_audio_profile(self.options.get("audio_profile"))
+        self.cache = get_transcript_cache() if self.options.get("use_transcript_cache", True) else None
+        self.llm_client = workflow.llm_client or get_async_openai_client()
+        self.bypass_cache = self.options.get("bypass_llm_cache", False)
+
+    async def run(self, audio_files: List[str]) -> List[Dict[str, Any]]:
+        """Process ``audio_files``; results are returned in input order.
+
+        A failure of the feeder or of a stage task (e.g. ``create_run``
+        raising) is raised here; the remaining tasks are cancelled.
+        """
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in PIPELINE_STAGES]
+        done: asyncio.Queue = asyncio.Queue()
+        outboxes = queues[1:] + [done]
+        handlers = [self._decode, self._transcribe, self._extract, self._generate]
+        runs: List[RunArtifacts] = []
+        results: Dict[int, Dict[str, Any]] = {}
+
+        tasks = [
+            asyncio.create_task(self._run_stage(name, handler, inbox, outbox, next_name))
+            for name, handler, inbox, outbox, next_name in zip(
+                PIPELINE_STAGES, handlers, queues, outboxes, PIPELINE_STAGES[1:] + (None,)
+            )
+        ]
+        tasks.append(asyncio.create_task(self._feed(audio_files, queues[0], runs)))
+        tasks.append(asyncio.create_task(self._collect(done, results)))
+        try:
+            pending = set(tasks)
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in finished:
+                    if task.exception() is not None:
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # 失败时仍在进行中的运行也要去掉 .in_progress 标记
+            await asyncio.to_thread(lambda: [self.workflow.artifact_store.finish_run(run) for run in runs])
+        await asyncio.to_thread(self.workflow.artifact_store.prune, [run.run_id for run in runs])
+        return [results[i] for i in sorted(results)]
+
+    async def _feed(self, audio_files, inbox, runs):
+        cancelled = False
+        try:
+            for index, audio_file in enumerate(audio_files):
+                run = await asyncio.to_thread(self.workflow.artifact_store.create_run)
+                runs.append(run)
+                # 队列已满时在此等待（背压）
+                await inbox.put(PipelineJob(index, audio_file, run))
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # 出错时也通知 decode worker 退出，下游不会永远等待
+            if not cancelled:
+                for _ in range(self.stage_workers["decode"]):
+                    await inbox.put(None)
+
+    async def _collect(self, done, results):
+        while True:
+            job = await done.get()
+            if job is None:
+                return
+            await asyncio.to_thread(self.workflow.artifact_store.finish_run, job.run)
+            results[job.index] = job.to_result()
+
+    async def _run_stage(self, name, handler, inbox, outbox, next_name):
+        async def worker():
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                if job.error is None:
+                    started_at = time.perf_counter()
+                    try:
+                        await handler(job)
+                    except Exception as e:
+                        logger.error(f"{name} stage failed for {job.audio_file}: {e}")
+                        job.error = f"{name} stage failed: {e}"
+                        job.pcm = None
+                        if job.audio is not None:
+                            await asyncio.to_thread(job.audio.remove)
+                            job.audio = None
+                    job.timings[name] = job.timings.get(name, 0.0) + time.perf_counter() - started_at
+                await outbox.put(job)
+
+        await asyncio.gather(*(worker() for _ in range(self.stage_workers[name])))
+        # 本阶段全部结束后，通知下一阶段的每个 worker 退出
+        for _ in range(self.stage_workers[next_name] if next_name else 1):
+            await outbox.put(None)
+
+    async def _decode(self, job: PipelineJob):
+        if self.cache:
+            recognizer = self.workflow.recognizer or self.workflow._default_recognizer
+            if self.preprocessor:
+                config = dict(sample_rate=self.preprocessor.sample_rate, vad=self.preprocessor.vad,
+                              normalize=self.preprocessor.normalize)
+            else:
+                config = dict(sample_rate=self.profile.sample_rate, vad=self.options.get("vad", True))
+            # 缓存键需要对音频文件做哈希，放到线程中执行
+            job.cache_key = await asyncio.to_thread(
+                _transcript_cache_key, self.cache, job.audio_file, recognizer, **config
+            )
+            job.transcript = await asyncio.to_thread(self.cache.get, job.cache_key)
+            if job.transcript is not None:
+                return
+        async with self.limiter.stage("decode"):
+            if self.preprocessor:
+                job.audio = await self.preprocessor.apreprocess(job.audio_file)
+                job.sample_rate = job.audio.sample_rate
+            else:
+                job.sample_rate = self.profile.sample_rate
+                job.pcm = await asyncio.to_thread(lambda: b"".join(stream_pcm(job.audio_file, job.sample_rate)))
+
+    async def _transcribe(self, job: PipelineJob):
+        if job.transcript is None:
+            recognizer = LimitedRecognizer(
+                self.workflow.recognizer or self.workflow._default_recognizer, self.limiter
+            )
+            if job.audio is not None:
+                # VAD 已在预处理进程中完成，这里只需还原时间戳映射
+                audio, job.audio = job.audio, None
+                try:
+                    segments = await asyncio.to_thread(
+                        transcribe_long_audio_segments, audio.iter_pcm(), job.sample_rate, recognizer,
+                        self.max_workers, timestamp_map=audio.timestamp_map(),
+                    )
+                finally:
+                    await asyncio.to_thread(audio.remove)
+            else:
+                pcm, job.pcm = job.pcm, None
+                segments = await asyncio.to_thread(
+                    transcribe_pcm_segments, [pcm], job.sample_rate, recognizer,
+                    self.max_workers, self.options.get("vad", True),
+                )
+            job.transcript = stitch_transcripts(segments)
+            if self.cache:
+                await asyncio.to_thread(self.cache.put, job.cache_key, job.transcript)
+        await asyncio.to_thread(_write_file, job.run.file("transcribed_text.txt"), job.transcript)
+
+    async def _extract(self, job: PipelineJob):
+        async with self.limiter.stage("llm"):
+            if self.options.get("fused", False):
+                job.extraction, job.soap_note = await self.workflow._extract_and_generate(
+                    self.llm_client, job.transcript, self.bypass_cache, job.llm_usage
+                )
+            else:
+                job.extraction = await self.workflow._extract_symptoms(
+                    self.llm_client, job.transcript, self.bypass_cache, job.llm_usage
+                )
+        await asyncio.to_thread(
+            _write_file, job.run.file("interpret_text.json"),
+            json.dumps(job.extraction, ensure_ascii=False, indent=2),
+        )
+
+    async def _generate(self, job: PipelineJob):
+        if job.soap_note is None:
+            async with self.limiter.stage("llm"):
+                job.soap_note = await self.workflow._generate_soap_note(
+                    self.llm_client, job.extraction, self.bypass_cache, job.llm_usage
+                )
+        html = self.workflow._create_html_soap_note(job.soap_note)
+        await asyncio.to_thread(_write_file, job.run.file("soap_note.txt"), job.soap_note)
+        await asyncio.to_thread(_write_file, job.run.file("soap_note.html"), html)
@@ -0,0 +1,115 @@
+"""
+Prompt builders for the symptom-extraction and SOAP-generation LLM stages.
+"""
+
+import json
+
+EXTRACTION_SYSTEM_PROMPT = "You are a medical assistant that extracts and standardizes symptoms from patient transcripts."
+SOAP_SYSTEM_PROMPT = "You are a medical assistant that writes SOAP notes based on structured medical data."
+FUSED_SYSTEM_PROMPT = (
+    "You are a medical assistant that extracts and standardizes symptoms from patient transcripts "
+    "and writes SOAP notes from them."
+)
+
+# SOAP 四段的键名与在文本中的标题
+SOAP_SECTIONS = [
+    ("subjective", "S (Subjective)"),
+    ("objective", "O (Objective)"),
+    ("assessment", "A (Assessment)"),
+    ("plan", "P (Plan)"),
+]
+
+
+def build_extraction_prompt(transcript):
+    return f"""
+Extract the following from the transcript:
+1. Original symptom descriptions.
+2. Standardized medical terms.
+3. Possible conditions (based on symptoms).
+4. Your confidence, from 0 to 1, that the extraction is complete and supported by the transcript.
+Return output in JSON.
+Transcript:
+"{transcript}"
+"""
+
+
+EXTRACTION_JSON_FORMAT = """
+Expected format:
+{
+  "symptom_raw": [...],
+  "symptom_standardized": [...],
+  "possible_conditions": [...],
+  "confidence": 0.0
+}
+"""
+
+
+FUSED_JSON_FORMAT = """
+Expected format:
+{
+  "symptom_raw": [...],
+  "symptom_standardized": [...],
+  "possible_conditions": [...],
+  "confidence": 0.0,
+  "soap_note": {
+    "subjective": "...",
+    "objective": "...",
+    "assessment": "...",
+    "plan": "..."
+  }
+}
+"""
+
+
+def build_reask_prompt(problems, expected_format=EXTRACTION_JSON_FORMAT):
+    """Follow-up asking the model to correct a JSON reply that could not be used."""
+    listed = "\n".join(f"- {problem}" for problem in problems)
+    return f"""
+Your previous reply could not be used:
+{listed}
+
+Reply again with ONLY the corrected JSON object: no markdown fences, no text before or after it.
+Every list must contain only strings; confidence is a number from 0 to 1.
+{expected_format}"""
+
+
+def build_soap_prompt(structured_data):
+    return f"""
+请根据以下结构化医学信息，生成一份标准的 SOAP note（英文）：\n\n结构化信息：\n{json.dumps(structured_data, ensure_ascii=False, indent=2)}\n\nSOAP note 要求：\nS（Subjective）：主观信息，直接引用原始主诉和症状描述。\nO（Objective）：客观信息，标准化医学术语和体征。\nA（Assessment）：根据症状和体征，给出可能的诊断或评估。\nP（Plan）：给出合理的下一步计划或建议。\n\n请严格按照 SOAP 四段输出，内容简明、专业。\n"""
+
+
+def build_fused_prompt(transcript):
+    """Single prompt asking for the structured extraction and the SOAP note at once."""
+    return f"""
+From the transcript below, do both of the following in ONE JSON object:
+1. Extract the original symptom descriptions, the standardized medical terms,
+   the possible conditions (based on symptoms) and your confidence, from 0 to 1,
+   that the extraction is complete and supported by the transcript.
+2. Write a standard SOAP note in English from that extracted information:
+   - subjective: the chief complaint and symptom descriptions as reported.
+   - objective: standardized medical terms and signs.
+   - assessment: possible diagnoses or evaluation based on the symptoms and signs.
+   - plan: reasonable next steps or recommendations.
+   Keep each section concise and professional; none of them may be empty.
+
+Return ONLY the JSON object, with no other text.
+Transcript:
+"{transcript}"
+{FUSED_JSON_FORMAT}"""
+
+
+def split_fused_result(fused):
+    """Split a fused response into the extraction dict and the SOAP note text.
+
+    Raises ValueError when a SOAP section is missing or empty, rather than
+    writing a note with a blank section.
+    """
+    soap_sections = fused.get("soap_note")
+    if not isinstance(soap_sections, dict):
+        raise ValueError("fused reply has no soap_note object")
+    missing = [key for key, _ in SOAP_SECTIONS if not str(soap_sections.get(key) or "").strip()]
+    if missing:
+        raise ValueError(f"fused reply is missing SOAP sections: {', '.join(missing)}")
+    extraction = {key: value for key, value in fused.items() if key != "soap_note"}
+    soap_note = "\n\n".join(f"{title}: {str(soap_sections[key]).strip()}" for key, title in SOAP_SECTIONS)
+    return extraction, soap_note
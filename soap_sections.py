@@ -0,0 +1,127 @@
+"""
+Parser for the S/O/A/P sections of a generated SOAP note.
+
+Section headers are recognized in one pass with a single precompiled
+regular expression, and a lookup table maps the matched token to its
+section, so each line is matched once. Accepted header forms include
+
+    S: ...            Subjective: ...          S (Subjective): ...
+    ## Subjective     ### S (Subjective)       1. Subjective: ...
+    **Subjective:** ...   **S (Subjective)**   S（Subjective）：...
+
+case-insensitively. Lines that only title the note ("SOAP Note", "# SOAP
+note") are skipped; lines before the first header are ignored.
+
+SoapSectionParser works line by line, so the streaming renderer can use it
+on partial output; parse_soap_note() parses a complete note.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+# 标题词 -> 段落键
+SECTION_TOKENS = {
+    "s": "subjective",
+    "subjective": "subjective",
+    "o": "objective",
+    "objective": "objective",
+    "a": "assessment",
+    "assessment": "assessment",
+    "p": "plan",
+    "plan": "plan",
+}
+
+_EMPHASIS = r"(?:\*\*|__|\*|_)?"
+_HEADER = re.compile(
+    r"""
+    ^\s*
+    (?:\#{1,6}\s*)?                         # markdown 标题
+    (?:\d{1,2}\s*[.)]\s*)?                  # 编号 1. / 1)
+    """ + _EMPHASIS + r"""\s*
+    (?:
+        (?P<title>soap\s+note)\b
+      | [SOAP]\s*[(（]\s*(?P<paren>subjective|objective|assessment|plan)\s*[)）]
+      | (?P<word>subjective|objective|assessment|plan)
+        (?=\s*(?:[(（:：\-–—*_]|$))         # 整词标题后须为冒号、括号或行尾
+        (?:\s*[(（][^)）]*[)）])?            # 附注，如 Subjective (主观信息)
+      | (?P<letter>[SOAP])
+        (?=\s*""" + _EMPHASIS + r"""\s*[:：])   # 单字母标题必须带冒号
+    )
+    \s*""" + _EMPHASIS + r"""\s*[:：\-–—]?\s*""" + _EMPHASIS + r"""\s*
+    (?P<rest>.*)$
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+@dataclass
+class SoapSection:
+    """One section of a note: its key ("subjective", ...) and its content lines."""
+
+    key: str
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+# 标题行可能的首字符；其余行（绝大多数正文）无需执行正则
+_HEADER_FIRST_CHARS = frozenset("#*_0123456789SOAPsoap")
+
+
+def match_header(line: str):
+    """``(section key, rest of the line)`` if ``line`` is a section header,
+    ``("", "")`` if it only titles the note, else None. ``line`` is stripped."""
+    if not line or line[0] not in _HEADER_FIRST_CHARS:
+        return None
+    match = _HEADER.match(line)
+    if match is None:
+        return None
+    if match.group("title"):
+        return "", ""
+    token = match.group("paren") or match.group("word") or match.group("letter")
+    return SECTION_TOKENS[token.lower()], match.group("rest").strip()
+
+
+class SoapSectionParser:
+    """Incremental parser: feed lines, get each section once the next header closes it."""
+
+    def __init__(self):
+        self._section: Optional[SoapSection] = None
+
+    def feed_line(self, line: str) -> Optional[SoapSection]:
+        """Consume one line; returns the section it closed, if any."""
+        line = line.strip()
+        if not line:
+            return None
+        header = match_header(line)
+        if header is None:
+            if self._section is not None:
+                self._section.lines.append(line)
+            return None
+        key, rest = header
+        if not key:
+            return None
+        completed, self._section = self._section, SoapSection(key, [rest] if rest else [])
+        return completed
+
+    def finish(self) -> Optional[SoapSection]:
+        """Return the last open section."""
+        completed, self._section = self._section, None
+        return completed
+
+
+def parse_soap_note(text: str) -> List[SoapSection]:
+    """Sections of a complete note, in the order they appear."""
+    return parse_lines(text.splitlines())
+
+
+def parse_lines(lines: Iterable[str]) -> List[SoapSection]:
+    parser = SoapSectionParser()
+    sections = [section for section in map(parser.feed_line, lines) if section is not None]
+    last = parser.finish()
+    if last is not None:
+        sections.append(last)
+    return sections
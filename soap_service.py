@@ -0,0 +1,367 @@
+"""
+Long-running SOAP note service with a local HTTP job API.
+
+Aurite (and the MCP servers it starts), the pooled OpenAI client and the
+Speech-to-Text client are created once at startup and stay warm, so a job
+only pays for its own audio and LLM work. Jobs are queued in a bounded async
+queue and run by a fixed number of workers; per-stage limits (decode, STT,
+LLM) come from the shared StageLimiter.
+
+API (JSON unless noted):
+    POST /jobs                          {"audio_file": "...", "options": {...}} -> 202 {"job_id"}
+    GET  /jobs                          all known jobs
+    GET  /jobs/<job_id>                 status and result
+    GET  /jobs/<job_id>/artifacts       artifact file names
+    GET  /jobs/<job_id>/artifacts/<n>   artifact content (text/html/json)
+    GET  /metrics                       queue depth, job counts, per-stage latency, per-model cost
+    GET  /healthz
+
+Usage:
+    python soap_service.py --port 8765 --workers 4 --llm-limit 4
+    python soap_service.py --fake          # local fake STT/LLM backends, no Aurite
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from batch_soap import register_workflow, run_workflow
+from model_router import get_model_router
+from stage_limits import get_stage_limiter
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_FINISHED_JOBS = 1000
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    audio_file: str
+    options: Dict[str, Any]
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def run_dir(self) -> Optional[str]:
+        return (self.result or {}).get("run_dir")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "audio_file": self.audio_file,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if self.result:
+            data["result"] = {
+                key: self.result.get(key)
+                for key in ("run_id", "run_dir", "soap_note", "stage_timings", "time_to_first_section")
+                if key in self.result
+            }
+        return data
+
+
+class AuriteRunner:
+    """Runs jobs through a single, warm Aurite instance."""
+
+    def __init__(self):
+        self.aurite = None
+
+    async def start(self):
+        from aurite import Aurite
+
+        from clients import warm_up_clients
+
+        self.aurite = Aurite()
+        await self.aurite.initialize()
+        await register_workflow(self.aurite)
+        try:
+            await asyncio.to_thread(warm_up_clients)
+        except Exception as e:
+            logger.warning(f"Could not pre-create API clients, they will be created on first use: {e}")
+
+    async def run(self, initial_input):
+        result = await run_workflow(self.aurite, initial_input)
+        return vars(result) if not isinstance(result, dict) else result
+
+    async def stop(self):
+        if self.aurite is not None:
+            await self.aurite.shutdown()
+
+
+class DirectRunner:
+    """Runs jobs on an in-process SoapNoteWorkflow instance, bypassing Aurite."""
+
+    def __init__(self, workflow):
+        self.workflow = workflow
+
+    async def start(self):
+        pass
+
+    async def run(self, initial_input):
+        return await self.workflow.execute_workflow(initial_input, executor=None)
+
+    async def stop(self):
+        pass
+
+
+class SoapService:
+    """Bounded job queue with a fixed pool of workers."""
+
+    def __init__(self, runner, workers: int = 4, queue_size: int = 100):
+        self.runner = runner
+        self.workers = workers
+        self.queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=queue_size)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.started_at = time.time()
+        self.port: Optional[int] = None
+        self._worker_tasks = []
+        self._latencies = []
+
+    async def start(self):
+        await self.runner.start()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        await self.runner.stop()
+
+    def submit(self, audio_file: str, options: Optional[Dict[str, Any]] = None) -> Job:
+        if not os.path.isfile(audio_file):
+            raise FileNotFoundError(f"Audio file not found: {audio_file}")
+        job = Job(uuid.uuid4().hex, os.path.abspath(audio_file), dict(options or {}))
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.queue.maxsize} jobs)")
+        self.jobs[job.job_id] = job
+        self._trim_jobs()
+        return job
+
+    def _trim_jobs(self):
+        # 只保留最近的已完成任务，排队/运行中的任务不会被移除
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run_job(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run_job(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = await self.runner.run({**job.options, "mp3_file": job.audio_file, "run_id": job.job_id})
+            job.result = result
+            job.status = result.get("status", "failed")
+            job.error = result.get("error")
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        job.finished_at = time.time()
+        self._latencies.append(job.finished_at - job.submitted_at)
+        self._latencies = self._latencies[-MAX_FINISHED_JOBS:]
+
+    def artifacts(self, job: Job):
+        if not job.run_dir or not os.path.isdir(job.run_dir):
+            return []
+        return sorted(name for name in os.listdir(job.run_dir) if os.path.isfile(os.path.join(job.run_dir, name)))
+
+    def metrics(self) -> Dict[str, Any]:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        latencies = sorted(self._latencies)
+        limiter = get_stage_limiter()
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "workers": self.workers,
+            "jobs": counts,
+            "job_latency": {
+                "count": len(latencies),
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None,
+            },
+            "stages_active": limiter.active(),
+            "stages": limiter.stats(),
+            "llm_tiers": get_model_router().report(),
+        }
+
+
+def make_handler(service: SoapService, loop: asyncio.AbstractEventLoop):
+    """HTTP handler bound to ``service``; all service state is touched on the event loop."""
+
+    def call(fn, *args):
+        async def invoke():
+            return fn(*args)
+
+        return asyncio.run_coroutine_threadsafe(invoke(), loop).result()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            logger.debug(fmt % args)
+
+        def _send_json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self._send(status, body, "application/json; charset=utf-8")
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id):
+            job = call(service.jobs.get, job_id)
+            if job is None:
+                self._send_json(404, {"error": f"Unknown job: {job_id}"})
+            return job
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+            if parts == ["healthz"]:
+                return self._send_json(200, {"status": "ok"})
+            if parts == ["metrics"]:
+                return self._send_json(200, call(service.metrics))
+            if parts == ["jobs"]:
+                return self._send_json(200, call(lambda: [job.to_dict() for job in service.jobs.values()]))
+            if len(parts) >= 2 and parts[0] == "jobs":
+                job = self._job(parts[1])
+                if job is None:
+                    return
+                if len(parts) == 2:
+                    return self._send_json(200, call(job.to_dict))
+                if len(parts) == 3 and parts[2] == "artifacts":
+                    return self._send_json(200, {"job_id": job.job_id, "artifacts": service.artifacts(job)})
+                if len(parts) == 4 and parts[2] == "artifacts":
+                    # 只允许下载运行目录中列出的文件，防止路径穿越
+                    if parts[3] not in service.artifacts(job):
+                        return self._send_json(404, {"error": f"Unknown artifact: {parts[3]}"})
+                    with open(os.path.join(job.run_dir, parts[3]), "rb") as f:
+                        body = f.read()
+                    content_type = mimetypes.guess_type(parts[3])[0] or "text/plain"
+                    return self._send(200, body, f"{content_type}; charset=utf-8")
+            self._send_json(404, {"error": "Not found"})
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+                return self._send_json(404, {"error": "Not found"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                audio_file = payload["audio_file"]
+            except (ValueError, KeyError, TypeError):
+                return self._send_json(400, {"error": 'Expected a JSON body with "audio_file"'})
+            try:
+                job = call(service.submit, audio_file, payload.get("options"))
+            except FileNotFoundError as e:
+                return self._send_json(400, {"error": str(e)})
+            except QueueFullError as e:
+                return self._send_json(503, {"error": str(e)})
+            self._send_json(202, {"job_id": job.job_id, "status": job.status})
+
+    return Handler
+
+
+async def serve(service: SoapService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                ready: Optional[threading.Event] = None, stop: Optional[asyncio.Event] = None):
+    """Start the service and its HTTP server; runs until ``stop`` is set."""
+    loop = asyncio.get_running_loop()
+    stop = stop or asyncio.Event()
+    await service.start()
+    server = ThreadingHTTPServer((host, port), make_handler(service, loop))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    service.port = server.server_port
+    logger.info(f"SOAP service listening on http://{host}:{service.port}")
+    if ready is not None:
+        ready.set()
+    try:
+        await stop.wait()
+    finally:
+        await asyncio.to_thread(server.shutdown)
+        server.server_close()
+        await service.stop()
+        logger.info("SOAP service stopped.")
+
+
+def build_runner(fake: bool = False, stt_latency: float = 1.0, llm_overhead: float = 0.8):
+    if not fake:
+        return AuriteRunner()
+    from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow
+    from fake_backends import FakeChatClient, FakeRecognizer
+
+    return DirectRunner(SoapNoteWorkflow(
+        recognizer=FakeRecognizer(stt_latency), llm_client=FakeChatClient(overhead=llm_overhead)
+    ))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run the SOAP note service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=4, help="jobs run concurrently")
+    parser.add_argument("--queue-size", type=int, default=100, help="max queued jobs before 503")
+    parser.add_argument("--decode-limit", type=int, default=None)
+    parser.add_argument("--stt-limit", type=int, default=None)
+    parser.add_argument("--llm-limit", type=int, default=None)
+    parser.add_argument("--fake", action="store_true", help="use local fake STT/LLM backends instead of Aurite")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    get_stage_limiter().configure(decode=args.decode_limit, stt=args.stt_limit, llm=args.llm_limit)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    service = SoapService(build_runner(args.fake), workers=max(1, args.workers), queue_size=args.queue_size)
+    await serve(service, args.host, args.port, stop=stop)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""
+Incremental rendering of a SOAP note while it is being generated.
+
+SoapSectionStreamer consumes completion text deltas and reports each S/O/A/P
+section (see soap_sections.py) as soon as the next section header (or the
+end of the stream) closes it. StreamingSoapRenderer appends the matching
+HTML fragment to the output file as each section completes and can forward
+server-sent events to a callback, recording the time to the first rendered
+section.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterable, Callable, Iterable, List, Optional, Tuple
+
+from soap_html import HTML_HEAD, render_footer, render_section
+from soap_sections import SoapSection, SoapSectionParser
+
+
+class SoapSectionStreamer:
+    """Detects SOAP section boundaries in a stream of text deltas."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._parser = SoapSectionParser()
+
+    def feed(self, delta: str) -> List[SoapSection]:
+        """Add a text delta; return the sections completed by it."""
+        self._buffer += delta
+        if "\n" not in self._buffer:
+            return []
+        *lines, self._buffer = self._buffer.split("\n")
+        return [section for section in map(self._parser.feed_line, lines) if section is not None]
+
+    def finish(self) -> List[SoapSection]:
+        """Flush the trailing line and return the last open section."""
+        completed = [self._parser.feed_line(self._buffer), self._parser.finish()]
+        self._buffer = ""
+        return [section for section in completed if section is not None]
+
+
+def format_sse(event: str, data) -> str:
+    """Format one server-sent event."""
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    lines = "\n".join(f"data: {line}" for line in payload.split("\n"))
+    return f"event: {event}\n{lines}\n\n"
+
+
+class StreamingSoapRenderer:
+    """Writes soap_note.html progressively as sections of the note arrive."""
+
+    def __init__(self, html_path: str, on_event: Optional[Callable[[str], None]] = None):
+        self.html_path = html_path
+        self.on_event = on_event
+        self.streamer = SoapSectionStreamer()
+        self.started_at = time.perf_counter()
+        self.first_section_at: Optional[float] = None
+        self.sections_rendered = 0
+        self._parts: List[str] = []
+        self._file = open(html_path, "w", encoding="utf-8")
+        self._file.write(HTML_HEAD + "\n")
+        self._file.flush()
+
+    @property
+    def time_to_first_section(self) -> Optional[float]:
+        if self.first_section_at is None:
+            return None
+        return self.first_section_at - self.started_at
+
+    def _write(self, text: str):
+        self._file.write(text)
+        self._file.flush()
+
+    def _record(self, fragments: List[Tuple[str, str]]):
+        """Update timing and forward events for fragments that were written."""
+        for section, fragment in fragments:
+            if self.first_section_at is None:
+                self.first_section_at = time.perf_counter()
+            self.sections_rendered += 1
+            if self.on_event:
+                self.on_event(format_sse("section", {"section": section, "html": fragment}))
+
+    @staticmethod
+    def _fragments(sections: List[SoapSection]) -> List[Tuple[str, str]]:
+        return [(section.key, render_section(section.key, section.lines)) for section in sections]
+
+    def _emit(self, sections: List[SoapSection]):
+        fragments = self._fragments(sections)
+        if fragments:
+            self._write("".join(fragment + "\n" for _, fragment in fragments))
+            self._record(fragments)
+
+    def _close(self) -> str:
+        if self.on_event:
+            self.on_event(format_sse("done", {"time_to_first_section": self.time_to_first_section}))
+        return "".join(self._parts)
+
+    def feed(self, delta: str):
+        self._parts.append(delta)
+        self._emit(self.streamer.feed(delta))
+
+    def finish(self) -> str:
+        """Close the document and return the full note text."""
+        self._emit(self.streamer.finish())
+        self._write(render_footer())
+        self._file.close()
+        return self._close()
+
+    def render(self, deltas: Iterable[str]) -> str:
+        """Consume a whole delta stream and return the note text."""
+        try:
+            for delta in deltas:
+                self.feed(delta)
+        except BaseException:
+            self._file.close()
+            raise
+        return self.finish()
+
+    async def arender(self, deltas: AsyncIterable[str]) -> str:
+        """Async variant of render().
+
+        File writes run in a worker thread; ``on_event`` is always called on
+        the event loop thread.
+        """
+        try:
+            async for delta in deltas:
+                self._parts.append(delta)
+                fragments = self._fragments(self.streamer.feed(delta))
+                if fragments:
+                    await asyncio.to_thread(self._write, "".join(f + "\n" for _, f in fragments))
+                    self._record(fragments)
+            fragments = self._fragments(self.streamer.finish())
+            tail = "".join(f + "\n" for _, f in fragments) + render_footer()
+            await asyncio.to_thread(self._write, tail)
+            self._record(fragments)
+        finally:
+            self._file.close()
+        return self._close()
@@ -1,7 +1,12 @@
 import os
 import subprocess
 import sys
-from google.cloud import speech
+
+from audio_profile import get_audio_profile, probe_audio_header
+from transcript_cache import get_transcript_cache
+from transcription_engine import DEFAULT_MAX_WORKERS, stitch_transcripts, transcribe_long_audio_segments
+from vad import VoiceActivityDetector
+from wav_reader import MappedWav
 
 def check_ffmpeg_installed():
     """Check if ffmpeg is available in the system"""
@@ -26,8 +31,13 @@ def install_instructions():
     print("\nAlternatively, you can convert your MP3 file to WAV format using an online converter")
     print("and place the WAV file in the same directory with the name 'converted.wav'.")
     
-def convert_mp3_to_wav(mp3_path, wav_path):
-    """Convert MP3 to WAV using ffmpeg command-line tool"""
+def convert_mp3_to_wav(mp3_path, wav_path, profile=None):
+    """Convert MP3 to WAV using ffmpeg command-line tool
+
+    The target sample rate, codec and channel layout come from the audio
+    profile (default: 16 kHz mono PCM, see audio_profile.py).
+    """
+    profile = get_audio_profile(profile)
     # Check if input file exists
     if not os.path.exists(mp3_path):
         print(f"Error: Input file '{mp3_path}' does not exist.")
@@ -56,9 +66,9 @@ def convert_mp3_to_wav(mp3_path, wav_path):
             sys.exit(1)
     
     try:
-        # Run ffmpeg command with more verbose output - CHANGED to mono (ac=1)
+        # Run ffmpeg command with more verbose output - target format from the audio profile
         process = subprocess.run(
-            ["ffmpeg", "-i", mp3_path, "-acodec", "pcm_s16le", "-ar", "44100", "-ac", "1", wav_path],
+            ["ffmpeg", "-i", mp3_path, *profile.ffmpeg_args(), wav_path],
             check=False,  # Don't raise exception, handle it manually
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
@@ -89,42 +99,146 @@ def convert_mp3_to_wav(mp3_path, wav_path):
         print(f"Error during conversion: {e}")
         sys.exit(1)
 
-def transcribe_speech(wav_path):
+def transcribe_pcm_segments(pcm_chunks, sample_rate, recognizer=None, max_workers=DEFAULT_MAX_WORKERS, vad=True):
+    """Run the VAD pre-pass (optional) and the chunked recognizer over a PCM stream.
+
+    Returns the segment transcripts with times on the original recording's
+    timeline, even when silence was cut out before recognition.
+    """
+    timestamp_map = None
+    if vad:
+        detector = VoiceActivityDetector(sample_rate)
+        pcm_chunks = detector.filter(pcm_chunks)
+        timestamp_map = detector.timestamp_map
+    return transcribe_long_audio_segments(
+        pcm_chunks, sample_rate, recognizer, max_workers, timestamp_map=timestamp_map
+    )
+
+def _transcript_cache_key(cache, audio_path, recognizer, **config):
+    """Cache key covering the audio content, recognition settings and backend."""
+    return cache.make_key(
+        audio_path,
+        backend=getattr(recognizer, "backend_name", type(recognizer).__name__) if recognizer else "GoogleSpeechRecognizer",
+        language_code=getattr(recognizer, "language_code", "en-US"),
+        **config,
+    )
+
+def transcribe_speech(wav_path, recognizer=None, max_workers=DEFAULT_MAX_WORKERS, vad=True, use_cache=True):
     if not os.path.exists(wav_path):
         print(f"Error: WAV file '{wav_path}' not found. Please provide a valid WAV file.")
         sys.exit(1)
-        
-    client = speech.SpeechClient()
 
-    with open(wav_path, "rb") as audio_file:
-        content = audio_file.read()
+    # 采样率与编码从文件头读取，而不是写死 44100
+    audio_format = probe_audio_header(wav_path)
+
+    # 相同音频 + 相同识别配置直接命中缓存，跳过识别
+    cache = get_transcript_cache() if use_cache else None
+    if cache:
+        key = _transcript_cache_key(
+            cache, wav_path, recognizer, sample_rate=audio_format.sample_rate, vad=vad
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    transcript = _transcribe_wav(wav_path, audio_format, recognizer, max_workers, vad)
+    if cache:
+        cache.put(key, transcript)
+    return transcript
 
-    audio = speech.RecognitionAudio(content=content)
-    config = speech.RecognitionConfig(
-        encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=44100,  # 根据实际音频采样率调整
-        language_code="en-US",    # 可改为 "zh-CN" 中文
-        enable_automatic_punctuation=True
+def _transcribe_wav(wav_path, audio_format, recognizer, max_workers, vad):
+    if not audio_format.is_linear_pcm:
+        # FLAC / 非 16-bit PCM：用 ffmpeg 按原采样率解码为单声道 PCM
+        pcm_chunks = stream_pcm(wav_path, audio_format.sample_rate)
+        return stitch_transcripts(
+            transcribe_pcm_segments(pcm_chunks, audio_format.sample_rate, recognizer, max_workers, vad)
+        )
+
+    # 16-bit PCM WAV（含多声道）：内存映射读取，分块视图直接送入分段识别，不复制整个文件
+    # 分段并发识别，突破同步 recognize 约 1 分钟的限制
+    with MappedWav(wav_path) as wav:
+        segments = transcribe_pcm_segments(
+            wav.iter_mono_chunks(STREAM_CHUNK_BYTES // 2), wav.sample_rate, recognizer, max_workers, vad
+        )
+    return stitch_transcripts(segments)
+
+# 流式解码参数：每次从 ffmpeg 管道读取的字节数（16-bit 单声道 PCM）
+STREAM_CHUNK_BYTES = 16 * 1024
+
+def stream_pcm(audio_path, sample_rate=16000, chunk_bytes=STREAM_CHUNK_BYTES):
+    """Decode an audio file with ffmpeg and yield raw 16-bit mono PCM chunks.
+
+    ffmpeg writes to stdout instead of a WAV file on disk, so memory use is
+    bounded by ``chunk_bytes`` regardless of the recording length.
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Input file '{audio_path}' does not exist.")
+    if not check_ffmpeg_installed():
+        raise RuntimeError("FFmpeg is not installed.")
+
+    process = subprocess.Popen(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", audio_path,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", "1", "pipe:1"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
     )
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+        process.stdout.close()
+        error_output = process.stderr.read()
+        if process.wait() != 0:
+            error_message = error_output.decode("utf-8", errors="replace")
+            raise RuntimeError(f"FFmpeg Error (code {process.returncode}): {error_message}")
+    finally:
+        # 消费方提前停止时终止 ffmpeg，避免僵尸进程
+        if process.poll() is None:
+            process.kill()
+            process.wait()
 
-    response = client.recognize(config=config, audio=audio)
+def transcribe_audio_segments(audio_path, profile=None, recognizer=None, max_workers=DEFAULT_MAX_WORKERS, vad=True):
+    """Decode an audio file and return timestamped segment transcripts.
 
-    full_text = ""
-    for result in response.results:
-        full_text += result.alternatives[0].transcript + "\n"
+    The decode sample rate comes from the audio profile; streamed PCM is
+    always 16-bit mono.
+    """
+    sample_rate = get_audio_profile(profile).sample_rate
+    return transcribe_pcm_segments(stream_pcm(audio_path, sample_rate), sample_rate, recognizer, max_workers, vad)
 
-    return full_text.strip()
+def transcribe_audio_file(audio_path, profile=None, recognizer=None, max_workers=DEFAULT_MAX_WORKERS, vad=True, use_cache=True):
+    """Decode and transcribe an audio file without writing an intermediate WAV.
+
+    The transcript cache is checked first; on a miss, silence is dropped by
+    the VAD pre-pass and the remaining PCM is segmented and recognized
+    concurrently by the chunked engine.
+    """
+    profile = get_audio_profile(profile)
+    cache = get_transcript_cache() if use_cache else None
+    if cache:
+        key = _transcript_cache_key(
+            cache, audio_path, recognizer, sample_rate=profile.sample_rate, vad=vad
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    transcript = stitch_transcripts(transcribe_audio_segments(audio_path, profile, recognizer, max_workers, vad))
+    if cache:
+        cache.put(key, transcript)
+    return transcript
 
 if __name__ == "__main__":
     mp3_file = "Record_test.mp3"
-    wav_file = "converted.wav"
     output_file = "transcribed_text.txt"
 
-    # 步骤1：mp3 转 wav
-    convert_mp3_to_wav(mp3_file, wav_file)
-
-    # 步骤2：调用 API 进行转录
-    transcript = transcribe_speech(wav_file)
+    # 步骤1+2：ffmpeg 流式解码并直接送入转录，不生成中间 WAV 文件
+    if not check_ffmpeg_installed():
+        install_instructions()
+        sys.exit(1)
+    transcript = transcribe_audio_file(mp3_file)
 
     # 步骤3：写入 TXT 文件
     with open(output_file, "w", encoding="utf-8") as f:
@@ -0,0 +1,158 @@
+"""
+Per-stage concurrency limits and latency accounting for SOAP workflow runs.
+
+A single process-wide StageLimiter bounds how many runs can be in each stage
+at once (audio decode/transcription, speech recognition calls, LLM calls),
+independently of how many runs are in flight overall. It also records wait
+and service times per stage for throughput reporting; latency statistics
+cover the most recent ``STATS_WINDOW`` calls per stage.
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+STAGES = ("decode", "stt", "llm")
+# 每个阶段保留的最近耗时样本数（长驻进程中避免无限增长）
+STATS_WINDOW = 2048
+
+
+class StageLimiter:
+    """Bounds concurrency per named stage; ``None`` means unlimited."""
+
+    def __init__(self, **limits: Optional[int]):
+        self._lock = threading.Lock()
+        self._limits: Dict[str, Optional[int]] = {}
+        self._async_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._thread_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._durations = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+        self._waits = defaultdict(lambda: deque(maxlen=STATS_WINDOW))
+        self._counts = defaultdict(int)
+        self._active = defaultdict(int)
+        self.configure(**limits)
+
+    def configure(self, **limits: Optional[int]):
+        """Set stage limits; affects stages entered after the call."""
+        with self._lock:
+            for stage, limit in limits.items():
+                self._limits[stage] = limit
+                self._async_semaphores.pop(stage, None)
+                self._thread_semaphores.pop(stage, None)
+
+    def _async_semaphore(self, stage: str) -> Optional[asyncio.Semaphore]:
+        with self._lock:
+            limit = self._limits.get(stage)
+            if not limit:
+                return None
+            if stage not in self._async_semaphores:
+                self._async_semaphores[stage] = asyncio.Semaphore(limit)
+            return self._async_semaphores[stage]
+
+    def _thread_semaphore(self, stage: str) -> Optional[threading.BoundedSemaphore]:
+        with self._lock:
+            limit = self._limits.get(stage)
+            if not limit:
+                return None
+            if stage not in self._thread_semaphores:
+                self._thread_semaphores[stage] = threading.BoundedSemaphore(limit)
+            return self._thread_semaphores[stage]
+
+    def _record(self, stage: str, waited: float, duration: float, timings: Optional[dict]):
+        with self._lock:
+            self._waits[stage].append(waited)
+            self._durations[stage].append(duration)
+            self._counts[stage] += 1
+            self._active[stage] -= 1
+            # 同一次运行的识别请求来自多个线程，累加须在锁内完成
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + duration
+
+    def _enter(self, stage: str):
+        with self._lock:
+            self._active[stage] += 1
+
+    @asynccontextmanager
+    async def stage(self, name: str, timings: Optional[dict] = None):
+        """Async context: wait for a slot in ``name`` and time the block.
+
+        When ``timings`` is given, the block's duration is added to
+        ``timings[name]`` for per-run reporting.
+        """
+        semaphore = self._async_semaphore(name)
+        queued_at = time.perf_counter()
+        if semaphore:
+            await semaphore.acquire()
+        started_at = time.perf_counter()
+        self._enter(name)
+        try:
+            yield
+        finally:
+            if semaphore:
+                semaphore.release()
+            self._record(name, started_at - queued_at, time.perf_counter() - started_at, timings)
+
+    @contextmanager
+    def blocking_stage(self, name: str, timings: Optional[dict] = None):
+        """Thread variant of stage() for blocking calls made from worker threads."""
+        semaphore = self._thread_semaphore(name)
+        queued_at = time.perf_counter()
+        if semaphore:
+            semaphore.acquire()
+        started_at = time.perf_counter()
+        self._enter(name)
+        try:
+            yield
+        finally:
+            if semaphore:
+                semaphore.release()
+            self._record(name, started_at - queued_at, time.perf_counter() - started_at, timings)
+
+    def active(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._active)
+
+    def stats(self) -> Dict[str, dict]:
+        """Call count, and mean/p95 latency and mean queue wait over the recent window, in seconds."""
+        with self._lock:
+            result = {}
+            for stage, durations in self._durations.items():
+                ordered = sorted(durations)
+                waits = self._waits[stage]
+                result[stage] = {
+                    "limit": self._limits.get(stage),
+                    "count": self._counts[stage],
+                    "mean": sum(durations) / len(durations),
+                    "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                    "mean_wait": sum(waits) / len(waits),
+                }
+            return result
+
+
+class LimitedRecognizer:
+    """Recognizer wrapper that runs each recognize() call inside the "stt" stage."""
+
+    def __init__(self, recognizer, limiter: StageLimiter, timings: Optional[dict] = None):
+        self.recognizer = recognizer
+        self.limiter = limiter
+        self.timings = timings
+        self.language_code = getattr(recognizer, "language_code", "en-US")
+
+    @property
+    def backend_name(self) -> str:
+        # 转录缓存键使用被包装的识别后端名称
+        return getattr(self.recognizer, "backend_name", type(self.recognizer).__name__)
+
+    def recognize(self, pcm: bytes, sample_rate: int) -> str:
+        with self.limiter.blocking_stage("stt", self.timings):
+            return self.recognizer.recognize(pcm, sample_rate)
+
+
+_default_limiter = StageLimiter()
+
+
+def get_stage_limiter() -> StageLimiter:
+    """Process-wide limiter shared by every workflow run."""
+    return _default_limiter
@@ -0,0 +1,298 @@
+"""
+Structured (JSON) output for the symptom-extraction stage and the fused mode.
+
+- EXTRACTION_SCHEMA describes the extraction result; compile_schema() turns a
+  JSON schema into a validator function once, so checking a response is a
+  few closure calls rather than a schema walk per document.
+- response_format_for() asks the model for schema-constrained output
+  (``json_schema``) or JSON mode (``json_object``), depending on what the
+  model supports.
+- repair_json() is the tolerant parser for replies that are still not bare
+  JSON: markdown fences, preamble/epilogue text, trailing commas, truncated
+  output or Python-style literals.
+- parse_extraction() combines the two and reports what is wrong, which is
+  what the targeted re-ask (soap_prompts.build_reask_prompt) sends back.
+- FUSED_SCHEMA is the fused mode's reply: the extraction plus a
+  ``soap_note`` object with all four non-empty S/O/A/P sections.
+"""
+
+import ast
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+EXTRACTION_KEYS = ("symptom_raw", "symptom_standardized", "possible_conditions")
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{key: {"type": "array", "items": {"type": "string"}} for key in EXTRACTION_KEYS},
+        # 模型自评置信度（0-1），用于决定是否升级到强模型；strict 模式下为必填
+        "confidence": {"type": "number"},
+    },
+    "required": list(EXTRACTION_KEYS),
+}
+
+# 融合模式：抽取结果加上 SOAP 四段，四段均为必填且不能只有空白
+SOAP_NOTE_KEYS = ("subjective", "objective", "assessment", "plan")
+FUSED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **EXTRACTION_SCHEMA["properties"],
+        "soap_note": {
+            "type": "object",
+            "properties": {key: {"type": "string", "pattern": r"\S"} for key in SOAP_NOTE_KEYS},
+            "required": list(SOAP_NOTE_KEYS),
+        },
+    },
+    "required": list(EXTRACTION_KEYS) + ["soap_note"],
+}
+
+# 模型名前缀 -> 支持的结构化输出方式（按最长前缀匹配）；配置项可用 structured_output 覆盖
+STRUCTURED_OUTPUT_MODES = {
+    "gpt-4o": "json_schema",
+    "gpt-4.1": "json_schema",
+    "gpt-4-turbo": "json_object",
+    "gpt-4-1106": "json_object",
+    "gpt-4-0125": "json_object",
+    "gpt-3.5-turbo": "json_object",
+    "gpt-4": None,
+}
+
+_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+class _Stop(Exception):
+    """Type mismatch: skip the remaining checks for this value."""
+
+
+Validator = Callable[[Any, str, List[str]], None]
+
+
+def _compile(schema: Dict[str, Any]) -> Validator:
+    checks: List[Validator] = []
+
+    expected = schema.get("type")
+    if expected is not None:
+        names = expected if isinstance(expected, list) else [expected]
+        types = tuple(t for name in names for t in _TYPES[name])
+        allows_bool = "boolean" in names
+        label = " or ".join(names)
+
+        def check_type(value, path, errors):
+            # bool 是 int 的子类，需单独排除
+            if not isinstance(value, types) or (isinstance(value, bool) and not allows_bool):
+                errors.append(f"{path}: expected {label}, got {type(value).__name__}")
+                raise _Stop
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(f"{path}: {value!r} is not one of {allowed}")
+        checks.append(check_enum)
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_min_length(value, path, errors):
+            if isinstance(value, str) and len(value) < min_length:
+                errors.append(f"{path}: shorter than {min_length} characters")
+        checks.append(check_min_length)
+
+    if "pattern" in schema:
+        pattern = re.compile(schema["pattern"])
+
+        def check_pattern(value, path, errors):
+            if isinstance(value, str) and not pattern.search(value):
+                errors.append(f"{path}: does not match {pattern.pattern!r}")
+        checks.append(check_pattern)
+
+    required = tuple(schema.get("required", ()))
+    properties = {name: _compile(sub) for name, sub in schema.get("properties", {}).items()}
+    if required or properties:
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    errors.append(f"{path}: missing '{name}'")
+            for name, validate in properties.items():
+                if name in value:
+                    validate(value[name], f"{path}.{name}", errors)
+        checks.append(check_object)
+
+    if "items" in schema:
+        validate_item = _compile(schema["items"])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    validate_item(item, f"{path}[{i}]", errors)
+        checks.append(check_items)
+
+    def validate(value, path, errors):
+        try:
+            for check in checks:
+                check(value, path, errors)
+        except _Stop:
+            pass
+    return validate
+
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Any], List[str]]:
+    """Compile a JSON schema (the subset used here) into ``validate(value) -> [problems]``.
+
+    Supports type, enum, minLength, pattern, properties, required and items.
+    """
+    validate = _compile(schema)
+
+    def validator(value):
+        errors: List[str] = []
+        validate(value, "$", errors)
+        return errors
+    return validator
+
+
+validate_extraction = compile_schema(EXTRACTION_SCHEMA)
+validate_fused = compile_schema(FUSED_SCHEMA)
+
+
+def _strict(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Schema as strict structured outputs require it: closed objects, every property required."""
+    schema = dict(schema)
+    if "properties" in schema:
+        schema["properties"] = {name: _strict(sub) for name, sub in schema["properties"].items()}
+        schema["required"] = list(schema["properties"])
+        schema["additionalProperties"] = False
+    if "items" in schema:
+        schema["items"] = _strict(schema["items"])
+    schema.pop("minLength", None)
+    schema.pop("pattern", None)
+    return schema
+
+
+def structured_output_mode(model_name: str) -> Optional[str]:
+    """``json_schema``, ``json_object`` or None for ``model_name``."""
+    matches = [prefix for prefix in STRUCTURED_OUTPUT_MODES if model_name.startswith(prefix)]
+    return STRUCTURED_OUTPUT_MODES[max(matches, key=len)] if matches else None
+
+
+def response_format_for(mode: Optional[str], name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Request parameters asking for structured output in ``mode``; empty when unsupported."""
+    if mode == "json_schema":
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": name, "strict": True, "schema": _strict(schema)},
+        }}
+    if mode == "json_object":
+        # JSON mode 要求消息中出现 "JSON" 字样，抽取提示词已包含
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+
+def _strip_fence(text: str) -> str:
+    start = text.find("```")
+    if start < 0:
+        return text
+    body_start = text.find("\n", start)
+    if body_start < 0:
+        return text
+    end = text.find("```", body_start)
+    return text[body_start + 1:end if end >= 0 else len(text)]
+
+
+def _balance(text: str) -> str:
+    """From the first '{' or '[': the JSON value, with trailing commas dropped and truncation closed."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("no JSON object or array in the response")
+    out = []
+    stack = []
+    in_string = escaped = False
+    for ch in text[min(starts):]:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            while out and out[-1] in " \t\r\n,":
+                out.pop()
+            if not stack or ch != stack[-1]:
+                raise ValueError(f"unbalanced '{ch}' in the response")
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return "".join(out)
+            continue
+        out.append(ch)
+    # 输出被截断：补全未闭合的字符串与括号
+    if in_string:
+        out.append('"')
+    while out and out[-1] in " \t\r\n,:":
+        out.pop()
+    return "".join(out) + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Any:
+    """Parse a model reply that should be JSON, tolerating common formatting slips.
+
+    Raises ValueError when nothing usable can be recovered.
+    """
+    if text is None:
+        raise ValueError("empty response")
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    candidate = _balance(_strip_fence(text.strip().lstrip("\ufeff")))
+    try:
+        return json.loads(candidate)
+    except ValueError as e:
+        error = e
+    try:
+        # 单引号、True/None 等 Python 字面量写法
+        value = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError(f"response is not valid JSON: {error}")
+    try:
+        json.dumps(value)  # 只接受可表示为 JSON 的值
+    except (TypeError, ValueError):
+        raise ValueError(f"response is not valid JSON: {error}")
+    return value
+
+
+def parse_extraction(
+    content: Optional[str], validate: Callable[[Any], List[str]] = validate_extraction
+) -> Tuple[Optional[Any], List[str], bool]:
+    """Parse and validate an extraction reply (or, with ``validate_fused``, a fused one).
+
+    Returns ``(data, problems, repaired)``: ``data`` is None when the reply
+    could not be parsed, ``problems`` is empty when it matches the schema,
+    and ``repaired`` tells whether the tolerant parser was needed.
+    """
+    try:
+        data, repaired = json.loads(content), False
+    except (TypeError, ValueError):
+        try:
+            data, repaired = repair_json(content), True
+        except ValueError as e:
+            return None, [str(e)], True
+    return data, validate(data), repaired
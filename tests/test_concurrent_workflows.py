@@ -0,0 +1,83 @@
+import asyncio
+import math
+import shutil
+import struct
+import time
+import wave
+
+import pytest
+
+from artifact_store import ArtifactStore
+from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow
+from fake_backends import FakeChatClient, FakeRecognizer
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is required to decode the input")
+
+RECOGNIZER_LATENCY = 0.4
+
+
+def write_tone(path, seconds=2.0, sample_rate=16000):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"".join(
+            struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate)))
+            for i in range(int(seconds * sample_rate))
+        ))
+
+
+async def run_with_ticker(coro, interval=0.01):
+    """Run ``coro`` while a ticker task measures the longest gap between its wakeups."""
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    try:
+        result = await coro
+    finally:
+        done.set()
+        await task
+    return result, time.perf_counter() - start, max(gaps)
+
+
+def test_two_workflows_run_concurrently_without_blocking_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("SOAP_LLM_CACHE", "off")
+    audio_file = tmp_path / "visit.wav"
+    write_tone(audio_file)
+    # 识别为阻塞 sleep（与真实网络调用一样在线程中执行）；LLM 为异步替身
+    workflow = SoapNoteWorkflow(
+        recognizer=FakeRecognizer(latency=RECOGNIZER_LATENCY),
+        llm_client=FakeChatClient(overhead=0.2, per_completion_token=0.0),
+        artifact_store=ArtifactStore(str(tmp_path / "runs")),
+    )
+    initial_input = {"mp3_file": str(audio_file), "vad": False, "use_transcript_cache": False}
+
+    async def run(n):
+        return await asyncio.gather(*(
+            workflow.execute_workflow(dict(initial_input), executor=None) for _ in range(n)
+        ))
+
+    (single,), single_time, _ = asyncio.run(run_with_ticker(run(1)))
+    results, concurrent_time, max_gap = asyncio.run(run_with_ticker(run(2)))
+
+    assert single["status"] == "completed", single.get("error")
+    assert [r["status"] for r in results] == ["completed", "completed"], [r.get("error") for r in results]
+    assert results[0]["run_dir"] != results[1]["run_dir"]
+    for result in results:
+        with open(result["soap_note_file"], encoding="utf-8") as f:
+            assert f.read() == result["soap_note"]
+
+    # 事件循环始终保持响应：阻塞的识别调用没有卡住其他协程
+    assert max_gap < RECOGNIZER_LATENCY / 2
+    # 两次运行重叠执行，总耗时接近单次而不是两倍
+    assert concurrent_time < 1.5 * single_time
@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在干净的解释器中导入：用记录构造次数的 openai / httpx 替身，并用审计钩子记录网络连接
+SCRIPT = textwrap.dedent("""
+    import json
+    import os
+    import sys
+    import types
+
+    constructed, connects = [], []
+
+    class _Client:
+        def __init__(self, *args, **kwargs):
+            constructed.append(type(self).__name__)
+
+    fake_openai = types.ModuleType("openai")
+    fake_openai.OpenAI = type("OpenAI", (_Client,), {})
+    fake_openai.AsyncOpenAI = type("AsyncOpenAI", (_Client,), {})
+    sys.modules["openai"] = fake_openai
+    fake_httpx = types.ModuleType("httpx")
+    fake_httpx.Client = fake_httpx.AsyncClient = fake_httpx.Limits = _Client
+    sys.modules["httpx"] = fake_httpx
+    sys.addaudithook(lambda event, args: connects.append(event) if event == "socket.connect" else None)
+
+    import clients
+    import interpret_call_content
+    import interpret_to_soap
+
+    result = {
+        "constructed": list(constructed),
+        "connects": list(connects),
+        "cached_clients": sorted(clients._clients),
+        "files": sorted(os.listdir(".")),
+    }
+    try:
+        interpret_call_content.client
+        result["lazy_error"] = None
+    except ValueError as e:
+        result["lazy_error"] = str(e)
+    print(json.dumps(result))
+""")
+
+
+def test_importing_interpret_modules_constructs_no_client(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = ROOT
+    completed = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    assert result["constructed"] == []
+    assert result["connects"] == []
+    assert result["cached_clients"] == []
+    # 导入时不读取转录、不写 interpret_text.json / soap_note.*
+    assert result["files"] == []
+    # 客户端只在首次使用时创建；没有 OPENAI_API_KEY 时此时才报错
+    assert "OPENAI_API_KEY" in result["lazy_error"]
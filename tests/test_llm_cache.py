@@ -0,0 +1,32 @@
+import time
+
+from llm_cache import LLMResponseCache
+
+
+def test_ttl_zero_does_not_cache():
+    cache = LLMResponseCache()
+    cache.set("key", "value", ttl=0)
+    assert cache.get("key") is None
+    assert len(cache.storage._entries) == 0
+
+
+def test_cache_level_ttl_zero_does_not_cache():
+    cache = LLMResponseCache(ttl=0)
+    cache.set("key", "value")
+    assert cache.get("key") is None
+
+
+def test_ttl_none_never_expires():
+    cache = LLMResponseCache(ttl=None)
+    cache.set("key", "value")
+    assert cache.storage.get("key") == ("value", None)
+    assert cache.get("key") == "value"
+
+
+def test_positive_ttl_expires(monkeypatch):
+    cache = LLMResponseCache()
+    cache.set("key", "value", ttl=10)
+    assert cache.get("key") == "value"
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("key") is None
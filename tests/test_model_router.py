@@ -0,0 +1,120 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from fake_backends import FAKE_EXTRACTION, FAKE_SOAP, SAMPLE_TRANSCRIPT
+from llm_cache import LLMResponseCache
+from model_router import ModelRouter, ModelTier
+from soap_prompts import split_fused_result
+from structured_output import EXTRACTION_SCHEMA, response_format_for
+
+FAST = ModelTier.from_config({"llm_id": "fast", "model_name": "gpt-4o-mini"})
+STRONG = ModelTier.from_config({"llm_id": "strong", "model_name": "gpt-4"})
+FUSED = ModelTier.from_config({"llm_id": "fused", "model_name": "gpt-4o"})
+ROUTES = {"extraction": ["fast", "strong"], "soap": ["strong"], "fused": ["fused"]}
+
+
+class ScriptedChatClient:
+    """Async chat client replying per model with canned content (or a list, one per request), counting requests."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _stream(self, content):
+        for line in content.splitlines(keepends=True):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=line))])
+
+    async def _create(self, model, messages, stream=False, **params):
+        self.requests.append((model, params))
+        content = self.replies[model]
+        if isinstance(content, list):
+            content = content.pop(0)
+        if stream:
+            return self._stream(content)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=50)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def make_router(reasks=0):
+    return ModelRouter(
+        tiers={"fast": FAST, "strong": STRONG, "fused": FUSED}, routes=ROUTES, min_confidence=0.6, reasks=reasks
+    )
+
+
+def test_stream_cache_hit_is_not_charged_as_a_call(monkeypatch):
+    cache = LLMResponseCache()
+    monkeypatch.setattr("llm_cache.get_llm_cache", lambda: cache)
+    router = make_router()
+    client = ScriptedChatClient({"gpt-4": "S: a\nO: b\nA: c\nP: d"})
+    messages = [{"role": "user", "content": "Write a SOAP note."}]
+
+    async def stream_once(usage):
+        return "".join([delta async for delta in router.stream(client, "soap", messages, usage=usage)])
+
+    first, second = {}, {}
+    assert asyncio.run(stream_once(first)) == asyncio.run(stream_once(second))
+    assert len(client.requests) == 1
+    assert first["strong"]["calls"] == 1 and first["strong"]["cost_usd"] > 0
+    assert second["strong"] == {"model": "gpt-4", "calls": 0, "cache_hits": 1, "seconds": 0.0, "cost_usd": 0.0}
+    report = router.report()["strong"]
+    assert report["calls"] == 1 and report["cache_hits"] == 1
+    assert report["cost_usd"] == first["strong"]["cost_usd"]
+
+
+def test_strict_schema_lets_the_model_report_confidence():
+    schema = response_format_for("json_schema", "symptom_extraction", EXTRACTION_SCHEMA)["response_format"]
+    strict = schema["json_schema"]["schema"]
+    assert strict["additionalProperties"] is False
+    assert strict["properties"]["confidence"] == {"type": "number"}
+    assert "confidence" in strict["required"]
+
+
+def test_low_reported_confidence_escalates(monkeypatch):
+    monkeypatch.setattr("llm_cache.get_llm_cache", lambda: None)
+    router = make_router()
+    client = ScriptedChatClient({
+        "gpt-4o-mini": json.dumps({**FAKE_EXTRACTION, "confidence": 0.2}),
+        "gpt-4": json.dumps(FAKE_EXTRACTION),
+    })
+    usage = {}
+    data = asyncio.run(router.extract(client, SAMPLE_TRANSCRIPT, [{"role": "user", "content": "x"}], usage=usage))
+    assert data == FAKE_EXTRACTION
+    assert usage["extraction_llm"] == "strong"
+    assert [model for model, _ in client.requests] == ["gpt-4o-mini", "gpt-4"]
+    assert router.report()["fast"]["escalations"] == 1
+
+
+FUSED_MESSAGES = [{"role": "user", "content": "Extract and write the SOAP note."}]
+FUSED_REPLY = {**FAKE_EXTRACTION, "soap_note": FAKE_SOAP}
+
+
+def test_fused_reply_is_structured_output_and_re_asked_when_a_section_is_missing(monkeypatch):
+    monkeypatch.setattr("llm_cache.get_llm_cache", lambda: None)
+    router = make_router(reasks=1)
+    blank = {**FUSED_REPLY, "soap_note": {**FAKE_SOAP, "subjective": "  "}}
+    client = ScriptedChatClient({"gpt-4o": [json.dumps(blank), json.dumps(FUSED_REPLY)]})
+    extraction, soap_note = split_fused_result(asyncio.run(router.fused(client, FUSED_MESSAGES)))
+
+    assert extraction == FAKE_EXTRACTION
+    assert soap_note.startswith(f"S (Subjective): {FAKE_SOAP['subjective']}")
+    response_format = client.requests[0][1]["response_format"]
+    assert response_format["json_schema"]["name"] == "fused_soap"
+    soap_schema = response_format["json_schema"]["schema"]["properties"]["soap_note"]
+    assert soap_schema["required"] == ["subjective", "objective", "assessment", "plan"]
+    assert len(client.requests) == 2
+    assert router.report()["fused"]["reasks"] == 1
+
+
+def test_fused_reply_without_all_sections_fails(monkeypatch):
+    monkeypatch.setattr("llm_cache.get_llm_cache", lambda: None)
+    router = make_router(reasks=1)
+    partial = {**FAKE_EXTRACTION, "soap_note": {"objective": "x", "assessment": "y", "plan": "z"}}
+    client = ScriptedChatClient({"gpt-4o": [json.dumps(partial), json.dumps(partial)]})
+    with pytest.raises(ValueError, match="missing 'subjective'"):
+        asyncio.run(router.fused(client, FUSED_MESSAGES))
+    with pytest.raises(ValueError, match="subjective"):
+        split_fused_result(partial)
@@ -0,0 +1,65 @@
+import threading
+
+from example_mcp_servers.plan_store import FilePlanStore
+
+
+def make_store(tmp_path, plans=200):
+    store = FilePlanStore(tmp_path / "plans", fsync=False)
+    store.save_many([(f"plan_{i}", f"body {i}", {"plan_name": f"plan_{i}"}) for i in range(plans)])
+    return store
+
+
+def test_concurrent_loads_share_the_snapshot(tmp_path):
+    store = make_store(tmp_path)
+    errors, results = [], []
+
+    def load():
+        # 每个线程一个 store，相当于多个服务进程同时启动
+        other = FilePlanStore(store.plans_dir, fsync=False)
+        try:
+            for _ in range(20):
+                other.snapshot_path.unlink(missing_ok=True)
+                results.append(len(other.load_metadata()))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert set(results) == {200}
+    assert not [p.name for p in store.plans_dir.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_failed_snapshot_write_keeps_the_index(tmp_path):
+    store = make_store(tmp_path, plans=3)
+    store.snapshot_path.mkdir()  # os.replace 无法覆盖目录
+    metadata = store.load_metadata()
+    assert sorted(metadata) == ["plan_0", "plan_1", "plan_2"]
+    assert metadata["plan_1"] == {"plan_name": "plan_1"}
+
+
+def test_concurrent_saves_of_one_plan_never_mix(tmp_path):
+    store = make_store(tmp_path, plans=0)
+    errors = []
+
+    def save(writer):
+        other = FilePlanStore(store.plans_dir, fsync=False)
+        try:
+            for _ in range(10):
+                other.save("shared", f"writer {writer}\n" * 2000, {"writer": writer})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(writer,)) for writer in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    body = store.read_body("shared")
+    assert body in {f"writer {writer}\n" * 2000 for writer in range(4)}
+    assert store.read_metadata("shared")["writer"] in range(4)
+    assert not [p.name for p in store.plans_dir.iterdir() if p.name.endswith(".tmp")]
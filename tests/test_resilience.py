@@ -0,0 +1,236 @@
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from resilience import (
+    DeadlineExceeded,
+    ResilientAsyncClient,
+    ResilientClient,
+    RetryPolicy,
+    TokenBucket,
+)
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    """Stands in for openai.APITimeoutError (matched by name in is_retryable)."""
+
+
+class FakeServer:
+    """Scripted chat-completions backend.
+
+    Each request takes the next step of ``script``: ``(status, latency)`` or
+    ``(status, latency, headers)``; once the script runs out every request
+    gets ``default``. Like the SDK, a request slower than its ``timeout=``
+    fails with a timeout after ``timeout`` seconds.
+    """
+
+    def __init__(self, script=(), default=(200, 0.0)):
+        self.script = list(script)
+        self.default = default
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def _next(self, kwargs):
+        with self._lock:
+            self.requests.append(kwargs)
+            step = self.script.pop(0) if self.script else self.default
+        status, latency, headers = (tuple(step) + ({},))[:3]
+        timeout = kwargs.get("timeout")
+        if timeout is not None and latency > timeout:
+            return status, timeout, headers, True
+        return status, latency, headers, False
+
+    @staticmethod
+    def _reply(status, headers, timed_out):
+        if timed_out:
+            raise APITimeoutError("Request timed out.")
+        if status != 200:
+            raise HTTPStatusError(status, headers)
+        message = SimpleNamespace(content="ok")
+        parsed = SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return SimpleNamespace(headers=headers, parse=lambda: parsed)
+
+    def sync_client(self):
+        def create(**kwargs):
+            status, latency, headers, timed_out = self._next(kwargs)
+            time.sleep(latency)
+            return self._reply(status, headers, timed_out)
+
+        raw = SimpleNamespace(create=create)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=raw)))
+
+    def async_client(self):
+        async def create(**kwargs):
+            status, latency, headers, timed_out = self._next(kwargs)
+            await asyncio.sleep(latency)
+            return self._reply(status, headers, timed_out)
+
+        raw = SimpleNamespace(create=create)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=raw)))
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+FAST_RETRY = RetryPolicy(max_attempts=4, base_delay=0.01, max_delay=0.05)
+
+
+def call_sync(client):
+    return client.chat.completions.create(model="gpt-4", messages=MESSAGES)
+
+
+def call_async(client):
+    return asyncio.run(client.chat.completions.create(model="gpt-4", messages=MESSAGES))
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    random.seed(0)
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    for attempt in range(6):
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= min(4.0, 0.5 * 2 ** attempt)
+    assert max(policy.delay(0) for _ in range(50)) <= 0.5 < max(policy.delay(3) for _ in range(50))
+    assert policy.delay(0, retry_after=2.0) >= 2.0
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_retries_retryable_errors_until_success(mode):
+    server = FakeServer([(503, 0.0), (500, 0.0)])
+    if mode == "sync":
+        client = ResilientClient(server.sync_client(), retry=FAST_RETRY)
+        result = call_sync(client)
+    else:
+        client = ResilientAsyncClient(server.async_client(), retry=FAST_RETRY)
+        result = call_async(client)
+    assert result.choices[0].message.content == "ok"
+    assert len(server.requests) == 3
+    assert client.stats.as_dict() == {
+        "calls": 1, "attempts": 3, "retries": 2, "rate_limited": 0, "hedges": 0, "hedge_wins": 0,
+    }
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_non_retryable_error_is_raised_at_once(mode):
+    server = FakeServer([(400, 0.0)])
+    with pytest.raises(HTTPStatusError):
+        if mode == "sync":
+            call_sync(ResilientClient(server.sync_client(), retry=FAST_RETRY))
+        else:
+            call_async(ResilientAsyncClient(server.async_client(), retry=FAST_RETRY))
+    assert len(server.requests) == 1
+
+
+def test_429_honours_retry_after_and_pauses_the_bucket():
+    server = FakeServer([(429, 0.0, {"retry-after-ms": "200"})])
+    bucket = TokenBucket()
+    client = ResilientClient(server.sync_client(), retry=FAST_RETRY, bucket=bucket)
+    start = time.monotonic()
+    call_sync(client)
+    assert time.monotonic() - start >= 0.2
+    assert client.stats.rate_limited == 1 and client.stats.retries == 1
+
+
+def test_rate_limit_headers_retune_the_bucket():
+    headers = {
+        "x-ratelimit-limit-requests": "60",
+        "x-ratelimit-remaining-requests": "50",
+        "x-ratelimit-reset-requests": "1s",
+    }
+    bucket = TokenBucket()
+    call_sync(ResilientClient(FakeServer(default=(200, 0.0, headers)).sync_client(), bucket=bucket))
+    assert bucket.rate == pytest.approx(10.0)
+    assert bucket.capacity == 60
+
+
+def test_sync_timeout_is_passed_to_the_sdk_call():
+    server = FakeServer([(200, 5.0)])
+    client = ResilientClient(server.sync_client(), timeout=0.1, retry=FAST_RETRY)
+    start = time.monotonic()
+    call_sync(client)
+    assert time.monotonic() - start < 1.0
+    assert [request["timeout"] for request in server.requests] == [0.1, 0.1]
+    assert client.stats.retries == 1
+
+
+def test_sync_slow_backend_does_not_starve_later_calls():
+    # 超时的请求不会占住共享线程池，之后的调用不受影响
+    server = FakeServer([(200, 5.0)] * 24)
+    client = ResilientClient(server.sync_client(), timeout=0.05, retry=RetryPolicy(max_attempts=1))
+    errors = []
+
+    def slow_call():
+        try:
+            call_sync(client)
+        except APITimeoutError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=slow_call) for _ in range(24)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 24
+    start = time.monotonic()
+    assert call_sync(client).choices[0].message.content == "ok"
+    assert time.monotonic() - start < 0.05
+
+
+def test_deadline_stops_retries():
+    server = FakeServer(default=(503, 0.0, {"retry-after": "1"}))
+    client = ResilientClient(server.sync_client(), deadline=0.5, retry=RetryPolicy(max_attempts=10))
+    with pytest.raises(DeadlineExceeded):
+        call_sync(client)
+    assert len(server.requests) == 1
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_hedged_request_wins_over_slow_original(mode):
+    server = FakeServer([(200, 1.0)])
+    if mode == "sync":
+        client = ResilientClient(server.sync_client(), timeout=5, hedge_after=0.05)
+        start = time.monotonic()
+        call_sync(client)
+    else:
+        client = ResilientAsyncClient(server.async_client(), timeout=5, hedge_after=0.05)
+        start = time.monotonic()
+        call_async(client)
+    assert time.monotonic() - start < 0.5
+    assert len(server.requests) == 2
+    assert client.stats.hedges == 1 and client.stats.hedge_wins == 1
+
+
+def test_no_hedge_when_original_is_fast():
+    server = FakeServer(default=(200, 0.0))
+    client = ResilientClient(server.sync_client(), timeout=5, hedge_after=0.2)
+    call_sync(client)
+    assert len(server.requests) == 1
+    assert client.stats.hedges == 0
+
+
+def test_no_hedge_without_spare_rate_limit_budget():
+    server = FakeServer([(200, 0.3)])
+    bucket = TokenBucket(rate=1.0, capacity=1.0)
+    client = ResilientClient(server.sync_client(), timeout=5, hedge_after=0.05, bucket=bucket)
+    call_sync(client)
+    assert len(server.requests) == 1
+    assert client.stats.hedges == 0
+
+
+def test_stats_are_thread_safe():
+    server = FakeServer(default=(200, 0.0))
+    client = ResilientClient(server.sync_client())
+    threads = [threading.Thread(target=lambda: [call_sync(client) for _ in range(500)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.stats.calls == client.stats.attempts == 4000
@@ -0,0 +1,63 @@
+import asyncio
+import math
+import shutil
+import struct
+import wave
+
+import pytest
+
+from artifact_store import ArtifactStore
+from example_custom_workflows.soap_note_workflow import SoapNoteWorkflow
+from fake_backends import FakeChatClient, FakeRecognizer
+from soap_pipeline import SoapPipeline
+
+
+class FailingStore(ArtifactStore):
+    """ArtifactStore whose create_run fails after ``good_runs`` successful calls."""
+
+    def __init__(self, root, good_runs):
+        super().__init__(root)
+        self.good_runs = good_runs
+
+    def create_run(self, run_id=None):
+        if self.good_runs == 0:
+            raise OSError("No space left on device")
+        self.good_runs -= 1
+        return super().create_run(run_id)
+
+
+def make_pipeline(store):
+    workflow = SoapNoteWorkflow(
+        recognizer=FakeRecognizer(latency=0.01),
+        llm_client=FakeChatClient(overhead=0.0, per_completion_token=0.0),
+        artifact_store=store,
+    )
+    return SoapPipeline(workflow, options={"use_transcript_cache": False, "vad": False})
+
+
+@pytest.mark.parametrize("good_runs", [0, 1])
+def test_create_run_failure_is_raised_instead_of_hanging(tmp_path, monkeypatch, good_runs):
+    monkeypatch.setenv("SOAP_LLM_CACHE", "off")
+    store = FailingStore(str(tmp_path / "runs"), good_runs)
+    pipeline = make_pipeline(store)
+    with pytest.raises(OSError, match="No space left"):
+        asyncio.run(asyncio.wait_for(pipeline.run(["missing_a.wav", "missing_b.wav"]), timeout=10))
+    # 已创建的运行不会留下 .in_progress 标记
+    assert len(store.list_runs()) == good_runs
+    assert not any(run.in_progress() for run in store.list_runs())
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is required to decode the input")
+def test_pipeline_processes_every_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("SOAP_LLM_CACHE", "off")
+    audio_file = tmp_path / "visit.wav"
+    with wave.open(str(audio_file), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"".join(struct.pack("<h", int(8000 * math.sin(i / 3))) for i in range(16000)))
+    store = ArtifactStore(str(tmp_path / "runs"))
+    results = asyncio.run(asyncio.wait_for(make_pipeline(store).run([str(audio_file)] * 3), timeout=30))
+    assert [r["status"] for r in results] == ["completed"] * 3, [r.get("error") for r in results]
+    assert len({r["run_dir"] for r in results}) == 3
+    assert not any(run.in_progress() for run in store.list_runs())
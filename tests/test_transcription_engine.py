@@ -0,0 +1,99 @@
+import numpy as np
+
+from fake_backends import FakeRecognizer
+from transcription_engine import (
+    SegmentTranscript,
+    iter_segments,
+    stitch_transcripts,
+    transcribe_segments,
+)
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+def chunks(samples, size=4096):
+    pcm = samples.tobytes()
+    return [pcm[i:i + size] for i in range(0, len(pcm), size)]
+
+
+class WordRecognizer:
+    """Fake recognizer reading back "words": runs of constant sample value ``1000 + n`` become ``wn``."""
+
+    def recognize(self, pcm, sample_rate):
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        starts = np.flatnonzero(np.diff(samples, prepend=-1))
+        return " ".join(f"w{samples[i] - 1000}" for i in starts)
+
+
+def assert_covers(segments, samples):
+    """Every segment is the audio at its offset and, together, they cover the input without gaps."""
+    pcm = samples.tobytes()
+    end = 0
+    for segment in segments:
+        start = segment.start_sample * 2
+        assert segment.pcm == pcm[start:start + len(segment.pcm)]
+        assert start <= end if segment.overlaps_previous else start == end
+        end = start + len(segment.pcm)
+    assert end == len(pcm)
+
+
+def test_long_silence_gives_one_cut_not_one_per_frame():
+    samples = np.concatenate([tone(3), silence(4), tone(3), silence(1), tone(2)])
+    segments = list(iter_segments(chunks(samples), RATE, window_seconds=5))
+    assert_covers(segments, samples)
+    assert len(segments) == 4
+    assert all(not segment.overlaps_previous for segment in segments)
+    # 静音持续到第一个窗口末尾：整窗一段；第二刀落在静音末尾，下一段从语音开始
+    assert segments[0].end_seconds == 5.0
+    assert 6.98 <= segments[1].end_seconds <= 7.0
+    assert np.abs(np.frombuffer(segments[2].pcm[:640], dtype=np.int16)).max() > 1000
+    assert 10.98 <= segments[2].end_seconds <= 11.0
+
+
+def test_silence_reaching_the_window_end_keeps_the_whole_window():
+    samples = np.concatenate([tone(2), silence(10), tone(2)])
+    segments = list(iter_segments(chunks(samples), RATE, window_seconds=5))
+    assert_covers(segments, samples)
+    assert [segment.end_seconds for segment in segments[:2]] == [5.0, 10.0]
+
+
+def test_fixed_windows_overlap_and_stitch_without_duplicates():
+    # 每 0.5 秒一个“词”；无静音，按固定窗口加重叠切分
+    words = 40
+    samples = np.repeat(np.arange(1000, 1000 + words, dtype=np.int16), RATE // 2)
+    segments = list(iter_segments(chunks(samples), RATE, window_seconds=5, overlap_seconds=1))
+    assert_covers(segments, samples)
+    assert all(segment.overlaps_previous for segment in segments[1:])
+    assert segments[1].start_seconds == 4.0
+
+    transcripts = list(transcribe_segments(segments, WordRecognizer(), max_workers=3))
+    assert [t.index for t in transcripts] == list(range(len(segments)))
+    assert stitch_transcripts(transcripts) == " ".join(f"w{n}" for n in range(words))
+
+
+def test_fake_recognizer_results_come_back_in_order():
+    samples = np.concatenate([tone(3), silence(1)] * 4)
+    segments = list(iter_segments(chunks(samples), RATE, window_seconds=5))
+    transcripts = list(transcribe_segments(segments, FakeRecognizer(latency=0.01), max_workers=4))
+    assert [t.index for t in transcripts] == [s.index for s in segments]
+    assert [t.start_seconds for t in transcripts] == [s.start_seconds for s in segments]
+    assert all(t.text for t in transcripts)
+
+
+def test_stitch_drops_only_the_repeated_overlap():
+    transcripts = [
+        SegmentTranscript(0, 0.0, 5.0, "the patient reports a headache"),
+        SegmentTranscript(1, 4.0, 9.0, "a Headache, and dizziness", overlaps_previous=True),
+        SegmentTranscript(2, 9.0, 12.0, "dizziness at night"),
+    ]
+    # 只有标记为重叠的段才去重；不重叠的段原样拼接
+    assert stitch_transcripts(transcripts) == "the patient reports a headache and dizziness dizziness at night"
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from vad import TimestampMap, VoiceActivityDetector
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.int16)
+
+
+# 1.2 s 静音、1.2 s 语音、2.4 s 静音、1.2 s 语音、1.2 s 静音
+SAMPLES = np.concatenate([silence(1.2), tone(1.2), silence(2.4), tone(1.2), silence(1.2)])
+# 每段语音向前保留 150 ms（preroll）、向后保留 300 ms（hangover）
+EXPECTED_SPANS = [(1.2 - 0.15, 2.4 + 0.3), (4.8 - 0.15, 6.0 + 0.3)]
+
+
+def flat(spans):
+    return [seconds for span in spans for seconds in span]
+
+
+def run_vad(chunk_size):
+    pcm = SAMPLES.tobytes()
+    vad = VoiceActivityDetector(RATE)
+    kept = b"".join(vad.filter(pcm[i:i + chunk_size] for i in range(0, len(pcm), chunk_size)))
+    return vad, kept
+
+
+@pytest.mark.parametrize("chunk_size", [4096, 1001, len(SAMPLES) * 2])
+def test_tone_and_silence_keep_the_expected_spans(chunk_size):
+    vad, kept = run_vad(chunk_size)
+    assert flat(vad.timestamp_map.spans) == pytest.approx(flat(EXPECTED_SPANS))
+    assert vad.total_seconds == pytest.approx(7.2)
+    assert vad.kept_ratio == pytest.approx(3.3 / 7.2)
+    # 保留的音频就是原始录音中这些区间的拼接
+    expected = np.concatenate([SAMPLES[round(start * RATE):round(end * RATE)] for start, end in EXPECTED_SPANS])
+    assert kept == expected.tobytes()
+
+
+def test_to_original_round_trips_the_dropped_span_boundaries():
+    vad, _ = run_vad(4096)
+    timestamp_map = vad.timestamp_map
+    first_length = EXPECTED_SPANS[0][1] - EXPECTED_SPANS[0][0]
+    # 压缩音频的起点、第一段末尾的最后一个采样、第二段起点
+    assert timestamp_map.to_original(0.0) == pytest.approx(EXPECTED_SPANS[0][0])
+    assert timestamp_map.to_original(first_length - 1 / RATE) == pytest.approx(EXPECTED_SPANS[0][1] - 1 / RATE)
+    assert timestamp_map.to_original(first_length) == pytest.approx(EXPECTED_SPANS[1][0])
+    assert timestamp_map.to_original(timestamp_map.kept_seconds) == pytest.approx(EXPECTED_SPANS[1][1])
+
+    rebuilt = TimestampMap.from_sample_spans(RATE, timestamp_map.sample_spans)
+    assert rebuilt.spans == timestamp_map.spans
+    assert rebuilt.to_original(first_length) == timestamp_map.to_original(first_length)
+
+
+def test_adjacent_spans_merge():
+    timestamp_map = TimestampMap(RATE)
+    timestamp_map.add(0, 100)
+    timestamp_map.add(100, 50)
+    timestamp_map.add(400, 50)
+    assert timestamp_map.sample_spans == [(0, 150), (400, 50)]
+    assert timestamp_map.to_original_sample(149) == 149
+    assert timestamp_map.to_original_sample(150) == 400
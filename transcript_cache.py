@@ -0,0 +1,117 @@
+"""
+Content-addressed on-disk cache for transcripts.
+
+Entries are keyed by the SHA-256 of the source audio plus the recognition
+settings (profile, language, VAD, backend), so re-running the workflow on the
+same recording skips both the ffmpeg decode and the speech API call. The
+cache is bounded in bytes and evicts least-recently-used entries, using file
+modification times as the recency order so it survives restarts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".cache/transcripts"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_DIR_ENV_VAR = "SOAP_TRANSCRIPT_CACHE_DIR"
+MAX_BYTES_ENV_VAR = "SOAP_TRANSCRIPT_CACHE_MAX_BYTES"
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_audio_file(path: str) -> str:
+    """SHA-256 of a file's content, read in fixed-size blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """Size-bounded LRU cache of transcripts stored as files under ``root``."""
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root or os.getenv(CACHE_DIR_ENV_VAR) or DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_bytes or os.getenv(MAX_BYTES_ENV_VAR) or DEFAULT_MAX_BYTES)
+        self._lock = threading.Lock()
+
+    def make_key(self, audio_path: str, **config) -> str:
+        """Cache key for ``audio_path`` transcribed with the given settings."""
+        payload = json.dumps(
+            {"audio_sha256": hash_audio_file(audio_path), "config": config},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        # 更新访问时间，作为 LRU 顺序
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        logger.debug(f"Transcript cache hit: {key}")
+        return text
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，避免并发读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least-recently-used entries until the cache fits ``max_bytes``."""
+        with self._lock:
+            entries = []
+            for path in self.root.glob("*/*.txt"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+
+_default_cache: Optional[TranscriptCache] = None
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """Process-wide cache configured from the environment."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TranscriptCache()
+    return _default_cache
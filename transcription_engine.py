@@ -0,0 +1,295 @@
+"""
+Chunked long-audio transcription engine.
+
+Splits 16-bit mono PCM into segments, either at fixed windows with overlap or
+at the end of the quietest pause near the end of each window, recognizes the
+segments concurrently through a bounded worker pool and stitches the
+transcripts back together in order.
+
+The recognizer is pluggable: anything with a ``recognize(pcm, sample_rate)``
+method returning text can be used, e.g. a local fake backend for benchmarks.
+"""
+
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Protocol
+
+import numpy as np
+
+BYTES_PER_SAMPLE = 2  # pcm_s16le
+
+# 同步 recognize 接口单次音频上限约 60 秒
+DEFAULT_WINDOW_SECONDS = 50.0
+DEFAULT_OVERLAP_SECONDS = 2.0
+DEFAULT_MAX_WORKERS = 4
+
+# 单个识别请求的超时（秒），超时后由 ResilientRecognizer 重试
+DEFAULT_RECOGNIZE_TIMEOUT = 60.0
+
+# 静音切分：在窗口末尾这段时间内寻找最安静的帧
+SILENCE_SEARCH_SECONDS = 8.0
+SILENCE_FRAME_MS = 20
+SILENCE_THRESHOLD_DBFS = -40.0
+
+# 拼接时最多比较的重叠词数
+MAX_OVERLAP_WORDS = 12
+
+_WORD_NORMALIZE = re.compile(r"[^\w']+")
+
+
+class Recognizer(Protocol):
+    """Speech recognition backend used by the engine."""
+
+    def recognize(self, pcm: bytes, sample_rate: int) -> str:
+        ...
+
+
+@dataclass
+class Segment:
+    """A slice of PCM audio scheduled for recognition."""
+
+    index: int
+    start_sample: int
+    pcm: bytes
+    sample_rate: int
+    overlaps_previous: bool = False
+
+    @property
+    def start_seconds(self) -> float:
+        return self.start_sample / self.sample_rate
+
+    @property
+    def end_seconds(self) -> float:
+        return (self.start_sample + len(self.pcm) // BYTES_PER_SAMPLE) / self.sample_rate
+
+
+@dataclass
+class SegmentTranscript:
+    """Recognition result for one segment."""
+
+    index: int
+    start_seconds: float
+    end_seconds: float
+    text: str
+    overlaps_previous: bool = False
+
+
+class GoogleSpeechRecognizer:
+    """Recognizer backed by the synchronous Google Speech-to-Text API."""
+
+    def __init__(self, language_code: str = "en-US", client=None, timeout: float = DEFAULT_RECOGNIZE_TIMEOUT):
+        self.language_code = language_code
+        self.timeout = timeout
+        self._client = client
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                from clients import get_speech_client
+
+                self._client = get_speech_client()
+            return self._client
+
+    def recognize(self, pcm: bytes, sample_rate: int) -> str:
+        from google.cloud import speech
+
+        client = self._get_client()
+        audio = speech.RecognitionAudio(content=bytes(pcm))
+        config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            language_code=self.language_code,
+            enable_automatic_punctuation=True,
+        )
+        response = client.recognize(config=config, audio=audio, timeout=self.timeout)
+        return " ".join(
+            result.alternatives[0].transcript.strip()
+            for result in response.results
+            if result.alternatives
+        )
+
+
+def default_recognizer(language_code: str = "en-US"):
+    """Google recognizer with per-request timeout, retries and backoff."""
+    from resilience import ResilientRecognizer
+
+    return ResilientRecognizer(GoogleSpeechRecognizer(language_code))
+
+
+def _quietest_cut(window: bytes, sample_rate: int) -> Optional[int]:
+    """Return the byte offset to cut ``window`` at, after the silence around its quietest tail frame.
+
+    The cut is placed in the last quiet frame of the silent run containing
+    the quietest frame, or at the end of the window when the run reaches it,
+    so a long pause yields one cut instead of a cut every frame. Returns None
+    when no frame in the search area is below the silence threshold.
+    """
+    frame = max(1, sample_rate * SILENCE_FRAME_MS // 1000)
+    samples = np.frombuffer(window, dtype=np.int16)
+    search_start = max(0, len(samples) - int(SILENCE_SEARCH_SECONDS * sample_rate))
+    tail = samples[search_start:]
+    n_frames = len(tail) // frame
+    if n_frames == 0:
+        return None
+
+    frames = tail[: n_frames * frame].astype(np.float32).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    quiet = 20 * np.log10(rms + 1e-10) <= SILENCE_THRESHOLD_DBFS
+    quietest = int(np.argmin(rms))
+    if not quiet[quietest]:
+        return None
+
+    loud = np.flatnonzero(~quiet[quietest:])
+    if len(loud) == 0:
+        # 静音一直持续到窗口末尾：整窗作为一段
+        return len(window) - len(window) % BYTES_PER_SAMPLE
+    # 在静音段最后一帧的中点切分，下一段从语音开始前半帧起
+    last_quiet = quietest + int(loud[0]) - 1
+    cut_sample = search_start + last_quiet * frame + frame // 2
+    return cut_sample * BYTES_PER_SAMPLE
+
+
+def iter_segments(
+    pcm_chunks: Iterable[bytes],
+    sample_rate: int,
+    window_seconds: float = DEFAULT_WINDOW_SECONDS,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    split_on_silence: bool = True,
+) -> Iterator[Segment]:
+    """Group a PCM chunk stream into recognition segments.
+
+    With ``split_on_silence`` each window is cut at the end of the pause around
+    its quietest frame when one is found, so consecutive segments do not overlap; otherwise (or when no
+    silence is found) windows are cut at fixed length and overlap by
+    ``overlap_seconds``. Only one window of audio is buffered at a time.
+    """
+    window_bytes = int(window_seconds * sample_rate) * BYTES_PER_SAMPLE
+    overlap_bytes = int(overlap_seconds * sample_rate) * BYTES_PER_SAMPLE
+    if overlap_bytes >= window_bytes:
+        raise ValueError("overlap_seconds must be shorter than window_seconds")
+
+    buffer = bytearray()
+    start_sample = 0
+    index = 0
+    overlaps_previous = False
+
+    for chunk in pcm_chunks:
+        buffer += chunk
+        while len(buffer) >= window_bytes:
+            window = bytes(buffer[:window_bytes])
+            cut = _quietest_cut(window, sample_rate) if split_on_silence else None
+            if cut is not None:
+                pcm, advance, overlapped = window[:cut], cut, False
+            else:
+                pcm, advance, overlapped = window, window_bytes - overlap_bytes, True
+
+            yield Segment(index, start_sample, pcm, sample_rate, overlaps_previous)
+            del buffer[:advance]
+            start_sample += advance // BYTES_PER_SAMPLE
+            index += 1
+            overlaps_previous = overlapped
+
+    # 奇数字节的残留不构成完整采样
+    remainder = len(buffer) - len(buffer) % BYTES_PER_SAMPLE
+    if remainder and not (overlaps_previous and remainder <= overlap_bytes):
+        yield Segment(index, start_sample, bytes(buffer[:remainder]), sample_rate, overlaps_previous)
+
+
+def transcribe_segments(
+    segments: Iterable[Segment],
+    recognizer: Recognizer,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    timestamp_map=None,
+) -> Iterator[SegmentTranscript]:
+    """Recognize segments concurrently and yield results in segment order.
+
+    At most ``2 * max_workers`` segments are in flight, which bounds memory
+    use even when the segment source is an unbounded stream. When the audio
+    was compacted by VAD, pass its ``timestamp_map`` so segment times refer
+    to the original recording.
+    """
+    to_original = timestamp_map.to_original if timestamp_map is not None else (lambda seconds: seconds)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = deque()
+
+        def collect():
+            segment, future = in_flight.popleft()
+            return SegmentTranscript(
+                index=segment.index,
+                start_seconds=to_original(segment.start_seconds),
+                end_seconds=to_original(segment.end_seconds),
+                text=future.result().strip(),
+                overlaps_previous=segment.overlaps_previous,
+            )
+
+        for segment in segments:
+            in_flight.append((segment, pool.submit(recognizer.recognize, segment.pcm, segment.sample_rate)))
+            if len(in_flight) >= 2 * max_workers:
+                yield collect()
+        while in_flight:
+            yield collect()
+
+
+def _normalize_word(word: str) -> str:
+    return _WORD_NORMALIZE.sub("", word.lower())
+
+
+def _overlap_length(previous: List[str], new: List[str], max_words: int) -> int:
+    """Length of the longest suffix of ``previous`` repeated as a prefix of ``new``."""
+    limit = min(len(previous), len(new), max_words)
+    tail = [_normalize_word(w) for w in previous[-limit:]] if limit else []
+    head = [_normalize_word(w) for w in new[:limit]]
+    for k in range(limit, 0, -1):
+        if tail[-k:] == head[:k]:
+            return k
+    return 0
+
+
+def stitch_transcripts(
+    transcripts: Iterable[SegmentTranscript],
+    max_overlap_words: int = MAX_OVERLAP_WORDS,
+) -> str:
+    """Join segment transcripts, dropping words duplicated by window overlap."""
+    words: List[str] = []
+    for transcript in transcripts:
+        new_words = transcript.text.split()
+        if transcript.overlaps_previous:
+            new_words = new_words[_overlap_length(words, new_words, max_overlap_words):]
+        words.extend(new_words)
+    return " ".join(words)
+
+
+def transcribe_long_audio_segments(
+    pcm_chunks: Iterable[bytes],
+    sample_rate: int,
+    recognizer: Optional[Recognizer] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    window_seconds: float = DEFAULT_WINDOW_SECONDS,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    split_on_silence: bool = True,
+    timestamp_map=None,
+) -> List[SegmentTranscript]:
+    """Segment and recognize a PCM stream of any length, in order."""
+    recognizer = recognizer or default_recognizer()
+    segments = iter_segments(pcm_chunks, sample_rate, window_seconds, overlap_seconds, split_on_silence)
+    return list(transcribe_segments(segments, recognizer, max_workers, timestamp_map))
+
+
+def transcribe_long_audio(
+    pcm_chunks: Iterable[bytes],
+    sample_rate: int,
+    recognizer: Optional[Recognizer] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    window_seconds: float = DEFAULT_WINDOW_SECONDS,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    split_on_silence: bool = True,
+) -> str:
+    """Segment, recognize and stitch a PCM stream of any length."""
+    return stitch_transcripts(transcribe_long_audio_segments(
+        pcm_chunks, sample_rate, recognizer, max_workers, window_seconds, overlap_seconds, split_on_silence
+    ))
@@ -0,0 +1,197 @@
+"""
+Voice activity detection for 16-bit mono PCM.
+
+Frames are classified with short-time energy and zero-crossing rate against an
+adaptive noise floor; non-speech spans are dropped before recognition and a
+TimestampMap records where each kept span came from, so offsets in the
+compacted audio can be mapped back to the original recording.
+"""
+
+from bisect import bisect_right
+from collections import deque
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+BYTES_PER_SAMPLE = 2  # pcm_s16le
+
+DEFAULT_FRAME_MS = 30
+# 帧能量需高于噪声底多少 dB 才视为语音
+ENERGY_MARGIN_DB = 9.0
+# 绝对下限，避免把极安静的房间底噪当作语音
+MIN_SPEECH_DBFS = -50.0
+# 过零率高且能量仅略高于底噪的帧多为嘶声/宽带噪声
+MAX_SPEECH_ZCR = 0.35
+# 能量远高于底噪时不再检查过零率（清辅音等）
+LOUD_MARGIN_DB = 18.0
+DEFAULT_HANGOVER_MS = 300
+DEFAULT_PREROLL_MS = 150
+
+
+class TimestampMap:
+    """Maps offsets in VAD-compacted audio back to the original recording."""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._compact_starts: List[int] = []
+        self._original_starts: List[int] = []
+        self._compact_length = 0
+
+    def add(self, original_start: int, length: int):
+        """Record that ``length`` samples starting at ``original_start`` were kept."""
+        if length <= 0:
+            return
+        if self._compact_starts:
+            last_original_end = self._original_starts[-1] + (self._compact_length - self._compact_starts[-1])
+            if last_original_end == original_start:
+                # 与上一段连续，直接延长
+                self._compact_length += length
+                return
+        self._compact_starts.append(self._compact_length)
+        self._original_starts.append(original_start)
+        self._compact_length += length
+
+    def to_original_sample(self, compact_sample: int) -> int:
+        if not self._compact_starts:
+            return compact_sample
+        i = max(0, bisect_right(self._compact_starts, compact_sample) - 1)
+        return self._original_starts[i] + (compact_sample - self._compact_starts[i])
+
+    def to_original(self, compact_seconds: float) -> float:
+        """Translate a time in the compacted audio to the original timeline."""
+        sample = int(round(compact_seconds * self.sample_rate))
+        return self.to_original_sample(sample) / self.sample_rate
+
+    @property
+    def spans(self) -> List[tuple]:
+        """Kept spans as ``(original_start_seconds, original_end_seconds)`` pairs."""
+        ends = self._compact_starts[1:] + [self._compact_length]
+        return [
+            (orig / self.sample_rate, (orig + end - start) / self.sample_rate)
+            for start, end, orig in zip(self._compact_starts, ends, self._original_starts)
+        ]
+
+    @property
+    def kept_seconds(self) -> float:
+        return self._compact_length / self.sample_rate
+
+    @property
+    def sample_spans(self) -> List[tuple]:
+        """Kept spans as ``(original_start_sample, length)`` pairs; see from_sample_spans()."""
+        ends = self._compact_starts[1:] + [self._compact_length]
+        return [(orig, end - start) for start, end, orig in zip(self._compact_starts, ends, self._original_starts)]
+
+    @classmethod
+    def from_sample_spans(cls, sample_rate: int, spans: Iterable[tuple]) -> "TimestampMap":
+        """Rebuild a map from sample_spans, e.g. after passing it between processes."""
+        timestamp_map = cls(sample_rate)
+        for original_start, length in spans:
+            timestamp_map.add(original_start, length)
+        return timestamp_map
+
+
+def frame_features(samples: np.ndarray, frame: int):
+    """Per-frame energy (dBFS) and zero-crossing rate for whole frames of ``samples``."""
+    n_frames = len(samples) // frame
+    frames = samples[: n_frames * frame].astype(np.float32).reshape(n_frames, frame) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    energy_db = 20 * np.log10(rms + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, frame - 1)
+    return energy_db, zcr
+
+
+class VoiceActivityDetector:
+    """Streaming energy/zero-crossing VAD that drops non-speech PCM frames."""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_ms: int = DEFAULT_FRAME_MS,
+        hangover_ms: int = DEFAULT_HANGOVER_MS,
+        preroll_ms: int = DEFAULT_PREROLL_MS,
+    ):
+        self.sample_rate = sample_rate
+        self.frame = max(1, sample_rate * frame_ms // 1000)
+        self.hangover_frames = hangover_ms // frame_ms
+        self.preroll_frames = preroll_ms // frame_ms
+        self.timestamp_map = TimestampMap(sample_rate)
+        self.total_samples = 0
+        self._noise_floor = None
+
+    @property
+    def total_seconds(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    @property
+    def kept_ratio(self) -> float:
+        if not self.total_samples:
+            return 0.0
+        return self.timestamp_map.kept_seconds / self.total_seconds
+
+    def _classify(self, energy_db: float, zcr: float) -> bool:
+        if self._noise_floor is None:
+            self._noise_floor = energy_db
+        threshold = max(self._noise_floor + ENERGY_MARGIN_DB, MIN_SPEECH_DBFS)
+        speech = energy_db > threshold and (
+            zcr <= MAX_SPEECH_ZCR or energy_db > self._noise_floor + LOUD_MARGIN_DB
+        )
+        # 噪声底快速下降、缓慢上升
+        if energy_db < self._noise_floor:
+            self._noise_floor = energy_db
+        elif not speech:
+            self._noise_floor = 0.95 * self._noise_floor + 0.05 * energy_db
+        return speech
+
+    def filter(self, pcm_chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Yield only the speech portions of a PCM chunk stream.
+
+        Each detected speech run is extended by ``preroll_ms`` before and
+        ``hangover_ms`` after, so word onsets and tails are not clipped.
+        """
+        frame_bytes = self.frame * BYTES_PER_SAMPLE
+        leftover = b""
+        preroll = deque(maxlen=self.preroll_frames)
+        hangover = 0
+
+        for chunk in pcm_chunks:
+            data = leftover + chunk
+            n_frames = len(data) // frame_bytes
+            leftover = data[n_frames * frame_bytes:]
+            if n_frames == 0:
+                continue
+
+            samples = np.frombuffer(data, dtype=np.int16, count=n_frames * self.frame)
+            energy_db, zcr = frame_features(samples, self.frame)
+            kept = []
+            for i in range(n_frames):
+                position = self.total_samples
+                self.total_samples += self.frame
+                frame_pcm = data[i * frame_bytes:(i + 1) * frame_bytes]
+
+                if self._classify(float(energy_db[i]), float(zcr[i])):
+                    hangover = self.hangover_frames
+                    while preroll:
+                        pre_position, pre_pcm = preroll.popleft()
+                        self.timestamp_map.add(pre_position, self.frame)
+                        kept.append(pre_pcm)
+                elif hangover > 0:
+                    hangover -= 1
+                else:
+                    preroll.append((position, frame_pcm))
+                    continue
+
+                self.timestamp_map.add(position, self.frame)
+                kept.append(frame_pcm)
+
+            if kept:
+                yield b"".join(kept)
+
+        # 末尾不足一帧的残留在仍处于语音状态时保留
+        if leftover and hangover > 0:
+            length = len(leftover) // BYTES_PER_SAMPLE
+            self.timestamp_map.add(self.total_samples, length)
+            self.total_samples += length
+            yield leftover[: length * BYTES_PER_SAMPLE]
+        else:
+            self.total_samples += len(leftover) // BYTES_PER_SAMPLE
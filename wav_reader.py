@@ -0,0 +1,150 @@
+"""
+Memory-mapped WAV reader.
+
+MappedWav parses the RIFF header and maps the file read-only, so the PCM
+payload is available as a zero-copy ``memoryview`` or NumPy view. Slices and
+chunk iterators hand out views into the mapping; pages are loaded by the OS
+on access and can be dropped again under memory pressure, so reading a long
+recording does not need a private copy of the whole file. iter_chunks()
+also tells the kernel to drop pages it has already handed out, so resident
+memory stays around one window of audio however long the file is.
+"""
+
+import mmap
+import struct
+from typing import Iterator, Optional
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+DEFAULT_CHUNK_FRAMES = 8192
+
+
+class MappedWav:
+    """Read-only, memory-mapped view of a PCM WAV file.
+
+    Views returned by ``pcm``, ``samples()``, ``slice()`` and
+    ``iter_chunks()`` point into the mapping and are only valid until
+    close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise ValueError(f"'{path}' is empty, not a WAV file")
+        try:
+            self._parse_header()
+        except Exception:
+            self.close()
+            raise
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+
+    def _parse_header(self):
+        mm = self._mmap
+        if len(mm) < 12 or mm[:4] != b"RIFF" or mm[8:12] != b"WAVE":
+            raise ValueError(f"'{self.path}' is not a RIFF/WAVE file")
+        fmt = None
+        offset = 12
+        while offset + 8 <= len(mm):
+            chunk_id, chunk_size = struct.unpack_from("<4sI", mm, offset)
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", mm, body)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"'{self.path}' has a 'data' chunk before its 'fmt ' chunk")
+                self.data_offset = body
+                # 流式写入的 WAV 可能把大小写成 0 或 0xFFFFFFFF，此时以文件结尾为准
+                available = len(mm) - body
+                self.data_size = chunk_size if 0 < chunk_size <= available else available
+                break
+            offset = body + chunk_size + (chunk_size & 1)
+        else:
+            raise ValueError(f"'{self.path}' has no 'data' chunk")
+
+        audio_format, self.channels, self.sample_rate, _, self.block_align, bits = fmt
+        if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE) or bits != 16:
+            raise ValueError(f"'{self.path}' is not 16-bit linear PCM (format {audio_format:#x}, {bits} bits)")
+        self.sample_width = bits // 8
+        self.num_frames = self.data_size // self.block_align
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.num_frames / self.sample_rate
+
+    @property
+    def pcm(self) -> memoryview:
+        """The whole PCM payload, without copying."""
+        return self.slice(0, self.num_frames)
+
+    def slice(self, start_frame: int, end_frame: Optional[int] = None) -> memoryview:
+        """PCM bytes of frames ``[start_frame, end_frame)``, without copying."""
+        end_frame = self.num_frames if end_frame is None else min(end_frame, self.num_frames)
+        start_frame = max(0, min(start_frame, end_frame))
+        start = self.data_offset + start_frame * self.block_align
+        end = self.data_offset + end_frame * self.block_align
+        return memoryview(self._mmap)[start:end]
+
+    def samples(self) -> np.ndarray:
+        """int16 samples shaped ``(frames, channels)``, as a read-only view of the file."""
+        return np.frombuffer(
+            self._mmap, dtype="<i2", count=self.num_frames * self.channels, offset=self.data_offset
+        ).reshape(self.num_frames, self.channels)
+
+    def _release(self, start: int, end: int) -> int:
+        """Drop mapped pages in ``[start, end)`` from this process; returns the new release offset."""
+        start = start - start % mmap.PAGESIZE
+        end = end - end % mmap.PAGESIZE
+        if end > start and hasattr(mmap, "MADV_DONTNEED"):
+            # 只读文件映射：之后再访问会从页缓存重新载入，数据不受影响
+            self._mmap.madvise(mmap.MADV_DONTNEED, start, end - start)
+            return end
+        return start
+
+    def iter_chunks(self, chunk_frames: int = DEFAULT_CHUNK_FRAMES, release: bool = True) -> Iterator[memoryview]:
+        """Yield consecutive PCM slices of ``chunk_frames`` frames.
+
+        With ``release`` the pages of earlier chunks are given back once the
+        consumer asks for the next one.
+        """
+        released = self.data_offset
+        for start in range(0, self.num_frames, chunk_frames):
+            chunk_offset = self.data_offset + start * self.block_align
+            if release:
+                released = self._release(released, chunk_offset)
+            yield self.slice(start, start + chunk_frames)
+
+    def iter_mono_chunks(self, chunk_frames: int = DEFAULT_CHUNK_FRAMES) -> Iterator[bytes]:
+        """Yield mono PCM chunks; multi-channel audio is averaged one chunk at a time."""
+        if self.channels == 1:
+            yield from self.iter_chunks(chunk_frames)
+            return
+        samples = self.samples()
+        released = self.data_offset
+        for start in range(0, self.num_frames, chunk_frames):
+            released = self._release(released, self.data_offset + start * self.block_align)
+            block = samples[start:start + chunk_frames].astype(np.int32)
+            yield (block.sum(axis=1) // self.channels).astype("<i2").tobytes()
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 仍有视图引用该映射；映射随最后一个视图一起释放
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()